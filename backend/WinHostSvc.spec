@@ -1,12 +1,16 @@
 # -*- mode: python ; coding: utf-8 -*-
 
 
+# Modules main.py imports by name on first use (lazy_imports.py) - invisible to the analyzer
+LAZY_IMPORTS = ['openai', 'websockets', 'websockets.asyncio.client', 'websockets.exceptions',
+                'numpy', 'PIL', 'PIL.Image', 'docx']
+
 a = Analysis(
     ['WinHostSvc.py'],
     pathex=[],
     binaries=[],
     datas=[('public_key.pem', '.')],
-    hiddenimports=['win32timezone'],
+    hiddenimports=['win32timezone'] + LAZY_IMPORTS,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
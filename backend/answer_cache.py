@@ -0,0 +1,182 @@
+# backend/answer_cache.py
+"""
+In-memory answer cache for repeated interview questions.
+
+Entries are keyed on (session context hash, model, normalized transcript):
+  - exact match: the normalized transcript is identical
+  - near-duplicate match: MinHash over character shingles of the transcript, bucketed with
+    LSH bands so only a handful of candidates are compared per lookup
+Entries expire after a TTL and the least recently used entry is evicted when full.
+Callers key questions that refer back to earlier turns (refers_back()) on the conversation
+state too, so "explain that again" never replays an answer about a different earlier question.
+"""
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+# Filler (and articles) that speech-to-text varies around the same question
+_FILLER_RE = re.compile(r"\b(?:um+|uh+|erm|hmm+|so|okay|ok|well|like|you know|can you|could you|please|a|an|the)\b")
+_NON_WORD_RE = re.compile(r"[^a-z0-9+#]+")
+# Questions that point back at earlier turns ("explain that again", "elaborate on that approach")
+_BACK_REFERENCE_RE = re.compile(r"\b(?:that|this|it|those|these|them|above|previous|earlier|again|elaborate|expand|"
+                                r"you (?:just )?(?:said|mentioned|wrote))\b")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace."""
+    text = (text or "").lower()
+    text = _NON_WORD_RE.sub(" ", text)
+    text = _FILLER_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def refers_back(text: str) -> bool:
+    """True when the question depends on earlier turns - its answer is only valid in that conversation."""
+    return bool(_BACK_REFERENCE_RE.search((text or "").lower()))
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 6 * 3600,
+                 near_dup_threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 4, min_words: int = 3):
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_dup_threshold = near_dup_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_words = min_words  # Shorter transcripts ("why?", "go on") are follow-ups - never cached
+
+        # Fixed permutations so signatures are stable for the life of the process
+        seed = hashlib.sha256(b"answer-cache-minhash").digest()
+        self._perms = []
+        for i in range(num_perm):
+            h = hashlib.blake2b(seed + i.to_bytes(2, "little"), digest_size=16).digest()
+            a = int.from_bytes(h[:8], "little") % _MERSENNE_PRIME or 1
+            b = int.from_bytes(h[8:], "little") % _MERSENNE_PRIME
+            self._perms.append((a, b))
+
+        self._entries = OrderedDict()  # key -> entry dict
+        self._buckets = {}             # (partition, band index, band tuple) -> set of keys
+        self.hits = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------ signatures
+    def _shingles(self, normalized: str) -> set:
+        # Spaces are dropped so "hash map" and "hashmap" shingle identically
+        k = self.shingle_size
+        compact = normalized.replace(" ", "")
+        if len(compact) <= k:
+            return {compact}
+        return {compact[i:i + k] for i in range(len(compact) - k + 1)}
+
+    def _signature(self, normalized: str) -> tuple:
+        hashed = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+                  for s in self._shingles(normalized)]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed)
+            for a, b in self._perms
+        )
+
+    def _band_keys(self, partition: tuple, signature: tuple):
+        for band in range(self.bands):
+            yield (partition, band, signature[band * self.rows:(band + 1) * self.rows])
+
+    # ------------------------------------------------------------------ bookkeeping
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in self._band_keys(key[:2], entry["signature"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _expired(self, entry, now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    # ------------------------------------------------------------------ public API
+    def get(self, transcript: str, context_hash: str, model: str) -> Optional[Dict[str, Any]]:
+        """Return {"answer", "match", "similarity", "question", ...} or None on a miss."""
+        normalized = normalize_transcript(transcript)
+        if len(normalized.split()) < self.min_words:
+            return None
+        now = time.time()
+        partition = (context_hash, model)
+        key = partition + (normalized,)
+
+        entry = self._entries.get(key)
+        if entry is not None and not self._expired(entry, now):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.exact_hits += 1
+            return {**entry["payload"], "match": "exact", "similarity": 1.0, "question": entry["question"]}
+        if entry is not None:
+            self._remove(key)
+
+        # Near-duplicate: compare only against keys sharing at least one LSH band
+        signature = self._signature(normalized)
+        candidates = set()
+        for band_key in self._band_keys(partition, signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        best_key, best_sim = None, 0.0
+        for cand in candidates:
+            cand_entry = self._entries.get(cand)
+            if cand_entry is None or self._expired(cand_entry, now):
+                continue
+            sim = sum(x == y for x, y in zip(signature, cand_entry["signature"])) / self.num_perm
+            if sim > best_sim:
+                best_key, best_sim = cand, sim
+        if best_key is not None and best_sim >= self.near_dup_threshold:
+            self._entries.move_to_end(best_key)
+            best = self._entries[best_key]
+            self.hits += 1
+            self.near_hits += 1
+            return {**best["payload"], "match": "near", "similarity": round(best_sim, 3), "question": best["question"]}
+
+        self.misses += 1
+        return None
+
+    def put(self, transcript: str, context_hash: str, model: str, answer: str, **metadata):
+        normalized = normalize_transcript(transcript)
+        if len(normalized.split()) < self.min_words or not answer:
+            return
+        key = (context_hash, model, normalized)
+        self._remove(key)
+        signature = self._signature(normalized)
+        self._entries[key] = {
+            "signature": signature,
+            "question": transcript,
+            "created_at": time.time(),
+            "payload": {"answer": answer, **metadata},
+        }
+        for band_key in self._band_keys(key[:2], signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,264 @@
+# backend/audio_dsp.py
+"""
+Streaming audio input stage for /realtime: whatever the renderer captures -> 24 kHz mono PCM16.
+
+Each source (e.g. "mic", "system") declares its format once: float32 or int16 samples, any sample
+rate, any channel count (interleaved). Per chunk the stage
+  1. downmixes the channels (mean) into float32,
+  2. resamples with a polyphase windowed-sinc filter bank (vectorized over the whole chunk),
+  3. optionally normalizes the level (slow AGC, so quiet system audio is not drowned out by the mic),
+  4. mixes all sources sample-aligned through per-source ring buffers and converts to PCM16.
+Buffers are allocated once (and grown only for unusually large chunks); the per-chunk work reuses
+them through NumPy out= arguments. A single source already in the upstream format passes through
+untouched. Needs NumPy.
+"""
+import math
+from typing import Dict, Optional
+
+from lazy_imports import available, lazy_module
+
+np = lazy_module("numpy") if available("numpy") else None  # Imported on first use
+
+DSP_AVAILABLE = np is not None
+
+OUTPUT_RATE = 24000
+TAPS_PER_PHASE = 24        # Filter length per polyphase branch when upsampling (quality vs CPU)
+KAISER_BETA = 8.0          # ~80 dB stopband
+PASSBAND = 0.9             # Cutoff as a fraction of the lower Nyquist frequency
+MAX_BLOCK = 4096           # Output samples computed per vectorized block
+MIX_BUFFER_SECONDS = 2.0   # Per-source backlog before the oldest audio is dropped
+MAX_SKEW_MS = 120          # Wait at most this long for a lagging source before mixing without it
+AGC_TARGET_RMS = 0.1       # About -20 dBFS
+AGC_MAX_GAIN = 8.0
+AGC_MIN_RMS = 0.003        # Quieter chunks (silence, noise floor) do not move the gain
+
+
+class RingBuffer:
+    """Fixed-capacity float32 FIFO. Writing past capacity drops the oldest samples."""
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._start = 0
+        self.size = 0
+        self.dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def write(self, samples):
+        n = len(samples)
+        cap = self.capacity
+        if n >= cap:
+            self.dropped += self.size + n - cap
+            samples = samples[n - cap:]
+            self._start, self.size, n = 0, 0, cap
+        elif self.size + n > cap:
+            overflow = self.size + n - cap
+            self._start = (self._start + overflow) % cap
+            self.size -= overflow
+            self.dropped += overflow
+        end = (self._start + self.size) % cap
+        first = min(n, cap - end)
+        self._data[end:end + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.size += n
+
+    def add_into(self, out, n: int):
+        """Add the oldest n samples (n <= size) onto out[:n] and consume them."""
+        first = min(n, self.capacity - self._start)
+        np.add(out[:first], self._data[self._start:self._start + first], out=out[:first])
+        if n > first:
+            np.add(out[first:n], self._data[:n - first], out=out[first:n])
+        self._start = (self._start + n) % self.capacity
+        self.size -= n
+
+
+class PolyphaseResampler:
+    """Rational-ratio streaming resampler (in_rate -> out_rate) keeping filter history across chunks."""
+
+    def __init__(self, in_rate: int, out_rate: int = OUTPUT_RATE, taps_per_phase: int = TAPS_PER_PHASE):
+        g = math.gcd(in_rate, out_rate)
+        self.up, self.down = out_rate // g, in_rate // g
+        self.passthrough = self.up == self.down
+        if self.passthrough:
+            return
+        L, M = self.up, self.down
+        K = math.ceil(taps_per_phase * max(1.0, M / L))  # Decimating needs a proportionally longer filter
+        self.taps = K
+        # Lowpass prototype at the upsampled rate, cut below the lower of the two Nyquist frequencies
+        n = np.arange(L * K) - (L * K - 1) / 2
+        fc = PASSBAND * 0.5 / max(L, M)
+        h = 2 * fc * np.sinc(2 * fc * n) * np.kaiser(L * K, KAISER_BETA) * L
+        bank = h.reshape(K, L).T[:, ::-1]  # bank[p] = taps of phase p, oldest input first
+        # Output j (counted from a period start) reads inputs ending at (j*M)//L with phase (j*M)%L;
+        # the pattern repeats every L outputs, so both tables are precomputed once
+        j = np.arange(MAX_BLOCK + L)
+        self._rel_input = (j * M) // L
+        self._coefs = np.ascontiguousarray(bank[(j * M) % L], dtype=np.float32)
+        self._buf = np.zeros(K - 1 + MAX_BLOCK * M // L + M + 1, dtype=np.float32)
+        self._len = K - 1           # Zero history before the first sample
+        self._period_start = K - 1  # Buffer index of the input where the current period starts
+        self._phase = 0             # Output index within the period
+        self._index = np.empty(MAX_BLOCK, dtype=np.intp)
+        self._gather = np.empty((MAX_BLOCK, K), dtype=np.float32)
+        self._out = np.empty(MAX_BLOCK, dtype=np.float32)
+
+    def _ensure_output(self, capacity: int):
+        if len(self._out) < capacity:
+            self._out = np.empty(max(capacity, 2 * len(self._out)), dtype=np.float32)
+
+    def process(self, x):
+        """Resample a float32 chunk. Returns a view valid until the next call."""
+        if self.passthrough:
+            return x
+        L, M, K = self.up, self.down, self.taps
+        self._ensure_output(len(x) * L // M + 2)
+        produced = 0
+        pos = 0
+        while pos < len(x):
+            take = min(len(x) - pos, len(self._buf) - self._len)
+            self._buf[self._len:self._len + take] = x[pos:pos + take]
+            self._len += take
+            pos += take
+            windows = np.lib.stride_tricks.sliding_window_view(self._buf[:self._len], K)
+            while True:
+                r0 = self._phase
+                last = self._len - 1 - self._period_start  # Newest input usable, relative to the period start
+                n = int(np.searchsorted(self._rel_input[r0:r0 + MAX_BLOCK], last, side="right"))
+                if n == 0:
+                    break
+                idx = self._index[:n]
+                np.add(self._rel_input[r0:r0 + n], self._period_start - (K - 1), out=idx)  # First input of each window
+                gathered = self._gather[:n]
+                np.take(windows, idx, axis=0, out=gathered)
+                np.multiply(gathered, self._coefs[r0:r0 + n], out=gathered)
+                gathered.sum(axis=1, out=self._out[produced:produced + n])
+                produced += n
+                r = r0 + n
+                self._period_start += (r // L) * M
+                self._phase = r % L
+            # Keep only the history the next output needs
+            shift = self._period_start - (K - 1)
+            if shift > 0:
+                keep = self._len - shift
+                self._buf[:keep] = self._buf[shift:self._len]
+                self._len = keep
+                self._period_start -= shift
+        return self._out[:produced]
+
+
+class AudioSource:
+    def __init__(self, encoding: str = "pcm16", sample_rate: int = OUTPUT_RATE, channels: int = 1,
+                 gain: float = 1.0, normalize: bool = False):
+        if encoding not in ("pcm16", "float32"):
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        if channels < 1 or sample_rate < 1000:
+            raise ValueError("Invalid channel count or sample rate")
+        self.encoding, self.sample_rate, self.channels = encoding, sample_rate, channels
+        self.gain, self.normalize = gain, normalize
+        self.resampler = PolyphaseResampler(sample_rate)
+        self.ring = RingBuffer(int(OUTPUT_RATE * MIX_BUFFER_SECONDS))
+        self._mono = np.empty(0, dtype=np.float32)
+        self._carry = b""
+        self._level = AGC_TARGET_RMS
+        self.agc_gain = 1.0
+        self.input_seconds = 0.0
+
+    @property
+    def is_upstream_format(self) -> bool:
+        return (self.encoding == "pcm16" and self.channels == 1 and self.sample_rate == OUTPUT_RATE
+                and self.gain == 1.0 and not self.normalize)
+
+    def push(self, raw: bytes):
+        """Decode, downmix, resample and level one chunk into the mix ring buffer."""
+        width = (2 if self.encoding == "pcm16" else 4) * self.channels
+        data = self._carry + raw if self._carry else raw
+        frames = len(data) // width
+        self._carry = data[frames * width:]
+        if not frames:
+            return
+        self.input_seconds += frames / self.sample_rate
+        samples = np.frombuffer(data, dtype="<i2" if self.encoding == "pcm16" else "<f4", count=frames * self.channels)
+        if len(self._mono) < frames:
+            self._mono = np.empty(max(frames, 2 * len(self._mono)), dtype=np.float32)
+        mono = self._mono[:frames]
+        if self.channels == 1:
+            mono[:] = samples
+        else:
+            samples.reshape(frames, self.channels).mean(axis=1, dtype=np.float32, out=mono)
+        scale = self.gain / 32768.0 if self.encoding == "pcm16" else self.gain
+        if scale != 1.0:
+            np.multiply(mono, scale, out=mono)
+        out = self.resampler.process(mono)
+        if self.normalize and len(out):
+            rms = float(np.sqrt(np.dot(out, out) / len(out)))
+            if rms > AGC_MIN_RMS:
+                self._level += 0.2 * (rms - self._level)
+            target = min(AGC_MAX_GAIN, AGC_TARGET_RMS / max(self._level, 1e-6))
+            self.agc_gain += 0.3 * (target - self.agc_gain)
+            np.multiply(out, self.agc_gain, out=out)
+        self.ring.write(out)
+
+
+class AudioInputStage:
+    """Per-connection stage: push() raw chunks per source, get upstream PCM16 bytes back."""
+
+    def __init__(self, default_source: str = "mic"):
+        self.default_source = default_source
+        self.sources: Dict[str, AudioSource] = {}
+        self._mix = np.zeros(MAX_BLOCK, dtype=np.float32)
+        self._pcm = np.zeros(MAX_BLOCK, dtype="<i2")
+        self.max_skew = OUTPUT_RATE * MAX_SKEW_MS // 1000
+        self.output_seconds = 0.0
+
+    def configure(self, source: Optional[str] = None, **fmt):
+        self.sources[source or self.default_source] = AudioSource(**fmt)
+
+    def passthrough(self, source: Optional[str] = None) -> bool:
+        """True when a chunk from this source can go upstream as it is: it is the only source and
+        already sends the upstream format."""
+        if (source or self.default_source) != self.default_source:
+            return False
+        return not self.sources or (list(self.sources) == [self.default_source]
+                                    and self.sources[self.default_source].is_upstream_format)
+
+    def push(self, source: Optional[str], raw: bytes) -> bytes:
+        """Add a chunk from one source; returns whatever mixed PCM16 audio is ready (maybe b"")."""
+        name = source or self.default_source
+        if name not in self.sources:
+            self.sources[name] = AudioSource()
+        if self.passthrough(name):
+            self.output_seconds += len(raw) / 2 / OUTPUT_RATE
+            return raw
+        self.sources[name].push(raw)
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        sizes = [s.ring.size for s in self.sources.values()]
+        # Mix what every source has; a source lagging more than MAX_SKEW is treated as silent
+        n = min(sizes) if max(sizes) - min(sizes) <= self.max_skew else max(sizes) - self.max_skew
+        if n <= 0:
+            return b""
+        if len(self._mix) < n:
+            self._mix = np.zeros(max(n, 2 * len(self._mix)), dtype=np.float32)
+            self._pcm = np.zeros(len(self._mix), dtype="<i2")
+        mix = self._mix[:n]
+        mix.fill(0.0)
+        for s in self.sources.values():
+            s.ring.add_into(mix, min(n, s.ring.size))
+        np.multiply(mix, 32767.0, out=mix)
+        np.clip(mix, -32768.0, 32767.0, out=mix)  # Hard limit instead of int16 wrap-around
+        pcm = self._pcm[:n]
+        np.rint(mix, out=mix)
+        pcm[:] = mix
+        self.output_seconds += n / OUTPUT_RATE
+        return pcm.tobytes()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "output_seconds": round(self.output_seconds, 2),
+            "sources": {name: {"encoding": s.encoding, "sample_rate": s.sample_rate, "channels": s.channels,
+                               "input_seconds": round(s.input_seconds, 2), "dropped_samples": s.ring.dropped,
+                               "agc_gain": round(s.agc_gain, 2)} for name, s in self.sources.items()},
+        }
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CPU cost of the /realtime audio input stage per second of audio.
+
+Streams 20 s of synthetic audio through AudioInputStage in the chunk sizes browsers deliver and
+reports CPU milliseconds per audio second (lower is better; 1000 would be real time) for:
+  - 24 kHz mono PCM16 mic (today's frontend format - passthrough)
+  - 48 kHz stereo float32 system audio
+  - 44.1 kHz stereo PCM16 system audio
+  - 48 kHz stereo float32 system audio + 48 kHz mono float32 mic, mixed, with level normalization
+For reference the same 48 kHz stereo conversion via np.interp (linear interpolation - no
+anti-aliasing filter) is timed too. Alias column: level of a 15 kHz tone after conversion to
+24 kHz (it cannot be represented, so it should vanish; linear interpolation folds it to 9 kHz).
+Also reports upstream bytes vs what the client sent.
+
+Usage: python bench_audio_dsp.py
+Needs numpy.
+"""
+import time
+
+import numpy as np
+
+from audio_dsp import OUTPUT_RATE, AudioInputStage
+
+SECONDS = 20
+CHUNK_FRAMES = 4096  # AudioWorklet/ScriptProcessor-sized chunks
+
+
+def signal(rate: int, channels: int, seconds: float, tone_hz: float = None, seed: int = 1) -> np.ndarray:
+    """Speech-band noise bursts (or a pure tone), interleaved float32 in [-1, 1]."""
+    n = int(rate * seconds)
+    if tone_hz:
+        mono = 0.5 * np.sin(2 * np.pi * tone_hz * np.arange(n) / rate)
+    else:
+        rng = np.random.default_rng(seed)
+        mono = np.convolve(rng.normal(0, 0.2, n), np.ones(8) / 8, mode="same")
+        mono *= (np.sin(2 * np.pi * 3 * np.arange(n) / rate) > 0)
+    return np.repeat(mono[:, None], channels, axis=1).astype(np.float32).ravel()
+
+
+def encode(samples: np.ndarray, encoding: str) -> bytes:
+    if encoding == "pcm16":
+        return (samples * 32767).astype("<i2").tobytes()
+    return samples.astype("<f4").tobytes()
+
+
+def run(sources: dict, seconds: float = SECONDS, tone_hz: float = None):
+    """sources: name -> format dict. Returns (cpu seconds, output bytes, input bytes, output samples)."""
+    stage = AudioInputStage()
+    streams = {}
+    for name, fmt in sources.items():
+        stage.configure(name, **fmt)
+        width = (2 if fmt["encoding"] == "pcm16" else 4) * fmt["channels"]
+        data = encode(signal(fmt["sample_rate"], fmt["channels"], seconds, tone_hz), fmt["encoding"])
+        streams[name] = (data, CHUNK_FRAMES * width * fmt["sample_rate"] // 48000)
+    out = []
+    cpu = 0.0
+    offsets = {name: 0 for name in streams}
+    while any(offsets[n] < len(d) for n, (d, _) in streams.items()):
+        for name, (data, chunk) in streams.items():  # Sources interleave like separate capture callbacks
+            if offsets[name] >= len(data):
+                continue
+            raw = data[offsets[name]:offsets[name] + chunk]
+            offsets[name] += chunk
+            t0 = time.process_time()
+            pcm = stage.push(name, raw)
+            cpu += time.process_time() - t0
+            out.append(pcm)
+    pcm = b"".join(out)
+    return cpu, len(pcm), sum(len(d) for d, _ in streams.values()), np.frombuffer(pcm, dtype="<i2")
+
+
+def level_db(samples: np.ndarray) -> float:
+    core = samples[OUTPUT_RATE // 10:-OUTPUT_RATE // 10].astype(np.float64) / 32768
+    return 20 * np.log10(np.sqrt(np.mean(core ** 2)) / (0.5 / np.sqrt(2)) + 1e-12)
+
+
+def interp_baseline(seconds: float = SECONDS, tone_hz: float = None):
+    rate, channels = 48000, 2
+    data = signal(rate, channels, seconds, tone_hz)
+    out = []
+    cpu = 0.0
+    chunk = CHUNK_FRAMES * channels
+    pos = 0.0
+    for start in range(0, len(data), chunk):
+        t0 = time.process_time()
+        mono = data[start:start + chunk].reshape(-1, channels).mean(axis=1)
+        positions = np.arange(pos, len(mono) - 1, rate / OUTPUT_RATE)
+        out.append((np.interp(positions, np.arange(len(mono)), mono) * 32767).astype("<i2"))
+        pos = positions[-1] + rate / OUTPUT_RATE - len(mono) if len(positions) else pos - len(mono)
+        cpu += time.process_time() - t0
+    return cpu, np.concatenate(out)
+
+
+def main():
+    configs = [
+        ("24k mono pcm16 (passthrough)", {"mic": dict(encoding="pcm16", sample_rate=24000, channels=1)}),
+        ("48k stereo float32", {"system": dict(encoding="float32", sample_rate=48000, channels=2)}),
+        ("44.1k stereo pcm16", {"system": dict(encoding="pcm16", sample_rate=44100, channels=2)}),
+        ("48k stereo + 48k mic, mixed", {"system": dict(encoding="float32", sample_rate=48000, channels=2, normalize=True),
+                                         "mic": dict(encoding="float32", sample_rate=48000, channels=1)}),
+    ]
+    print(f"{'configuration':<32}{'CPU ms/audio s':>16}{'alias dB':>10}{'upstream':>20}")
+    for label, sources in configs:
+        cpu, out_bytes, in_bytes, _ = run(sources)
+        _, _, _, tone = run({k: {**v, "normalize": False} for k, v in list(sources.items())[:1]}, seconds=2, tone_hz=15000)
+        alias = "-" if "passthrough" in label else f"{level_db(tone):.0f}"
+        print(f"{label:<32}{cpu * 1000 / SECONDS:>16.2f}{alias:>10}"
+              f"{in_bytes / 1e6:>8.1f} -> {out_bytes / 1e6:.1f} MB")
+    cpu, _ = interp_baseline()
+    _, tone = interp_baseline(seconds=2, tone_hz=15000)
+    print(f"{'48k stereo, np.interp baseline':<32}{cpu * 1000 / SECONDS:>16.2f}{level_db(tone):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
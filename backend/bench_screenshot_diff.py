@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: consecutive-screenshot change detection on a simulated coding round.
+
+Renders a 2560x1440 "editor" screenshot, then replays a sequence of captures - a few typed
+lines, the same screen again, a scroll - through ScreenshotTracker and reports per capture:
+what would be sent (full / crop / unchanged replay), image bytes, vision tokens and the
+decode + diff time spent on the backend. Vision latency follows tokens and upload size.
+
+Usage: python bench_screenshot_diff.py
+Needs numpy and Pillow.
+"""
+import io
+import time
+
+from PIL import Image, ImageDraw
+
+from image_utils import probe_data_url, to_data_url, vision_tokens_for_size
+from screenshot_diff import ScreenshotTracker, decode_data_url
+
+WIDTH, HEIGHT = 2560, 1440
+LINE_HEIGHT = 26
+
+CODE = [
+    "def two_sum(nums, target):",
+    "    seen = {}",
+    "    for i, num in enumerate(nums):",
+    "        if target - num in seen:",
+    "            return [seen[target - num], i]",
+    "        seen[num] = i",
+    "    return []",
+]
+
+
+def render(lines: list, scroll: int = 0, caret: bool = True) -> str:
+    img = Image.new("RGB", (WIDTH, HEIGHT), (30, 30, 36))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 700, HEIGHT), fill=(245, 245, 245))  # Problem statement pane
+    for i in range(40):
+        draw.text((30, 40 + i * LINE_HEIGHT), f"Problem text line {i + scroll}: given an array of integers nums...", fill=(20, 20, 20))
+    for i, line in enumerate(lines[scroll:]):
+        draw.text((760, 40 + i * LINE_HEIGHT), f"{i + 1 + scroll:>3}  {line}", fill=(220, 220, 200))
+    if caret:
+        y = 40 + (len(lines) - scroll) * LINE_HEIGHT
+        draw.rectangle((800, y, 802, y + 18), fill=(255, 255, 255))
+    draw.text((WIDTH - 120, HEIGHT - 30), "12:04", fill=(200, 200, 200))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return to_data_url(buf.getvalue(), "image/png")
+
+
+def main():
+    filler = [f"    # helper {i}" for i in range(30)]
+    steps = [
+        ("first capture", render(CODE), "solve this"),
+        ("typed 2 lines", render(CODE + ["", "print(two_sum([2, 7, 11, 15], 9))"]), "is this correct"),
+        ("same screen, caret off", render(CODE + ["", "print(two_sum([2, 7, 11, 15], 9))"], caret=False), "is this correct"),
+        ("same screen, new question", render(CODE + ["", "print(two_sum([2, 7, 11, 15], 9))"]), "what is the complexity"),
+        ("scrolled", render(CODE + filler, scroll=12), "and now"),
+    ]
+
+    tracker = ScreenshotTracker()
+    print(f"{'capture':<28}{'action':>11}{'sent KB':>9}{'tokens':>8}{'full tokens':>13}{'diff ms':>9}")
+    sent_tokens = full_tokens = sent_bytes = full_bytes = 0
+    for label, data_url, question in steps:
+        t0 = time.perf_counter()
+        prep = tracker.prepare("bench", decode_data_url(data_url), data_url, question)
+        diff_ms = (time.perf_counter() - t0) * 1000
+        (w, h), full_size = probe_data_url(data_url)
+        full = vision_tokens_for_size(w, h)
+        if prep["action"] == "unchanged" and prep["previous_answer"]:
+            tokens, size = 0, 0
+        else:
+            (cw, ch), size = probe_data_url(prep["data_url"])
+            tokens = vision_tokens_for_size(cw, ch)
+            if prep["overview_url"]:  # Crops go out with a downscaled whole frame
+                (ow, oh), overview_size = probe_data_url(prep["overview_url"])
+                tokens, size = tokens + vision_tokens_for_size(ow, oh), size + overview_size
+        tracker.remember_answer("bench", f"answer to {question}", in_context=True)
+        sent_tokens, full_tokens = sent_tokens + tokens, full_tokens + full
+        sent_bytes, full_bytes = sent_bytes + size, full_bytes + full_size
+        action = "replay" if tokens == 0 else prep["action"]
+        print(f"{label:<28}{action:>11}{size / 1024:>9.0f}{tokens:>8}{full:>13}{diff_ms:>9.1f}")
+
+    print(f"\nTotal: {sent_tokens} vision tokens / {sent_bytes / 1024:.0f} KB sent "
+          f"vs {full_tokens} tokens / {full_bytes / 1024:.0f} KB without change detection")
+
+
+if __name__ == "__main__":
+    main()
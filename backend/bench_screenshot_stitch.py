@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: several scrolled captures of one long page - separate requests vs one batched request.
+
+Renders 2560x1440 captures of a long problem statement / code file (fixed site header and footer,
+centered content column) scrolled by 50-70% of a screen between captures, and compares:
+  - separate:  one /ai/stream call per capture (system prompt re-sent each time + one image each)
+  - one call:  all captures as separate images in one request
+  - packed:    de-duplicated, stitched and packed by screenshot_stitch.pack_screenshots
+Reports vision tokens, total input tokens (with the system prompt), bytes sent and the backend
+stitch time (decode + de-duplicate + pack + encode). Vision latency and cost follow input tokens.
+
+Usage: python bench_screenshot_stitch.py
+Needs numpy and Pillow.
+"""
+import io
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from image_utils import probe_data_url, to_data_url, vision_tokens_for_size
+from screenshot_diff import decode_data_url
+from screenshot_stitch import pack_screenshots
+
+WIDTH, HEIGHT = 2560, 1440
+HEADER, FOOTER = 90, 50
+LINE_HEIGHT = 28
+SYSTEM_PROMPT_TOKENS = 5000  # Roughly what get_system_context() produces with a resume + JD
+
+
+def render_page(lines: int, seed: int) -> Image.Image:
+    """The whole scrollable page body (without header/footer)."""
+    rng = random.Random(seed)
+    page = Image.new("RGB", (WIDTH, lines * LINE_HEIGHT + 80), (250, 250, 250))
+    draw = ImageDraw.Draw(page)
+    for i in range(lines):
+        if rng.random() < 0.12:
+            continue  # Paragraph break
+        indent = rng.choice((0, 0, 40, 80))
+        words = " ".join(rng.choice(("array", "nums", "return", "target", "index", "for", "if", "node", "value",
+                                     "the", "of", "each", "integer", "length", "<=", "10^5"))
+                         for _ in range(rng.randint(6, 18)))
+        draw.text((760 + indent, 40 + i * LINE_HEIGHT), f"{i + 1:>4}  {words}", fill=(25, 25, 25))
+    return page
+
+
+def capture(page: Image.Image, offset: int) -> Image.Image:
+    screen = Image.new("RGB", (WIDTH, HEIGHT), (250, 250, 250))
+    screen.paste(page.crop((0, offset, WIDTH, offset + HEIGHT - HEADER - FOOTER)), (0, HEADER))
+    draw = ImageDraw.Draw(screen)
+    draw.rectangle((0, 0, WIDTH, HEADER), fill=(40, 44, 52))
+    draw.text((40, 35), "LeetCode  |  Problems  |  Contest  |  Discuss", fill=(230, 230, 230))
+    draw.rectangle((0, HEIGHT - FOOTER, WIDTH, HEIGHT), fill=(235, 235, 235))
+    draw.text((40, HEIGHT - 35), "Console   Run   Submit", fill=(60, 60, 60))
+    return screen
+
+
+def scroll_sequence(captures: int, scroll_fraction: float, seed: int) -> list:
+    view = HEIGHT - HEADER - FOOTER
+    step = int(view * scroll_fraction)
+    page = render_page(((captures - 1) * step + view) // LINE_HEIGHT + 2, seed)
+    urls = []
+    for k in range(captures):
+        buf = io.BytesIO()
+        capture(page, k * step).save(buf, format="PNG")
+        urls.append(to_data_url(buf.getvalue(), "image/png"))
+    return urls
+
+
+def image_tokens(urls: list) -> int:
+    return sum(vision_tokens_for_size(*probe_data_url(u)[0]) for u in urls)
+
+
+def main():
+    scenarios = [
+        ("2 captures, 50% scroll", 2, 0.5),
+        ("3 captures, 60% scroll", 3, 0.6),
+        ("4 captures, 70% scroll", 4, 0.7),
+        ("4 captures, 50% scroll", 4, 0.5),
+    ]
+    print(f"{'scenario':<26}{'separate':>10}{'one call':>10}{'packed':>9}{'images':>8}{'KB sent':>14}{'stitch ms':>11}")
+    for label, n, fraction in scenarios:
+        urls = scroll_sequence(n, fraction, seed=n)
+        times = []
+        for _ in range(3):
+            t0 = time.perf_counter()
+            result = pack_screenshots([decode_data_url(u) for u in urls], urls)
+            times.append((time.perf_counter() - t0) * 1000)
+        stitch_ms = sorted(times)[1]
+
+        vision = image_tokens(urls)
+        separate = n * SYSTEM_PROMPT_TOKENS + vision
+        one_call = SYSTEM_PROMPT_TOKENS + vision
+        packed = SYSTEM_PROMPT_TOKENS + image_tokens(result["images"])
+        kb_before = sum(len(u) for u in urls) / 1024
+        kb_after = sum(len(u) for u in result["images"]) / 1024
+        print(f"{label:<26}{separate:>10}{one_call:>10}{packed:>9}{len(result['images']):>8}"
+              f"{kb_before:>7.0f}->{kb_after:<5.0f}{stitch_ms:>11.0f}")
+    print(f"\nInput tokens per question incl. a {SYSTEM_PROMPT_TOKENS}-token system prompt ('separate' = one "
+          f"request per capture). Stitch time is the median of 3 runs, including decoding the captures.")
+
+
+if __name__ == "__main__":
+    main()
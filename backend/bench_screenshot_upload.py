@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: base64-in-JSON screenshot requests vs the multipart /ai/stream/screenshot upload.
+
+Feeds a synthetic 4K PNG screenshot through what the server does before the vision request:
+  - json:      request body -> json.loads -> AIRequest -> estimate_image_tokens -> build_messages
+  - multipart: request body -> Starlette form parser (spool file) -> data URL -> AIRequest -> ... same
+  - binary:    raw image/* body, base64-encoded chunk by chunk as it arrives -> AIRequest -> ... same
+The body arrives in 64 KB chunks like uvicorn delivers it. Reports body size, parse time and
+peak Python memory (tracemalloc) per request.
+
+Usage: python bench_screenshot_upload.py [iterations]
+"""
+import asyncio
+import base64
+import json
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+
+from starlette.requests import Request
+
+from main import AIRequest, build_messages, estimate_image_tokens
+from image_utils import upload_to_data_url, stream_to_data_url
+
+WIDTH, HEIGHT = 3840, 2160
+RECEIVE_CHUNK = 64 * 1024
+BOUNDARY = "----jobbanditbench"
+
+
+def make_png(width: int, height: int) -> bytes:
+    """A screenshot-like RGB PNG: flat panels, 'text' rows of noise, some gradient."""
+    rng = random.Random(3)
+    rows = []
+    for y in range(height):
+        if (y // 18) % 3 != 0 and 200 < y < height - 200:
+            line = rng.randbytes(width * 3 // 4) + bytes((30, 30, 30)) * (width * 3 // 4 // 3 * 3 // 3) 
+        else:
+            shade = 40 + (y * 60 // height)
+            line = bytes((shade, shade, shade + 10)) * width
+        rows.append(b"\x00" + line)
+    raw = zlib.compress(b"".join(rows), 6)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", raw) + chunk(b"IEND", b"")
+
+
+def json_body(png: bytes) -> bytes:
+    data_url = "data:image/png;base64," + base64.b64encode(png).decode()
+    return json.dumps({"transcript": "Solve this problem", "role": "Backend Engineer", "screenshot": data_url}).encode()
+
+
+def multipart_body(png: bytes) -> bytes:
+    parts = []
+    for name, value in (("transcript", "Solve this problem"), ("role", "Backend Engineer")):
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="screenshot"; filename="screen.png"\r\n'
+                 f'Content-Type: image/png\r\n\r\n'.encode() + png + b"\r\n")
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def receiver(body: bytes):
+    chunks = [body[i:i + RECEIVE_CHUNK] for i in range(0, len(body), RECEIVE_CHUNK)]
+
+    async def receive():
+        if chunks:
+            return {"type": "http.request", "body": chunks.pop(0), "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+    return receive
+
+
+def make_request(body: bytes, content_type: str) -> Request:
+    scope = {"type": "http", "method": "POST", "path": "/", "query_string": b"",
+             "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]}
+    return Request(scope, receiver(body))
+
+
+async def json_path(body: bytes):
+    data = await make_request(body, "application/json").json()
+    req = AIRequest(**data)
+    estimate_image_tokens(req.screenshot)
+    return build_messages("system", req.transcript, req.screenshot)
+
+
+async def multipart_path(body: bytes):
+    form = await make_request(body, f"multipart/form-data; boundary={BOUNDARY}").form()
+    data_url, _ = upload_to_data_url(form["screenshot"])
+    await form.close()
+    req = AIRequest(transcript=form["transcript"], role=form["role"], screenshot=data_url)
+    del data_url
+    estimate_image_tokens(req.screenshot)
+    return build_messages("system", req.transcript, req.screenshot)
+
+
+async def binary_path(body: bytes):
+    request = make_request(body, "image/png")
+    data_url, _ = await stream_to_data_url(request.stream(), len(body), "image/png")
+    req = AIRequest(transcript="Solve this problem", role="Backend Engineer", screenshot=data_url)
+    del data_url
+    estimate_image_tokens(req.screenshot)
+    return build_messages("system", req.transcript, req.screenshot)
+
+
+def measure(fn, body: bytes, iterations: int):
+    times = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        asyncio.run(fn(body))
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    asyncio.run(fn(body))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sorted(times)[len(times) // 2], peak
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    png = make_png(WIDTH, HEIGHT)
+    print(f"{WIDTH}x{HEIGHT} PNG screenshot: {len(png) / 1e6:.2f} MB\n")
+    sys.stdout = open(os.devnull, "w")  # Silence per-request [IMAGE TOKENS] logging
+    results = []
+    for label, make_body, fn in (("json+base64", json_body, json_path), ("multipart", multipart_body, multipart_path),
+                                   ("binary", lambda png: png, binary_path)):
+        body = make_body(png)
+        median, peak = measure(fn, body, iterations)
+        results.append((label, len(body), median, peak))
+    sys.stdout = sys.__stdout__
+
+    print(f"{'path':<14}{'body':>10}{'parse (median)':>17}{'peak memory':>14}")
+    for label, size, median, peak in results:
+        print(f"{label:<14}{size / 1e6:>8.2f}MB{median * 1000:>14.1f} ms{peak / 1e6:>11.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
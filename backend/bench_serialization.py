@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serializer backends on the backend's hot paths.
+
+  - chunk framing: one SSE frame per coalesced chunk + the final done event (with session usage)
+  - history dump:  rewriting conversation.json (indent=2) after a turn, and /session/load's response body
+  - profile load:  load_profile() on every request (cold parse vs mtime-cached read_json_file)
+
+Usage: python bench_serialization.py [history_entries]
+Runs every installed backend (orjson, msgspec, json); stdlib json is the old behaviour.
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import serialization
+from serialization import sse_frame, dumps, dumps_pretty, loads, read_json_file, write_json_file
+
+CHUNKS = [("Here's how I'd approach it: a sliding window over the string " * 2)[i:i + 24] for i in range(0, 96, 24)] * 50
+DONE_EVENT = {
+    'done': True, 'request_id': 'a1b2c3d4e5f6', 'model': 'gpt-4o',
+    'usage': {"input_tokens": 48211, "output_tokens": 9120, "cached_input_tokens": 30720, "total_cost": 0.2143, "request_count": 37},
+    'response_in_tokens': 1640, 'response_out_tokens': 310, 'response_cached_tokens': 1280,
+    'response_cost': 0.0061, 'ttft': 0.62, 'total_time': 4.1,
+}
+PROFILE = {
+    "openai_api_key": "sk-" + "x" * 48, "target_role": "Senior Backend Engineer", "target_language": "Python",
+    "resume_text": "Experienced engineer. " * 400, "job_description": "We are hiring. " * 300,
+    "is_esl": False, "short_responses": False, "summary_engine": "api",
+}
+
+
+def make_history(n: int) -> list:
+    return [{
+        'timestamp': f"2026-10-19T10:{i // 60:02d}:{i % 60:02d}", 'question': f"Question {i}: how would you design a rate limiter?",
+        'response': "I'd start with a token bucket per API key, stored in Redis... " * 12, 'had_screenshot': i % 5 == 0,
+        'model': 'gpt-4o', 'response_time': 0.7, 'total_time': 4.2, 'cost': 0.0061,
+        'input_tokens': 1640, 'output_tokens': 310, 'cached_tokens': 1280,
+    } for i in range(n)]
+
+
+def timed(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6  # us per call
+
+
+def old_chunk_frames():
+    for c in CHUNKS:
+        f"data: {json.dumps({'chunk': c})}\n\n".encode()
+    f"data: {json.dumps(DONE_EVENT)}\n\n".encode()
+
+
+def new_chunk_frames():
+    for c in CHUNKS:
+        sse_frame({'chunk': c})
+    sse_frame(DONE_EVENT)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    history = make_history(n)
+    tmp = Path(tempfile.mkdtemp())
+    profile_path, conv_path = tmp / "user_profile.json", tmp / "conversation.json"
+    profile_path.write_text(json.dumps(PROFILE, indent=2), encoding="utf-8")
+
+    print(f"{len(CHUNKS)} chunk frames per answer | {n}-entry history | {profile_path.stat().st_size // 1024} KB profile\n")
+    print(f"{'backend':<10}{'chunk frames':>16}{'history dump':>16}{'history load':>16}{'profile parse':>16}{'profile cached':>16}")
+    print(f"{'json (old)':<10}"
+          f"{timed(old_chunk_frames, 200):>13.1f} us"
+          f"{timed(lambda: conv_path.write_text(json.dumps(history, indent=2), encoding='utf-8'), 20):>13.1f} us"
+          f"{timed(lambda: json.loads(conv_path.read_text(encoding='utf-8')), 20):>13.1f} us"
+          f"{timed(lambda: json.loads(profile_path.read_text(encoding='utf-8')), 200):>13.1f} us"
+          f"{'-':>16}")
+
+    for backend in serialization.AVAILABLE_BACKENDS:
+        serialization.set_backend(backend)
+        raw = profile_path.read_bytes()
+        read_json_file(profile_path)
+        print(f"{backend:<10}"
+              f"{timed(new_chunk_frames, 200):>13.1f} us"
+              f"{timed(lambda: write_json_file(conv_path, history), 20):>13.1f} us"
+              f"{timed(lambda: loads(conv_path.read_bytes()), 20):>13.1f} us"
+              f"{timed(lambda: loads(raw), 200):>13.1f} us"
+              f"{timed(lambda: read_json_file(profile_path), 2000):>13.1f} us")
+
+    # Sanity: every backend produces frames the renderer parses identically
+    for backend in serialization.AVAILABLE_BACKENDS:
+        serialization.set_backend(backend)
+        assert json.loads(sse_frame({'chunk': 'a "quoted" ü\n'})[6:]) == {'chunk': 'a "quoted" ü\n'}
+        assert json.loads(sse_frame(DONE_EVENT)[6:]) == DONE_EVENT
+        assert json.loads(dumps_pretty(history[:3])) == history[:3] == json.loads(dumps(history[:3]))
+
+
+if __name__ == "__main__":
+    main()
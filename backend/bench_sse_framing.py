@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: one SSE frame per upstream delta vs time-window coalesced frames.
+
+Replays a long code answer as 1-4 character deltas at a realistic token rate and reports,
+for each flush policy:
+  - frames sent and frames/sec (each frame = one fetch-reader wakeup + DOM repaint in the renderer)
+  - backend CPU spent framing (process time)
+  - client cost: JSON.parse + text concat per frame, measured with json.loads as a proxy
+
+Usage: python bench_sse_framing.py [deltas_per_second]
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from stream_framing import coalesce_chunks
+
+ANSWER = (
+    "Here's how I'd solve it with a sliding window and a hash map.\n\n"
+    "```python\n"
+    "def length_of_longest_substring(s: str) -> int:\n"
+    "    last_seen = {}  # char -> last index\n"
+    "    start = best = 0\n"
+    "    for i, ch in enumerate(s):\n"
+    "        if ch in last_seen and last_seen[ch] >= start:\n"
+    "            start = last_seen[ch] + 1\n"
+    "        last_seen[ch] = i\n"
+    "        best = max(best, i - start + 1)\n"
+    "    return best\n"
+    "```\n\n"
+) * 6 + "The window only moves forward, so this is O(n) time and O(k) space for k distinct characters."
+
+
+def split_deltas(text: str, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    deltas, i = [], 0
+    while i < len(text):
+        n = rng.choice((1, 1, 2, 2, 3, 4))
+        deltas.append(text[i:i + n])
+        i += n
+    return deltas
+
+
+async def upstream(deltas: list, rate: float):
+    yield {'heartbeat': True}
+    interval = 1.0 / rate
+    next_at = time.perf_counter()
+    for d in deltas:
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield {'chunk': d}
+    yield {'done': True, 'model': 'gpt-4o'}
+
+
+async def run_policy(deltas: list, rate: float, interval_ms: float, max_bytes: int) -> dict:
+    frames = []
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    async for event in coalesce_chunks(upstream(deltas, rate), interval_ms=interval_ms, max_bytes=max_bytes):
+        frames.append(f"data: {json.dumps(event)}\n\n")
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    # Renderer proxy: parse every frame and append its text (what streaming-ai.js does per frame)
+    client0 = time.perf_counter()
+    full = ""
+    for frame in frames:
+        data = json.loads(frame[6:])
+        if 'chunk' in data:
+            full += data['chunk']
+    client = time.perf_counter() - client0
+    assert full == "".join(deltas), "coalescing must not change the text"
+
+    chunk_frames = sum(1 for f in frames if '"chunk"' in f)
+    return {"frames": chunk_frames, "fps": chunk_frames / wall, "cpu_ms": cpu * 1000,
+            "client_ms": client * 1000, "wall_s": wall}
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 400.0
+    deltas = split_deltas(ANSWER)
+    print(f"Replaying {len(deltas)} deltas ({len(ANSWER)} chars) at {rate:.0f} deltas/sec\n")
+    policies = [("per-delta (old)", 0, 0), ("20ms window", 20, 512), ("40ms window", 40, 512), ("80ms window", 80, 1024)]
+    print(f"{'policy':<18}{'frames':>8}{'frames/s':>10}{'backend cpu':>14}{'client parse':>14}{'wall':>8}")
+    for label, interval_ms, max_bytes in policies:
+        r = asyncio.run(run_policy(deltas, rate, interval_ms, max_bytes))
+        print(f"{label:<18}{r['frames']:>8}{r['fps']:>10.1f}{r['cpu_ms']:>11.1f} ms{r['client_ms']:>11.2f} ms{r['wall_s']:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
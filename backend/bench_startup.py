@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backend cold-start import time against the startup budget.
+
+Imports main in fresh interpreters (python -X importtime, each in an empty temp directory so no
+license keys exist yet; one discarded run first so bytecode is cached) and reports the median
+import time of main, its slowest direct imports and the budget verdict. Exits with status 1 when
+the median is over budget, so it can gate CI.
+Heavy SDKs (openai, numpy, Pillow, python-docx, websockets, cryptography) should not appear in
+the list - they are loaded by the startup warm-up instead (see lazy_imports.py).
+
+Most of the budget is the framework floor, not main: on the dev machine the median was 350-450 ms
+between sessions (max ~540 ms on a busy box), of which fastapi's own import is 265-340 ms and the
+pydantic.v1 compat check FastAPI runs while registering the first body route another 20-35 ms.
+main's own share is 60-95 ms, so the margin under 500 ms is only 40-150 ms and swings with machine load.
+
+Usage: python bench_startup.py [--runs 5] [--budget-ms 500] [--top 12]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+DEFERRED = ("openai", "numpy", "PIL", "docx", "websockets", "cryptography", "tiktoken")
+FRAMEWORK = ("fastapi", "pydantic.v1")  # pydantic.v1 is FastAPI's v1-model check on the first body route
+
+
+def import_once():
+    """({module imported directly by main: cumulative us}, main's cumulative us, every module imported)."""
+    with tempfile.TemporaryDirectory() as cwd:
+        code = f"import sys; sys.path.insert(0, {str(BACKEND_DIR)!r}); import main"
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd,
+                              capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{proc.stderr[-2000:]}")
+    direct, total, modules = {}, 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.add(name.strip())
+        if depth == 1:
+            direct[name.strip()] = int(cumulative)  # Parents are printed after their children
+        elif depth == 0 and name.strip() == "main":
+            total = int(cumulative)
+        elif depth == 0:
+            direct.clear()  # Children of some other top-level import (site, encodings, ...)
+    return direct, total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "500")))
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    import_once()
+    runs = [import_once() for _ in range(args.runs)]
+    totals = [total / 1000 for _, total, _ in runs]
+    median = statistics.median(totals)
+    per_module = {name: statistics.median(r[0].get(name, 0) for r in runs) / 1000 for name in runs[0][0]}
+
+    print(f"import main: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}) | budget {args.budget_ms:.0f} ms")
+    framework = sum(per_module.get(name, 0) for name in FRAMEWORK)
+    print(f"framework (fastapi + pydantic.v1) {framework:.0f} ms, main's own code {median - framework:.0f} ms, "
+          f"margin {args.budget_ms - median:.0f} ms")
+    print(f"\n{'imported by main':<40}{'ms':>8}")
+    for name, ms in sorted(per_module.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<40}{ms:>8.1f}")
+    eager = sorted({name.split(".")[0] for r in runs for name in r[2]} & set(DEFERRED))
+    if eager:
+        print(f"\nWARNING: imported at startup although deferred: {', '.join(eager)}")
+    verdict = median <= args.budget_ms
+    print(f"\n{'OK' if verdict else 'OVER BUDGET'}: {median:.0f} ms vs {args.budget_ms:.0f} ms")
+    sys.exit(0 if verdict else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: local extractive summarizer vs gpt-4o-mini summaries for evicted turns.
+Compares summary token count and wall time per eviction.
+
+Usage: python bench_summarizer.py [iterations]
+The API engine only runs when OPENAI_API_KEY is set (or present in .env).
+"""
+import asyncio
+import os
+import sys
+import time
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except:
+    pass
+
+from local_summarizer import summarize_turns_locally
+
+SAMPLE_TURNS = [
+    [
+        {"role": "user", "content": "Tell me about yourself and your most recent role."},
+        {"role": "assistant", "content": (
+            "Sure. I'm a backend engineer with six years of experience, mostly in Python and Go. "
+            "At Acme I led the migration of our order pipeline from a cron-based batch job to Kafka streams, "
+            "which cut end-to-end latency from 15 minutes to under 5 seconds. "
+            "I also own our FastAPI gateway and the Postgres schema behind it. "
+            "Before that I worked on data tooling at a fintech startup, building ETL jobs in Airflow."
+        )},
+    ],
+    [
+        {"role": "user", "content": "How would you find two numbers in an array that add up to a target?"},
+        {"role": "assistant", "content": (
+            "I'd use a hash map so we only walk the array once. "
+            "For each number I check whether `target - num` is already in the map; if it is, we're done. "
+            "Otherwise I store the number with its index. That gives O(n) time and O(n) space.\n\n"
+            "```python\n"
+            "def two_sum(nums: list[int], target: int) -> list[int]:\n"
+            "    seen = {}  # value -> index\n"
+            "    for i, num in enumerate(nums):\n"
+            "        if target - num in seen:\n"
+            "            return [seen[target - num], i]\n"
+            "        seen[num] = i\n"
+            "    return []\n"
+            "```\n\n"
+            "The brute force version with two loops would be O(n^2), so the hash map is the better trade-off."
+        )},
+    ],
+    [
+        {"role": "user", "content": "Describe a time you had a conflict with a teammate."},
+        {"role": "assistant", "content": (
+            "On my last team a colleague wanted to rewrite our retry logic from scratch right before a release. "
+            "I thought it was too risky, so I suggested we pair for an hour and list the actual bugs. "
+            "We found that two small fixes in `RetryPolicy.backoff()` solved most of the problems. "
+            "We shipped those fixes, and scheduled the rewrite for the next sprint with proper tests. "
+            "It taught me to turn disagreements into a shared list of facts."
+        )},
+    ],
+]
+
+
+def run_local(iterations: int):
+    from main import count_tokens
+    times, tokens = [], []
+    for turns in SAMPLE_TURNS:
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            summary = summarize_turns_locally(turns)
+            times.append(time.perf_counter() - t0)
+        tokens.append(count_tokens(summary))
+        print(f"  local summary: {summary[:160]}{'...' if len(summary) > 160 else ''}")
+    return times, tokens
+
+
+def run_api():
+    from main import summarize_old_turns, count_tokens
+    api_key = os.getenv("OPENAI_API_KEY")
+    times, tokens = [], []
+    for turns in SAMPLE_TURNS:
+        t0 = time.perf_counter()
+        summary = asyncio.run(summarize_old_turns(turns, api_key, engine="api"))
+        times.append(time.perf_counter() - t0)
+        tokens.append(count_tokens(summary))
+        print(f"  api summary:   {summary[:160]}{'...' if len(summary) > 160 else ''}")
+    return times, tokens
+
+
+def report(label: str, times: list, tokens: list):
+    avg_ms = sum(times) / len(times) * 1000
+    worst_ms = max(times) * 1000
+    avg_tok = sum(tokens) / len(tokens)
+    print(f"{label:<8} avg {avg_ms:9.2f} ms | worst {worst_ms:9.2f} ms | avg summary {avg_tok:6.1f} tokens")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"Summarizing {len(SAMPLE_TURNS)} evicted turns ({iterations} local iterations each)\n")
+
+    local_times, local_tokens = run_local(iterations)
+    results = [("local", local_times, local_tokens)]
+
+    if os.getenv("OPENAI_API_KEY"):
+        api_times, api_tokens = run_api()
+        results.append(("api", api_times, api_tokens))
+    else:
+        print("\n[SKIP] OPENAI_API_KEY not set - API engine not benchmarked")
+
+    print()
+    for label, times, tokens in results:
+        report(label, times, tokens)
+
+
+if __name__ == "__main__":
+    main()
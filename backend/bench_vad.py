@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Replay harness for the /realtime voice-activity gate.
+
+Feeds WAV recordings through VoiceActivityGate exactly like /realtime receives audio (PCM16 mono
+24 kHz, 1024-sample chunks as sent by the frontend's ScriptProcessor) and reports per file:
+audio vs forwarded seconds, fraction suppressed, upstream base64 bytes, speech segments with the
+time each commit is issued, and gate CPU time per second of audio.
+Other sample rates/channel counts are downmixed and resampled first.
+Without arguments a synthetic recording is used (speech-like bursts, pauses, a click, fan noise).
+
+Usage: python bench_vad.py [recording.wav ...] [--out DIR]   (--out writes the forwarded audio)
+Needs numpy.
+"""
+import argparse
+import base64
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from voice_activity import SAMPLE_RATE, VoiceActivityGate
+
+CHUNK_SAMPLES = 1024
+
+
+def read_wav(path: Path) -> np.ndarray:
+    """PCM16 mono samples at SAMPLE_RATE."""
+    with wave.open(str(path), "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) * 256
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 65536
+    else:
+        raise ValueError(f"{path}: unsupported sample width {width}")
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(int(len(samples) * SAMPLE_RATE / rate)) * rate / SAMPLE_RATE
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def write_wav(path: Path, pcm: bytes):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm)
+
+
+def synthetic_recording(seed: int = 7) -> np.ndarray:
+    """~40 s: an interviewer question, a long pause, an answer, a click, fan noise, another answer."""
+    rng = np.random.default_rng(seed)
+    total = np.zeros(SAMPLE_RATE * 40, dtype=np.float32)
+    total += rng.normal(0, 25, len(total))  # Room noise, about -62 dBFS
+
+    def speech(start: float, seconds: float, f0: float, level: float):
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        pitch = f0 * (1 + 0.08 * np.sin(2 * np.pi * 0.7 * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+        syllables = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, 6)), 0, None) ** 0.5  # ~4 syllables/s
+        words = (rng.random(int(seconds * 3) + 1) > 0.15).repeat(SAMPLE_RATE // 3 + 1)[:len(t)]  # Short gaps
+        i = int(start * SAMPLE_RATE)
+        total[i:i + len(t)] += level * voiced * syllables * words
+
+    speech(1.0, 4.5, 130, 6000)     # Question
+    speech(12.0, 8.0, 210, 4000)    # Answer after a long thinking pause
+    i = int(22.5 * SAMPLE_RATE)
+    total[i:i + 120] += 12000       # Click / key press
+    i = int(25.0 * SAMPLE_RATE)
+    total[i:i + 3 * SAMPLE_RATE] += rng.normal(0, 300, 3 * SAMPLE_RATE)  # Fan noise burst
+    speech(31.0, 6.0, 140, 5000)    # Follow-up
+    return np.clip(total, -32768, 32767).astype(np.int16)
+
+
+def replay(samples: np.ndarray):
+    gate = VoiceActivityGate()
+    pcm = samples.tobytes()
+    chunk_bytes = CHUNK_SAMPLES * 2
+    forwarded = bytearray()
+    upstream_b64 = 0
+    timeline = []
+    cpu = 0.0
+    segment_start = None
+    for offset in range(0, len(pcm), chunk_bytes):
+        chunk = base64.b64encode(pcm[offset:offset + chunk_bytes]).decode()  # What the client sends
+        t0 = time.perf_counter()
+        actions = gate.process(base64.b64decode(chunk))
+        cpu += time.perf_counter() - t0
+        now = (offset + chunk_bytes) / 2 / SAMPLE_RATE
+        for kind, payload in actions:
+            if kind == "audio":
+                if segment_start is None:
+                    segment_start = now
+                forwarded += payload
+                upstream_b64 += len(base64.b64encode(payload))
+            else:
+                timeline.append((segment_start, now, kind))
+                segment_start = None
+    for _, _ in gate.flush():
+        timeline.append((segment_start, len(pcm) / 2 / SAMPLE_RATE, "commit (end of stream)"))
+    return gate.stats(), bytes(forwarded), upstream_b64, timeline, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wav", nargs="*", type=Path)
+    parser.add_argument("--out", type=Path, help="write the forwarded audio of each file here")
+    args = parser.parse_args()
+
+    recordings = [(path.name, read_wav(path)) for path in args.wav] or [("synthetic", synthetic_recording())]
+    for name, samples in recordings:
+        stats, forwarded, upstream_b64, timeline, cpu = replay(samples)
+        raw_b64 = len(base64.b64encode(samples.tobytes()))
+        print(f"\n{name}: {stats['audio_seconds']:.1f} s audio -> {stats['forwarded_seconds']:.1f} s forwarded "
+              f"({stats['suppressed_fraction']:.1%} suppressed), noise floor {stats['noise_floor_db']} dBFS")
+        print(f"  upstream: {upstream_b64 / 1024:.0f} KB instead of {raw_b64 / 1024:.0f} KB | "
+              f"{stats['commits']} commits, {stats['discarded']} discarded | "
+              f"gate CPU {cpu * 1000 / max(stats['audio_seconds'], 1e-9):.2f} ms per audio second")
+        for start, end, kind in timeline:
+            print(f"  {start:7.2f}s - {end:7.2f}s  {kind}")
+        if args.out:
+            args.out.mkdir(parents=True, exist_ok=True)
+            write_wav(args.out / f"{Path(name).stem}.gated.wav", forwarded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# backend/blob_store.py
+"""
+Content-addressed store for large text bodies (resumes, job descriptions).
+
+Each distinct text is written once as <directory>/<sha[:2]>/<sha>.txt, named by the SHA-256 of
+its UTF-8 bytes; session.json and user_profile.json keep only the hash. References are counted
+per owner ("profile", "session:<name>") in <directory>/refs.json: retain() replaces everything an
+owner references, release() drops it, and a blob nobody references any more is deleted.
+Recently used bodies are kept in memory, so resolving a hash on every request costs no disk I/O.
+externalize()/resolve() swap the TEXT_FIELDS of a session/profile dict for "<field>_sha256"
+references and back - used by the API and by process_resume.py, so both write the same layout.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from serialization import dumps, loads
+
+REFS_FILE = "refs.json"
+TEXT_FIELDS = ("resume_text", "job_description")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, directory: Path, max_memory_entries: int = 16):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._refs: Optional[Dict[str, list]] = None  # sha -> owners, loaded on first use
+        self._lock = threading.RLock()
+        self._deferred = 0        # Open deferred_refs() blocks
+        self._refs_dirty = False
+
+    def _path(self, sha: str) -> Path:
+        return self.directory / sha[:2] / f"{sha}.txt"
+
+    def _remember(self, sha: str, text: str):
+        self._memory[sha] = text
+        self._memory.move_to_end(sha)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load_refs(self) -> Dict[str, list]:
+        if self._refs is None:
+            try:
+                self._refs = loads((self.directory / REFS_FILE).read_bytes())
+            except FileNotFoundError:
+                self._refs = {}
+            except Exception as e:
+                print(f"[BLOB STORE] Unreadable {REFS_FILE} ({e}) - starting a new one")
+                self._refs = {}
+        return self._refs
+
+    def _save_refs(self):
+        if self._deferred:
+            self._refs_dirty = True
+            return
+        self._refs_dirty = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"{REFS_FILE}.tmp"
+        tmp.write_bytes(dumps(self._refs))
+        os.replace(tmp, self.directory / REFS_FILE)
+
+    @contextmanager
+    def deferred_refs(self):
+        """Batch reference updates (bulk ingestion): refs.json is written once at the end, not per call"""
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                if not self._deferred and self._refs_dirty:
+                    self._save_refs()
+
+    def put(self, text: str) -> str:
+        """Store text (once) and return its hash. Retain it afterwards or it may be collected."""
+        sha = text_hash(text)
+        with self._lock:
+            path = self._path(sha)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(text.encode("utf-8"))
+                os.replace(tmp, path)
+            self._remember(sha, text)
+        return sha
+
+    def get(self, sha: str) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(sha)
+            if text is not None:
+                self._memory.move_to_end(sha)
+                return text
+            try:
+                text = self._path(sha).read_bytes().decode("utf-8")
+            except (FileNotFoundError, ValueError):
+                return None
+            self._remember(sha, text)
+            return text
+
+    def retain(self, owner: str, shas: Iterable[Optional[str]]):
+        """Make owner reference exactly these blobs (None entries are ignored)."""
+        wanted = {sha for sha in shas if sha}
+        with self._lock:
+            refs = self._load_refs()
+            current = {sha for sha, owners in refs.items() if owner in owners}
+            if current == wanted:
+                return
+            for sha in wanted - current:
+                refs.setdefault(sha, []).append(owner)
+            self._drop(owner, current - wanted)
+            self._save_refs()
+
+    def release(self, owner: str):
+        """Drop every reference of owner, deleting blobs that become unreferenced."""
+        with self._lock:
+            refs = self._load_refs()
+            held = {sha for sha, owners in refs.items() if owner in owners}
+            if held:
+                self._drop(owner, held)
+                self._save_refs()
+
+    def _drop(self, owner: str, shas: Iterable[str]):
+        refs = self._refs
+        for sha in shas:
+            owners = [o for o in refs.get(sha, []) if o != owner]
+            if owners:
+                refs[sha] = owners
+                continue
+            refs.pop(sha, None)
+            self._memory.pop(sha, None)
+            try:
+                self._path(sha).unlink()
+            except FileNotFoundError:
+                pass
+
+    def externalize(self, data: Dict[str, Any], owner: str) -> Dict[str, Any]:
+        """Copy of data with the large text fields replaced by blob references held by owner"""
+        out = dict(data)
+        refs = []
+        for field in TEXT_FIELDS:
+            if field not in out:
+                refs.append(out.get(f"{field}_sha256"))  # Reference kept as it is
+                continue
+            text = out.pop(field) or ""
+            sha = self.put(text) if text else None
+            out[f"{field}_sha256"] = sha
+            refs.append(sha)
+        self.retain(owner, refs)
+        return out
+
+    def resolve(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of data with blob references resolved back into the text fields"""
+        out = dict(data)
+        for field in TEXT_FIELDS:
+            if field in out:
+                out.pop(f"{field}_sha256", None)  # Inline text (older file, external edit) wins over a reference
+                continue
+            if f"{field}_sha256" not in out:
+                continue
+            sha = out[f"{field}_sha256"]
+            text = self.get(sha) if sha else ""
+            if text is None:
+                print(f"[BLOB STORE] Missing blob {sha[:12]} for {field}")
+                out[f"{field}_sha256"] = None
+                text = ""
+            out[field] = text
+        return out
+
+    def refcount(self, sha: str) -> int:
+        with self._lock:
+            return len(self._load_refs().get(sha, []))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            refs = self._load_refs()
+            return {"blobs": len(refs), "references": sum(len(o) for o in refs.values()),
+                    "memory_entries": len(self._memory)}
@@ -0,0 +1,81 @@
+# backend/channel_hub.py
+"""
+Fan-out for the persistent /channel WebSocket.
+
+Each renderer window keeps one socket open and subscribes to topics:
+  - "answers": answer.start / answer.chunk / answer.done / answer.error / answer.cancelled
+  - "usage":   usage snapshots pushed after every update_usage() and reset
+  - "session": session.created / saved / loaded / ended / deleted, conversation.cleared
+publish() never awaits: every client has its own outbound queue drained by a writer task, so
+a slow or stalled window can't hold up the answer stream for the others.
+"""
+import asyncio
+from typing import Any, Dict, Iterable, Optional
+
+from serialization import dumps
+
+CHANNEL_TOPICS = ("answers", "usage", "session")
+MAX_PENDING_MESSAGES = 2000  # A client this far behind is dropped rather than buffered forever
+
+
+class ChannelClient:
+    def __init__(self, ws, client_id: str, topics: Optional[Iterable[str]] = None):
+        self.ws = ws
+        self.client_id = client_id
+        self.topics = set(topics or CHANNEL_TOPICS)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def subscribe(self, topics: Iterable[str]):
+        self.topics = {t for t in topics if t in CHANNEL_TOPICS}
+
+    def push(self, message: Dict[str, Any]):
+        if self.closed:
+            return
+        if self.queue.qsize() >= MAX_PENDING_MESSAGES:
+            print(f"[CHANNEL] Client {self.client_id} is {MAX_PENDING_MESSAGES} messages behind - disconnecting")
+            self.close()
+            return
+        self.queue.put_nowait(message)
+
+    async def _write(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                if message is None:
+                    break
+                await self.ws.send_text(dumps(message).decode())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"[CHANNEL] Send to {self.client_id} failed: {e}")
+        self.closed = True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put_nowait(None)  # Let queued messages drain, then stop the writer
+
+
+class ChannelHub:
+    def __init__(self):
+        self.clients: Dict[str, ChannelClient] = {}
+
+    def attach(self, ws, client_id: str, topics: Optional[Iterable[str]] = None) -> ChannelClient:
+        client = ChannelClient(ws, client_id, topics)
+        self.clients[client_id] = client
+        print(f"[CHANNEL] Client {client_id} connected ({len(self.clients)} open)")
+        return client
+
+    def detach(self, client: ChannelClient):
+        client.close()
+        client._writer.cancel()
+        self.clients.pop(client.client_id, None)
+        print(f"[CHANNEL] Client {client.client_id} disconnected ({len(self.clients)} open)")
+
+    def publish(self, topic: str, message: Dict[str, Any]):
+        """Queue a message for every client subscribed to topic. Safe to call from sync code."""
+        for client in list(self.clients.values()):
+            if topic in client.topics:
+                client.push(message)
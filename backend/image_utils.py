@@ -0,0 +1,155 @@
+# backend/image_utils.py
+"""
+Screenshot helpers that work on raw bytes: read image dimensions from the PNG/JPEG/GIF header
+(no decode, no Pillow), compute vision token counts from them, and build the data URL for the
+vision request in a single encode.
+"""
+import base64
+import binascii
+import math
+import struct
+from typing import Optional, Tuple
+
+# Only this much of a base64 data URL is decoded to find the dimensions
+HEADER_PROBE_BYTES = 64 * 1024
+
+# GPT-4o "high" detail: fit in 2048x2048, then shortest side down to 768, 512px tiles
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+VISION_TILE = 512
+VISION_BASE_TOKENS = 85
+VISION_TILE_TOKENS = 170
+
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def sniff_mime(data: bytes) -> str:
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def read_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header, or None if the format/header isn't recognised."""
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])
+        if data[:2] == b"\xff\xd8":
+            i = 2
+            while i + 9 < len(data):
+                if data[i] != 0xFF:
+                    i += 1
+                    continue
+                marker = data[i + 1]
+                if marker in _JPEG_SOF:
+                    h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                    return w, h
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    i += 2
+                    continue
+                i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    except struct.error:
+        pass
+    return None
+
+
+def split_data_url(data_url: str) -> Tuple[int, int]:
+    """Return (payload offset, payload length) of a base64 data URL without slicing it."""
+    marker = data_url.find("base64,")
+    start = marker + 7 if marker != -1 else 0
+    return start, len(data_url) - start
+
+
+def probe_data_url(data_url: str) -> Tuple[Optional[Tuple[int, int]], int]:
+    """Image size and decoded byte count of a base64 data URL, decoding only the header."""
+    start, length = split_data_url(data_url)
+    probe = data_url[start:start + min(length, HEADER_PROBE_BYTES * 4 // 3) // 4 * 4]
+    try:
+        header = base64.b64decode(probe)
+    except (binascii.Error, ValueError):
+        header = b""
+    return read_image_size(header), length * 3 // 4
+
+
+def vision_tokens_for_size(width: int, height: int) -> int:
+    """Vision input tokens for an image of this size at high detail."""
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, VISION_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / VISION_TILE) * math.ceil(height / VISION_TILE)
+    return VISION_BASE_TOKENS + VISION_TILE_TOKENS * tiles
+
+
+class DataUrlWriter:
+    """Base64-encodes image bytes as they arrive into one preallocated data URL buffer, so the
+    raw image never sits in memory next to its base64 copy. Chunks may be any size."""
+    def __init__(self, size_hint: Optional[int] = None, mime: Optional[str] = None):
+        self.size_hint = size_hint
+        self.mime = mime if mime and mime.startswith("image/") else None
+        self.size = 0
+        self._buf = None
+        self._pos = 0
+        self._carry = b""
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        if self._buf is None:
+            prefix = b"data:" + (self.mime or sniff_mime(chunk)).encode() + b";base64,"
+            self._buf = bytearray(len(prefix) + ((self.size_hint or 0) + 2) // 3 * 4)
+            self._buf[:len(prefix)] = prefix
+            self._pos = len(prefix)
+        self.size += len(chunk)
+        if self._carry:
+            chunk = self._carry + chunk
+        cut = len(chunk) - len(chunk) % 3  # Only whole 3-byte groups - no padding mid-stream
+        self._carry = chunk[cut:]
+        self._put(binascii.b2a_base64(chunk[:cut] if cut != len(chunk) else chunk, newline=False))
+
+    def _put(self, encoded: bytes):
+        end = self._pos + len(encoded)
+        self._buf[self._pos:end] = encoded  # Grows the buffer if the size hint was short or missing
+        self._pos = end
+
+    def finish(self) -> str:
+        if self._buf is None:
+            return ""
+        if self._carry:
+            self._put(binascii.b2a_base64(self._carry, newline=False))
+        if self._pos != len(self._buf):
+            del self._buf[self._pos:]  # Size hint was too generous (e.g. Content-Length of a chunked body)
+        return self._buf.decode("ascii")
+
+
+def upload_to_data_url(upload, chunk_size: int = 3 * 64 * 1024) -> Tuple[str, int]:
+    """Encode a multipart UploadFile as a data URL. Returns (data URL, image byte count)."""
+    f = upload.file  # Local spool file - read directly, a threadpool hop per chunk costs more than the read
+    f.seek(0, 2)
+    writer = DataUrlWriter(f.tell(), upload.content_type)
+    f.seek(0)
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        writer.write(chunk)
+    return writer.finish(), writer.size
+
+
+async def stream_to_data_url(chunks, size_hint: Optional[int] = None, mime: Optional[str] = None) -> Tuple[str, int]:
+    """Encode a raw request body (async iterator of bytes) as a data URL while it is received."""
+    writer = DataUrlWriter(size_hint, mime)
+    async for chunk in chunks:
+        writer.write(chunk)
+    return writer.finish(), writer.size
+
+
+def to_data_url(data: bytes, mime: Optional[str] = None) -> str:
+    """Encode raw image bytes as a data URL for the vision request (one base64 pass, one decode)."""
+    mime = mime if mime and mime.startswith("image/") else sniff_mime(data)
+    return (b"data:" + mime.encode() + b";base64," + base64.b64encode(data)).decode("ascii")
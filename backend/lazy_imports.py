@@ -0,0 +1,68 @@
+# backend/lazy_imports.py
+"""
+Deferred imports for heavy dependencies (openai, numpy, Pillow, python-docx, websockets).
+
+The backend must bind its port quickly - the Electron shell waits on it at launch - so modules
+that are only needed by one subsystem are not imported at module load:
+  np = lazy_module("numpy")        # Imported on first attribute access (np.zeros, ...)
+  HAVE_NUMPY = available("numpy")  # Checks the package is installed without importing it
+After the first access a proxy copies the module's attributes onto itself, so later lookups cost
+the same as on the real module. warm() imports modules ahead of time (used by the background
+warm-up) and loaded_modules() reports what has been imported so far.
+"""
+import importlib
+import importlib.util
+import threading
+import time
+from typing import Dict, Optional
+
+_lock = threading.Lock()
+_load_times: Dict[str, float] = {}  # module name -> import milliseconds (for modules imported here)
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = warm(self.__dict__["_lazy_name"])
+            for key, value in module.__dict__.items():  # Later lookups skip __getattr__
+                self.__dict__.setdefault(key, value)      # (attributes patched on the proxy win)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_lazy_name']!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def available(*names: str) -> bool:
+    """True if every top-level package is installed (nothing is imported)."""
+    try:
+        return all(importlib.util.find_spec(name) is not None for name in names)
+    except (ImportError, ValueError):
+        return False
+
+
+def warm(name: str):
+    """Import a module now and remember how long it took."""
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _load_times.setdefault(name, round((time.perf_counter() - start) * 1000, 1))
+        return module
+
+
+def loaded_modules() -> Dict[str, Optional[float]]:
+    """Modules imported through this helper, with their import time in ms."""
+    return dict(_load_times)
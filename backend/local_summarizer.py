@@ -0,0 +1,169 @@
+# backend/local_summarizer.py
+"""
+Zero-cost, in-process summarizer for conversation turns evicted from the rolling window.
+
+Selected with summary_engine="local". Instead of asking gpt-4o-mini for a 2-3 sentence
+note, it ranks the sentences of each exchange (extractive summarization) and keeps:
+  - the question, trimmed
+  - the highest-scoring answer sentences (term frequency + identifier bonus + lead bonus)
+  - code blocks compressed down to their signatures (def/class/function/...)
+  - the code identifiers and keywords the exchange mentioned
+Runs in a few milliseconds with no network round-trip and no API cost.
+"""
+import re
+from collections import Counter
+
+# Sentences picked per answer and words kept per question
+MAX_ANSWER_SENTENCES = 2
+MAX_QUESTION_WORDS = 30
+MAX_KEY_TERMS = 8
+MAX_SIGNATURES = 4
+
+_CODE_BLOCK_RE = re.compile(r"```([\w+#.-]*)[^\n]*\n(.*?)(?:```|$)", re.DOTALL)
+_INLINE_CODE_RE = re.compile(r"`([^`\n]{1,60})`")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*")
+
+# Lines that define something in the common interview languages
+_SIGNATURE_RE = re.compile(
+    r"^\s*(?:"
+    r"(?:async\s+)?def\s+\w+|class\s+\w+|"                        # Python
+    r"(?:export\s+)?(?:async\s+)?function\s*\w*\s*\(|"            # JavaScript / TypeScript
+    r"(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?\(.*\)\s*=>|"
+    r"(?:(?:public|private|protected|static|final)\s+)+[\w<>\[\],]+\s+\w+\s*\(|"  # Java / C#
+    r"(?:func|fn)\s+\w+|"                                         # Go / Rust
+    r"(?:interface|struct|enum|type)\s+\w+|"
+    r"CREATE\s+(?:TABLE|VIEW|INDEX|FUNCTION)\b|SELECT\b|WITH\s+\w+\s+AS\b"  # SQL
+    r")",
+    re.IGNORECASE,
+)
+
+# Identifier shapes worth keeping verbatim: snake_case, camelCase, PascalCase, dotted.path, Big-O
+_IDENTIFIER_RE = re.compile(
+    r"\b(?:[a-z]+_[a-z0-9_]+|[a-z]+[A-Z]\w*|[A-Z][a-z0-9]+[A-Z]\w*|\w+\.\w+\(?\)?|O\([^)]{1,12}\))"
+)
+
+_STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just let me
+more most my no nor not now of off on once only or other our ours out over own same she
+should so some such than that the their theirs them then there these they this those through
+to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself really actually basically like well so yeah okay thing things
+think going get got make made use used using way one two first also sure here's let's i'm
+it's that's there's we're you're i've i'd i'll
+""".split())
+
+
+def _split_code(text: str):
+    """Separate fenced code blocks from prose. Returns (prose, [(lang, code), ...])."""
+    blocks = [(m.group(1) or "", m.group(2)) for m in _CODE_BLOCK_RE.finditer(text)]
+    prose = _CODE_BLOCK_RE.sub(" ", text)
+    return prose, blocks
+
+
+def _code_signatures(lang: str, code: str) -> list:
+    """Compress a code block to its definition lines (falls back to the first line)."""
+    sigs = []
+    for line in code.splitlines():
+        if _SIGNATURE_RE.match(line):
+            sig = line.strip().rstrip("{:").strip()
+            if sig and sig not in sigs:
+                sigs.append(sig[:100])
+        if len(sigs) >= MAX_SIGNATURES:
+            break
+    if not sigs:
+        first = next((l.strip() for l in code.splitlines() if l.strip()), "")
+        if first:
+            sigs.append(first[:100])
+    return sigs
+
+
+def _sentences(prose: str) -> list:
+    parts = (s.strip(" -*#>\t") for s in _SENTENCE_SPLIT_RE.split(prose))
+    return [s for s in parts if len(s.split()) >= 3]
+
+
+def _terms(text: str) -> list:
+    return [w.lower() for w in _WORD_RE.findall(text) if w.lower() not in _STOPWORDS and len(w) > 2]
+
+
+def _rank_sentences(sentences: list, question_terms: set, freqs: Counter) -> list:
+    """Score sentences by term frequency, identifier density, overlap with the question and position."""
+    scored = []
+    for idx, sent in enumerate(sentences):
+        terms = _terms(sent)
+        if not terms:
+            continue
+        tf_score = sum(freqs[t] for t in terms) / (len(terms) ** 0.5)
+        ident_bonus = 1.5 * len(_IDENTIFIER_RE.findall(sent)) + 1.0 * len(_INLINE_CODE_RE.findall(sent))
+        overlap_bonus = 2.0 * len(question_terms.intersection(terms))
+        lead_bonus = 2.0 if idx == 0 else 0.0
+        scored.append((tf_score + ident_bonus + overlap_bonus + lead_bonus, idx, sent))
+    top = sorted(scored, reverse=True)[:MAX_ANSWER_SENTENCES]
+    # Keep the original order so the summary reads naturally
+    return [sent for _, _, sent in sorted(top, key=lambda s: s[1])]
+
+
+def _trim_words(text: str, limit: int) -> str:
+    words = text.split()
+    return " ".join(words[:limit]) + ("..." if len(words) > limit else "")
+
+
+def _key_terms(text: str, code_blocks: list) -> list:
+    """Identifiers and keywords mentioned in the exchange, most frequent first."""
+    found = Counter()
+    for m in _INLINE_CODE_RE.findall(text):
+        found[m.strip()] += 2
+    for m in _IDENTIFIER_RE.findall(_CODE_BLOCK_RE.sub(" ", text)):
+        found[m] += 1
+    for lang, _ in code_blocks:
+        if lang:
+            found[lang] += 1
+    return [t for t, _ in found.most_common(MAX_KEY_TERMS)]
+
+
+def summarize_exchange(question: str, answer: str) -> str:
+    """Summarize a single Q&A exchange into one compact line."""
+    prose, code_blocks = _split_code(answer)
+    sentences = _sentences(prose)
+    freqs = Counter(_terms(question + " " + prose))
+    picked = _rank_sentences(sentences, set(_terms(question)), freqs)
+
+    parts = []
+    if question.strip():
+        parts.append(f"Q: {_trim_words(question.strip(), MAX_QUESTION_WORDS)}")
+    if picked:
+        parts.append("A: " + " ".join(picked))
+    sigs = []
+    for lang, code in code_blocks:
+        sigs.extend(f"{lang + ' ' if lang else ''}{s}".strip() for s in _code_signatures(lang, code))
+    if sigs:
+        parts.append("Code: " + "; ".join(sigs[:MAX_SIGNATURES]))
+    terms = _key_terms(question + "\n" + answer, code_blocks)
+    if terms:
+        parts.append("Terms: " + ", ".join(terms))
+    return " | ".join(parts)
+
+
+def summarize_turns_locally(turns: list) -> str:
+    """Summarize evicted conversation turns ({"role", "content"} dicts) without any API call.
+    Consecutive user/assistant messages are paired into exchanges; one line per exchange.
+    """
+    lines = []
+    question = ""
+    for msg in turns:
+        content = msg.get("content", "")
+        if not isinstance(content, str):
+            content = str(content)
+        if msg.get("role") == "user":
+            if question:  # Unanswered question - keep it on its own
+                lines.append(summarize_exchange(question, ""))
+            question = content
+        else:
+            lines.append(summarize_exchange(question, content))
+            question = ""
+    if question:
+        lines.append(summarize_exchange(question, ""))
+    return "\n".join(l for l in lines if l)
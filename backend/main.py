@@ -1,20 +1,35 @@
 # backend/main.py
+import time
+STARTUP_T0 = time.perf_counter()
 print("[STARTUP] Initializing Interview Assistant Backend...")
 from fastapi import FastAPI, WebSocket, Request
 
 from fastapi.responses import StreamingResponse
-from openai import OpenAI
 import os
 import sys
 import io
 
 import json
 import asyncio
-import websockets
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Union
+from collections import OrderedDict
+import hashlib
+
+from image_utils import HEADER_PROBE_BYTES, read_image_size, probe_data_url, vision_tokens_for_size, upload_to_data_url, stream_to_data_url
+
+# Heavy SDKs are imported on first use (or by the startup warm-up) - see lazy_imports.py
+from lazy_imports import available, lazy_module, loaded_modules, warm
+websockets = lazy_module("websockets")
+
+def OpenAI(*args, **kwargs):
+    """openai.OpenAI - the SDK takes ~0.7 s to import, so it is not imported at startup"""
+    return warm("openai").OpenAI(*args, **kwargs)
+
+def AsyncOpenAI(*args, **kwargs):
+    return warm("openai").AsyncOpenAI(*args, **kwargs)
 
 # Token counting for cost estimation (Lazy Loaded)
 _encoding = None
@@ -36,17 +51,19 @@ def get_encoding():
 session_usage = {
     "input_tokens": 0,
     "output_tokens": 0,
+    "cached_input_tokens": 0,  # Input tokens served from the provider's prompt cache
     "total_cost": 0.0,
     "request_count": 0
 }
 
 # GPT pricing (per 1M tokens) - Updated December 2025
+# "cached_input" is the discounted rate for prompt tokens served from the provider's prompt cache
 PRICING = {
-    "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
-    "gpt-4o-mini": {"input": 0.60, "output": 2.40},
-    "gpt-4o": {"input": 2.50, "output": 10.00},
-    "gpt-5-nano": {"input": 0.15, "output": 0.60},
-    "gpt-5-mini": {"input": 0.50, "output": 1.50}
+    "gpt-3.5-turbo": {"input": 0.50, "cached_input": 0.50, "output": 1.50},
+    "gpt-4o-mini": {"input": 0.60, "cached_input": 0.30, "output": 2.40},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-5-nano": {"input": 0.15, "cached_input": 0.015, "output": 0.60},
+    "gpt-5-mini": {"input": 0.50, "cached_input": 0.05, "output": 1.50}
 }
 
 
@@ -69,6 +86,12 @@ AVAILABLE_TEXT_MODELS = {
 
 DEFAULT_TEXT_MODEL = "gpt-4o"
 
+# Engines for summarizing turns evicted from the rolling window (user selectable per session)
+#   "api"   - gpt-4o-mini writes a 2-3 sentence note (best quality, ~1 round-trip + ~$0.0001 per turn)
+#   "local" - in-process extractive summary (local_summarizer.py), milliseconds and $0
+SUMMARY_ENGINES = ("api", "local")
+DEFAULT_SUMMARY_ENGINE = "api"
+
 def count_tokens(text: str) -> int:
     """Count tokens in text"""
     enc = get_encoding()
@@ -77,19 +100,23 @@ def count_tokens(text: str) -> int:
     return len(text) // 4  # Rough estimate
 
 
-def estimate_image_tokens(base64_data: str, model: str = "gpt-4o") -> int:
-    """Estimate tokens for an image based on base64 data size.
-    GPT-4o uses ~255 tokens per 512x512 tile.
-    We estimate image dimensions from base64 size and calculate tiles.
+def estimate_image_tokens(image, model: str = "gpt-4o") -> int:
+    """Estimate tokens for an image (base64 data URL or raw bytes).
+    Dimensions are read from the image header - only the first few KB of a data URL are decoded -
+    and run through the GPT-4o tiling rule. Falls back to a size-based guess for unknown formats.
     """
     try:
-        # Remove data URL prefix if present
-        if "base64," in base64_data:
-            base64_data = base64_data.split("base64,")[1]
-        
-        # Estimate image size from base64 length
-        # Base64 is ~4/3 of original size, JPEG compression is ~10:1
-        byte_size = len(base64_data) * 3 // 4
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            size, byte_size = read_image_size(bytes(image[:HEADER_PROBE_BYTES])), len(image)
+        else:
+            size, byte_size = probe_data_url(image)
+
+        if size and size[0] and size[1]:
+            image_tokens = vision_tokens_for_size(*size)
+            print(f"[IMAGE TOKENS] {image_tokens} tokens for {size[0]}x{size[1]} image")
+            return image_tokens
+
+        # Unknown header: estimate image size from the byte count (JPEG compression is ~10:1)
         estimated_pixels = byte_size * 10  # Rough decompression estimate
         
         # Estimate dimensions (assume roughly square)
@@ -110,22 +137,35 @@ def estimate_image_tokens(base64_data: str, model: str = "gpt-4o") -> int:
         print(f"[IMAGE TOKENS] Error estimating: {e}, using default 500")
         return 500  # Safe default for a medium image
 
-def calculate_cost(input_tokens: int, output_tokens: int, model: str = "gpt-4o", image_tokens: int = 0) -> float:
-    """Calculate cost in dollars"""
+def calculate_cost(input_tokens: int, output_tokens: int, model: str = "gpt-4o", image_tokens: int = 0, cached_tokens: int = 0) -> float:
+    """Calculate cost in dollars. cached_tokens (part of the input) are billed at the cached rate."""
     pricing = PRICING.get(model, PRICING["gpt-4o"])
     total_input = input_tokens + image_tokens
-    input_cost = (total_input / 1_000_000) * pricing["input"]
+    cached_tokens = min(cached_tokens, total_input)
+    input_cost = ((total_input - cached_tokens) / 1_000_000) * pricing["input"]
+    input_cost += (cached_tokens / 1_000_000) * pricing.get("cached_input", pricing["input"])
     output_cost = (output_tokens / 1_000_000) * pricing["output"]
     return (input_cost + output_cost) * 1.10  # 10% buffer
 
-def update_usage(input_tokens: int, output_tokens: int, model: str = "gpt-3.5-turbo", image_tokens: int = 0):
+def update_usage(input_tokens: int, output_tokens: int, model: str = "gpt-3.5-turbo", image_tokens: int = 0, cached_tokens: int = 0):
     """Update session usage stats"""
     global session_usage
     session_usage["input_tokens"] += input_tokens + image_tokens
     session_usage["output_tokens"] += output_tokens
-    session_usage["total_cost"] += calculate_cost(input_tokens, output_tokens, model, image_tokens)
+    session_usage["cached_input_tokens"] = session_usage.get("cached_input_tokens", 0) + cached_tokens
+    session_usage["total_cost"] += calculate_cost(input_tokens, output_tokens, model, image_tokens, cached_tokens)
     session_usage["request_count"] += 1
-    print(f"[USAGE] Total: ${session_usage['total_cost']:.4f} ({session_usage['request_count']} requests, {image_tokens} image tokens)")
+    print(f"[USAGE] Total: ${session_usage['total_cost']:.4f} ({session_usage['request_count']} requests, {image_tokens} image tokens, {cached_tokens} cached tokens)")
+    channel_hub.publish("usage", {"type": "usage", **usage_snapshot()})
+
+def usage_snapshot() -> Dict[str, Any]:
+    """Session usage plus cache hit rates and upstream queue stats (same shape as GET /usage)"""
+    return {**session_usage, "answer_cache": answer_cache.stats(), "screenshot_cache": screenshot_answer_cache.stats(),
+            "realtime_vad": realtime_vad_usage(), "upstream": {**upstream_scheduler.stats(), "models": model_health.snapshot()}}
+
+# Persistent /channel sockets - see CLIENT CHANNEL below
+from channel_hub import ChannelHub, CHANNEL_TOPICS
+channel_hub = ChannelHub()
 
 # Fix Unicode encoding for Windows console (prevents charmap errors with special characters)
 # if sys.platform == 'win32':
@@ -136,7 +176,8 @@ def update_usage(input_tokens: int, output_tokens: int, model: str = "gpt-3.5-tu
 #         pass # Fallback to default if buffer not accessible
 
 
-app = FastAPI()
+from serialization import FastJSONResponse, dumps as fast_dumps, loads as fast_loads
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Determine base directory for data storage (persists across updates)
 if getattr(sys, 'frozen', False):
@@ -171,7 +212,7 @@ async def log_requests(request: Request, call_next):
             data = json.loads(body)
             print(f"[RAW REQUEST] Keys: {list(data.keys())}")
             for k, v in data.items():
-                if k == 'screenshot':
+                if k in ('screenshot', 'screenshots'):
                     print(f"  {k}: <{len(str(v))} chars>")
                 elif isinstance(v, str) and len(v) > 100:
                     print(f"  {k}: {v[:100]}...")
@@ -199,6 +240,42 @@ def get_api_key():
         return profile_cache['openai_api_key']
     return None
 
+# ============ REALTIME VOICE ACTIVITY ============
+# Silence is dropped before it reaches the Realtime API: the client's PCM16 stream is gated here
+# (see voice_activity.py), server-side turn detection is turned off and the input buffer is
+# committed at speech end instead. Per connection: {"type": "vad.config", "enabled": false}.
+import base64
+import binascii
+from voice_activity import VoiceActivityGate, VAD_AVAILABLE
+
+REALTIME_VAD_ENABLED = VAD_AVAILABLE
+realtime_vad_totals = {"audio_seconds": 0.0, "forwarded_seconds": 0.0, "segments": 0, "commits": 0, "discarded": 0}
+
+
+def record_vad_stats(stats: Dict[str, Any]):
+    """Add a finished connection's gate stats to the process totals."""
+    for key in realtime_vad_totals:
+        realtime_vad_totals[key] += stats[key]
+    print(f"[VAD] Connection closed: {stats['audio_seconds']}s audio, {stats['forwarded_seconds']}s forwarded "
+          f"({stats['suppressed_fraction']:.0%} suppressed), {stats['commits']} commits, {stats['discarded']} discarded")
+
+
+def realtime_vad_usage() -> Dict[str, Any]:
+    audio = realtime_vad_totals["audio_seconds"]
+    return {**realtime_vad_totals, "enabled": REALTIME_VAD_ENABLED,
+            "suppressed_fraction": round(1 - realtime_vad_totals["forwarded_seconds"] / audio, 4) if audio else 0.0}
+
+
+# ============ REALTIME AUDIO INPUT ============
+# The upstream wants 24 kHz mono PCM16. Clients may send anything else once they declare it:
+# {"type": "audio.format", "source": "system", "encoding": "float32", "sample_rate": 48000, "channels": 2}
+# and then {"type": "audio.append", "source": "system", "audio": <base64>} (plain base64 text frames are
+# the "mic" source). Sources are downmixed, resampled and mixed into one stream. See audio_dsp.py.
+from audio_dsp import AudioInputStage, DSP_AVAILABLE
+
+AUDIO_DSP_ENABLED = DSP_AVAILABLE
+
+
 @app.websocket("/realtime")
 async def realtime(ws: WebSocket):
     await ws.accept()
@@ -236,19 +313,86 @@ async def realtime(ws: WebSocket):
                     }
                 }
             }
+            vad = VoiceActivityGate() if REALTIME_VAD_ENABLED else None
+            audio_stage = AudioInputStage() if AUDIO_DSP_ENABLED else None
+            if vad:
+                session_update["session"]["turn_detection"] = None  # We commit at speech end ourselves
             await openai_ws.send(json.dumps(session_update))
 
+            # Optional server-side answer pipeline (enabled by a pipeline.config control message)
+            pipeline = RealtimeAnswerPipeline(ws)
+
+            async def send_audio_actions(actions: list):
+                for kind, payload in actions:
+                    if kind == "audio":
+                        event = {"type": "input_audio_buffer.append", "audio": base64.b64encode(payload).decode()}
+                    else:
+                        event = {"type": f"input_audio_buffer.{kind}"}
+                    await openai_ws.send(fast_dumps(event).decode())
+                    if kind == "commit":
+                        await ws.send_json({"type": "vad.stats", **vad.stats()})
+
+            async def forward_audio(data: str, source: Optional[str] = None):
+                """Client audio (base64) -> format/mix stage -> VAD gate -> upstream input buffer."""
+                if vad is None and (audio_stage is None or audio_stage.passthrough(source)):
+                    await openai_ws.send(fast_dumps({"type": "input_audio_buffer.append", "audio": data}).decode())
+                    return
+                try:
+                    raw = base64.b64decode(data)
+                except (binascii.Error, ValueError):
+                    print("[REALTIME] Ignoring malformed audio chunk")
+                    return
+                pcm = audio_stage.push(source, raw) if audio_stage else raw
+                if not pcm:
+                    return
+                if vad:
+                    await send_audio_actions(vad.process(pcm))
+                else:
+                    await send_audio_actions([("audio", pcm)])
+
             async def receive_from_client():
+                nonlocal vad
                 try:
                     while True:
                         data = await ws.receive_text()
+                        # JSON control messages start with "{" (never valid base64)
+                        if data.startswith("{"):
+                            try:
+                                control = json.loads(data)
+                            except ValueError:
+                                print("[REALTIME] Ignoring malformed control message")
+                                continue
+                            if control.get("type") == "pipeline.config":
+                                pipeline.configure(control)
+                            elif control.get("type") == "audio.append":
+                                await forward_audio(control.get("audio") or "", control.get("source"))
+                            elif control.get("type") == "audio.format":
+                                if audio_stage is None:
+                                    await ws.send_json({"type": "error", "message": "Audio conversion unavailable (numpy not installed)"})
+                                    continue
+                                try:
+                                    audio_stage.configure(control.get("source"), encoding=control.get("encoding", "pcm16"),
+                                                          sample_rate=int(control.get("sample_rate", 24000)),
+                                                          channels=int(control.get("channels", 1)),
+                                                          gain=float(control.get("gain", 1.0)),
+                                                          normalize=bool(control.get("normalize", False)))
+                                    print(f"[AUDIO] Source {control.get('source') or audio_stage.default_source}: {control.get('encoding', 'pcm16')} "
+                                          f"{control.get('sample_rate', 24000)} Hz x{control.get('channels', 1)}")
+                                except (TypeError, ValueError) as fmt_err:
+                                    await ws.send_json({"type": "error", "message": f"Invalid audio.format: {fmt_err}"})
+                            elif control.get("type") == "vad.config":
+                                enabled = bool(control.get("enabled", True)) and VAD_AVAILABLE
+                                if enabled != (vad is not None):
+                                    if vad:
+                                        await send_audio_actions(vad.flush())
+                                        record_vad_stats(vad.stats())
+                                    vad = VoiceActivityGate() if enabled else None
+                                    await openai_ws.send(fast_dumps({"type": "session.update", "session": {
+                                        "turn_detection": None if vad else {"type": "server_vad"}}}).decode())
+                                    print(f"[VAD] {'Enabled' if vad else 'Disabled'} for this connection")
+                            continue
                         # Expecting base64 audio from client
-                        # Send to OpenAI
-                        event = {
-                            "type": "input_audio_buffer.append",
-                            "audio": data
-                        }
-                        await openai_ws.send(json.dumps(event))
+                        await forward_audio(data)
                 except WebSocketDisconnect:
                     pass
                 except Exception as e:
@@ -257,7 +401,7 @@ async def realtime(ws: WebSocket):
             async def receive_from_openai():
                 try:
                     async for message in openai_ws:
-                        event = json.loads(message)
+                        event = fast_loads(message)
                         
                         # Real-time transcription events
                         if event["type"] == "conversation.item.input_audio_transcription.delta":
@@ -266,18 +410,27 @@ async def realtime(ws: WebSocket):
                                 "type": "transcript",
                                 "text": event["delta"]
                             })
+                            pipeline.on_delta(event.get("item_id", ""), event["delta"])
                         elif event["type"] == "conversation.item.input_audio_transcription.completed":
                             print(f"TRANSCRIPT DONE: {event['transcript']}")
                             await ws.send_json({
                                 "type": "transcript",
                                 "text": "\n"
                             })
+                            await pipeline.on_completed(event.get("item_id", ""), event["transcript"])
                         elif event["type"] == "error":
                             print(f"OpenAI Error: {event}")
                 except Exception as e:
                     print(f"OpenAI receive error: {e}")
 
-            await asyncio.gather(receive_from_client(), receive_from_openai())
+            try:
+                await asyncio.gather(receive_from_client(), receive_from_openai())
+            finally:
+                pipeline.close()
+                if vad:
+                    record_vad_stats(vad.stats())
+                if audio_stage and not audio_stage.passthrough():
+                    print(f"[AUDIO] Connection closed: {audio_stage.stats()}")
 
     except websockets.exceptions.ConnectionClosed as e:
         print(f"OpenAI Connection Closed: {e.code} {e.reason}")
@@ -292,21 +445,65 @@ async def realtime(ws: WebSocket):
 
 from pydantic import BaseModel
 from fastapi import File, UploadFile, Form
-try:
-    from docx import Document
-except ModuleNotFoundError:
-    Document = None
+DOCX_AVAILABLE = available("docx")  # Imported by the resume endpoints when used
+if not DOCX_AVAILABLE:
     print("Warning: python-docx not installed — resume upload endpoint will be unavailable until installed.")
 
+# ============ TEXT BLOB STORE ============
+# Resume and job description bodies are stored once, content-addressed (see blob_store.py).
+# user_profile.json and session.json hold "<field>_sha256" references instead of full copies;
+# externalize_texts() swaps bodies for references when writing, resolve_texts() swaps them back
+# when reading (files written before this still carry inline text and keep working).
+# The hashes also key the system context cache.
+from blob_store import BlobStore, TEXT_FIELDS as BLOB_TEXT_FIELDS, text_hash
+
+blob_store = BlobStore(BASE_DIR / "blobs")
+
+def externalize_texts(data: Dict[str, Any], owner: str) -> Dict[str, Any]:
+    """Copy of data with the large text fields replaced by blob references held by owner"""
+    return blob_store.externalize(data, owner)
+
+def resolve_texts(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of data with blob references resolved back into the text fields"""
+    return blob_store.resolve(data)
+
+# ============ RESUME EXTRACTION ============
+# .docx parsing runs in a small worker pool (never on the event loop, so in-flight answer streams
+# keep flowing) and results are cached by SHA-256 of the file bytes (see resume_extract.py):
+# a resume reused by another session or uploaded again is not parsed a second time.
+from concurrent.futures import ThreadPoolExecutor
+from resume_extract import ResumeTextCache
+
+RESUME_EXTRACT_WORKERS = 2
+resume_text_cache = ResumeTextCache(BASE_DIR / "resume_cache", blob_store=blob_store)  # Text itself lives in blobs/
+_resume_executor = ThreadPoolExecutor(max_workers=RESUME_EXTRACT_WORKERS, thread_name_prefix="resume")
+
+async def extract_resume(content: bytes) -> Dict[str, Any]:
+    """Extracted resume {"text", "paragraphs", "sections", "tokens", ...} for .docx bytes"""
+    import time as _time
+    start = _time.time()
+    entry, hit = await asyncio.get_running_loop().run_in_executor(
+        _resume_executor, resume_text_cache.extract, content, count_tokens)
+    print(f"[RESUME] {'Cache hit' if hit else 'Parsed'} {entry['sha256'][:12]}: {entry['chars']} chars, "
+          f"{entry['tokens']} tokens, {len(entry['sections'])} sections ({(_time.time() - start) * 1000:.0f} ms)")
+    return entry
+
 
 class AIRequest(BaseModel):
     transcript: str = ""
     role: str = ""
     target_language: Optional[str] = None
     screenshot: Optional[str] = None
+    screenshots: Optional[List[str]] = None  # Ordered captures of one long page - de-duplicated and packed into one vision request
     job_description: Optional[str] = None
     save_to_context: Optional[bool] = True  # Set False for one-shot problems (LeetCode), True for scenarios needing follow-up
-    text_model: Optional[str] = None  # Selected model for text-only responses
+    text_model: Optional[str] = None  # Selected model for text-only responses ("auto" = routed per question)
+    bypass_cache: Optional[bool] = False  # Skip the answer cache and always generate a fresh answer
+    request_id: Optional[str] = None  # Client-chosen id so the answer can be cancelled via /ai/cancel
+    flush_interval_ms: Optional[float] = None  # SSE chunk coalescing window (0 = one frame per delta)
+    flush_bytes: Optional[int] = None  # Flush a coalesced frame early once this much text is buffered
+    screenshot_diff: Optional[bool] = True  # Compare with the previous screenshot: skip unchanged, crop to what changed
+    client_id: Optional[str] = None  # Asking window - a new question only supersedes that window's answers
 
     class Config:
         extra = "ignore"  # Ignore extra fields
@@ -328,9 +525,25 @@ async def get_available_models():
             "price_input": pricing.get("input", 0),
             "price_output": pricing.get("output", 0)
         })
+    models.append({
+        "id": AUTO_TEXT_MODEL,
+        "name": "Auto",
+        "speed": f"TTFT target {model_router.ttft_target:g}s",
+        "cost": "Lowest that meets it",
+        "accuracy": "Per question type",
+        "description": "Picks a model for each question",
+        "price_input": 0,
+        "price_output": 0
+    })
     return {"models": models, "default": DEFAULT_TEXT_MODEL}
 
 
+@app.get('/models/routing')
+async def get_model_routing():
+    """Latency/cost table behind text_model="auto" plus circuit breaker state"""
+    return {**model_router.table(), "health": model_health.snapshot()}
+
+
 @app.get("/debug/auth")
 async def debug_auth():
     ak = get_api_key()
@@ -351,7 +564,7 @@ async def debug_auth():
 async def debug_ai_request(request: Dict[str, Any]):
     print(f"\n[DEBUG RAW] Received keys: {list(request.keys())}")
     for k, v in request.items():
-        if k == 'screenshot':
+        if k in ('screenshot', 'screenshots'):
             print(f"  {k}: <{len(str(v))} chars>")
         else:
             print(f"  {k}: {v}")
@@ -359,22 +572,21 @@ async def debug_ai_request(request: Dict[str, Any]):
 
 
 # Persistent profile support -------------------------------------------------
+from serialization import read_json_file, write_json_file, sse_frame
 PROFILE_PATH = BASE_DIR / "user_profile.json"
 
 def load_profile() -> Dict[str, Any]:
-    if PROFILE_PATH.exists():
-        try:
-            return json.loads(PROFILE_PATH.read_text(encoding="utf-8"))
-        except Exception as e:
-            print(f"Error loading profile: {e}")
-            return {}
-    return {}
+    # Called on every request - only re-parsed when the file changes on disk
+    try:
+        return resolve_texts(read_json_file(PROFILE_PATH, {}))
+    except Exception as e:
+        print(f"Error loading profile: {e}")
+        return {}
 
 def save_profile(data: Dict[str, Any]):
     try:
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        PROFILE_PATH.write_text(json_str, encoding="utf-8")
-        print(f"[SAVE_PROFILE] Successfully wrote {len(json_str)} bytes to {PROFILE_PATH}")
+        written = write_json_file(PROFILE_PATH, externalize_texts(data, "profile"))
+        print(f"[SAVE_PROFILE] Successfully wrote {written} bytes to {PROFILE_PATH}")
     except Exception as e:
         print(f"[SAVE_PROFILE ERROR] Failed to save: {e}")
         raise  # Re-raise so caller knows it failed
@@ -393,31 +605,54 @@ conversation_summary = ""
 
 # ============ CACHED SYSTEM CONTEXT ============
 # The system prompt containing the full resume + job description is VERY expensive
-# (~5000 tokens) if rebuilt and resent on every single request.
-# We build it ONCE when the session starts (or when the profile changes) and cache it.
-# Subsequent questions only send the slim role-instruction system prompt + conversation tail.
-
-_cached_system_context = None   # Full system prompt string (with resume & JD)
-_cached_context_hash = None     # Hash of inputs that produced the cache — used to detect profile changes
-
-def _build_context_hash(role: str, language: str, resume_text: str, job_description: str) -> str:
-    import hashlib
-    raw = f"{role}|{language}|{len(resume_text or '')}|{len(job_description or '')}"
-    return hashlib.md5(raw.encode()).hexdigest()
-
-def get_system_context(role: str, language: str, resume_text: str, job_description: str, for_vision: bool = False, is_esl: bool = False, short_responses: bool = False) -> str:
-    """Return a cached system prompt. Only rebuilds when role/language/resume/JD/modifiers changes."""
-    global _cached_system_context, _cached_context_hash
-
-    # Include modifiers in hash to rebuild cache if they change
-    new_hash = _build_context_hash(role, language, resume_text, job_description) + f"|{is_esl}|{short_responses}"
-
-    if _cached_system_context is not None and _cached_context_hash == new_hash and not for_vision:
-        print("[CONTEXT CACHE] Hit — reusing cached system context (0 extra resume tokens)")
-        return _cached_system_context
-
-    print(f"[CONTEXT CACHE] {'Miss' if _cached_system_context else 'Cold start'} — building system context")
-
+# (~5000 tokens) to rebuild and re-tokenize on every single request.
+# Built prompts live in a small LRU keyed by a SHA-256 of their actual content
+# (role, language, resume, JD, modifiers), together with their precomputed token count.
+# Text and vision requests share the same entry, and switching roles/languages between
+# sessions is a cache hit instead of a rebuild. Any edit to the resume/JD changes the key.
+
+SYSTEM_CONTEXT_CACHE_SIZE = 8
+_system_context_cache = OrderedDict()   # context hash -> {"hash", "prompt", "tokens"}
+
+def _build_context_hash(role: str, language: str, resume_text: str, job_description: str, is_esl: bool = False, short_responses: bool = False,
+                        resume_sha: Optional[str] = None, jd_sha: Optional[str] = None) -> str:
+    # Resume/JD enter as their content hashes - the blob store keys, when the caller has them
+    resume_sha = resume_sha or text_hash(resume_text or '')
+    jd_sha = jd_sha or text_hash(job_description or '')
+    h = hashlib.sha256()
+    for part in (role, language, resume_sha, jd_sha, str(bool(is_esl)), str(bool(short_responses))):
+        h.update((part or '').encode('utf-8'))
+        h.update(b'\x00')  # Field separator so ("ab", "c") != ("a", "bc")
+    return h.hexdigest()
+
+def get_system_context_entry(role: str, language: str, resume_text: str, job_description: str, is_esl: bool = False, short_responses: bool = False,
+                             resume_sha: Optional[str] = None, jd_sha: Optional[str] = None) -> Dict[str, Any]:
+    """Return the cache entry {"hash", "prompt", "tokens"} for this session context, building it on a miss.
+    resume_sha/jd_sha: blob store hashes of the texts, when known (saves re-hashing them)."""
+    context_hash = _build_context_hash(role, language, resume_text, job_description, is_esl, short_responses, resume_sha, jd_sha)
+
+    entry = _system_context_cache.get(context_hash)
+    if entry is not None:
+        _system_context_cache.move_to_end(context_hash)
+        print(f"[CONTEXT CACHE] Hit — reusing cached system context ({entry['tokens']} tokens, 0 rebuilt)")
+        return entry
+
+    print(f"[CONTEXT CACHE] {'Miss' if _system_context_cache else 'Cold start'} — building system context")
+    prompt = _render_system_prompt(role, language, resume_text, job_description, is_esl, short_responses)
+    entry = {"hash": context_hash, "prompt": prompt, "tokens": count_tokens(prompt)}
+    _system_context_cache[context_hash] = entry
+    while len(_system_context_cache) > SYSTEM_CONTEXT_CACHE_SIZE:
+        _system_context_cache.popitem(last=False)
+    print(f"[CONTEXT CACHE] Cached {entry['tokens']} tokens ({len(_system_context_cache)}/{SYSTEM_CONTEXT_CACHE_SIZE} entries)")
+    return entry
+
+def get_system_context(role: str, language: str, resume_text: str, job_description: str, is_esl: bool = False, short_responses: bool = False) -> str:
+    """Return the cached static system prompt (persona + modifiers + resume + JD).
+    The prompt is byte-identical for text and vision requests so the provider's prompt cache
+    can reuse it across both; per-request instructions go in build_messages() instead."""
+    return get_system_context_entry(role, language, resume_text, job_description, is_esl, short_responses)["prompt"]
+
+def _render_system_prompt(role: str, language: str, resume_text: str, job_description: str, is_esl: bool, short_responses: bool) -> str:
     context_block = ""
     if resume_text and resume_text.strip():
         context_block += f"\n\n--- CANDIDATE RESUME ---\n{resume_text}\n"
@@ -431,23 +666,6 @@ def get_system_context(role: str, language: str, resume_text: str, job_descripti
     if short_responses:
         modifier_block += "\n\nCRITICAL CONSTRAINT: Provide concise, short responses. Cut conversational filler (e.g., 'Certainly!', 'Here is...'). Keep answers about 30% to 50% shorter than normal. Use bullet points for readability, but DO NOT over-explain or elaborate unnecessarily unless asked."
 
-    if for_vision:
-        # Vision requests need the context inline — do NOT cache these
-        return (
-            f"CRITICAL: You ARE the job candidate in this interview for a {role} position. "
-            "You are NOT an AI assistant. NEVER say 'I am an AI' or 'I don't have experience'. "
-            "The resume below is YOUR real work history. When asked about past jobs, refer to YOUR resume. "
-            "Speak in FIRST PERSON as yourself - a real human professional. "
-            "When you see a coding problem, SOLVE IT with working code and clear explanation. "
-            "Use SIMPLE, clear words. Avoid complex vocabulary. Speak naturally like in a real conversation. "
-            "Explain your approach in 8-12 sentences. Write clean code with comments, then explain simply. "
-            "Draw from YOUR resume for all experience-related questions. "
-            f"Prefer {language or 'Python'} for all coding and technical explanations. "
-            "Remember what was discussed earlier."
-            f"{modifier_block}"
-            f"{context_block}"
-        )
-
     system_prompt = (
         f"CRITICAL: You ARE the job candidate in this interview for a {role} position. "
         "You are NOT an AI assistant. NEVER say 'I am an AI' or 'I don't have experience' or 'I cannot'. "
@@ -455,33 +673,92 @@ def get_system_context(role: str, language: str, resume_text: str, job_descripti
         "When asked about previous jobs, projects, or experience - use details from YOUR resume. "
         "Speak in FIRST PERSON as yourself - a real human professional. "
         "Use SIMPLE, clear words. Speak naturally like in a real conversation. "
-        "Be confident but humble. Keep answers to 4-6 sentences. Give specific examples from YOUR resume. "
+        "Be confident but humble. Give specific examples from YOUR resume. "
         "Remember what was discussed earlier in this conversation. "
         f"Prefer {language or 'Python'} for all coding and technical explanations. "
         "If you write ANY code, you MUST wrap it strictly inside standard Markdown content blocks specifying the exact language (e.g. ```python ... ```)."
         f"{modifier_block}"
         f"{context_block}"
     )
-
-    _cached_system_context = system_prompt
-    _cached_context_hash = new_hash
-    print(f"[CONTEXT CACHE] Cached. System prompt represents updated session state.")
     return system_prompt
 
-def invalidate_context_cache():
-    """Call this when the profile/resume is updated so the cache is rebuilt on next request."""
-    global _cached_system_context, _cached_context_hash
-    _cached_system_context = None
-    _cached_context_hash = None
-    print("[CONTEXT CACHE] Invalidated. Will rebuild on next request.")
-
+# Per-request instructions. These are sent AFTER the conversation tail (never in the static
+# prefix) so text and vision requests share the same cacheable system prompt.
+TEXT_MODE_INSTRUCTIONS = "[RESPONSE MODE]: Keep answers to 4-6 sentences."
+VISION_MODE_INSTRUCTIONS = (
+    "[RESPONSE MODE]: The user shared a screenshot. When you see a coding problem, SOLVE IT with working code "
+    "and clear explanation. Explain your approach in 8-12 sentences. Write clean code with comments, then explain simply."
+)
 
-async def summarize_old_turns(turns_to_summarize: list, api_key: str) -> str:
+def build_messages(system_content: str, transcript: str, screenshot_url: Union[str, List[str], None] = None) -> list:
+    """Assemble the chat messages in prompt-cache friendly order:
+    static system prompt -> recent turns -> volatile notes (summary + response mode) -> question.
+    Everything that changes per turn sits after the large static prefix.
+    screenshot_url: one image URL or a list of them (sent in order in the same user message)."""
+    messages = [{"role": "system", "content": system_content}]
+
+    # Send last 3 raw turns (6 messages) for full-fidelity recent context
+    messages.extend(conversation_history[-6:])
+
+    # Rolling summary (compressed memory of evicted turns) and mode instructions change
+    # between requests, so they go at the end where they don't break the cached prefix
+    volatile_notes = []
+    if conversation_summary:
+        volatile_notes.append(f"[CONTEXT FROM EARLIER IN THIS SESSION]:\n{conversation_summary}")
+    volatile_notes.append(VISION_MODE_INSTRUCTIONS if screenshot_url else TEXT_MODE_INSTRUCTIONS)
+    messages.append({"role": "system", "content": "\n\n".join(volatile_notes)})
+
+    if screenshot_url:
+        urls = [screenshot_url] if isinstance(screenshot_url, str) else screenshot_url
+        messages.append({
+            "role": "user",
+            "content": [{"type": "text", "text": transcript}] +
+                       [{"type": "image_url", "image_url": {"url": url}} for url in urls]
+        })
+    else:
+        messages.append({"role": "user", "content": transcript})
+    return messages
+
+def count_message_tokens(messages: list, context_entry: Optional[Dict[str, Any]] = None) -> int:
+    """Count input tokens for a message list. When the system prompt came from the context
+    cache, its precomputed token count is reused instead of re-tokenizing ~5000 tokens."""
+    rest = messages
+    total = 0
+    if context_entry and messages and messages[0].get("content") is context_entry["prompt"]:
+        total = context_entry["tokens"]
+        rest = messages[1:]
+    input_text = "\n".join([m.get('content', '') if isinstance(m.get('content'), str) else str(m.get('content', '')) for m in rest])
+    return total + count_tokens(input_text)
+
+def get_cached_tokens(usage) -> int:
+    """Prompt tokens the provider served from its prompt cache (0 when not reported)."""
+    details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+    return int(getattr(details, 'cached_tokens', 0) or 0) if details else 0
+
+def get_summary_engine(profile: Optional[Dict[str, Any]]) -> str:
+    """Return the summary engine selected in the profile/session, falling back to the default."""
+    engine = (profile or {}).get('summary_engine') or DEFAULT_SUMMARY_ENGINE
+    return engine if engine in SUMMARY_ENGINES else DEFAULT_SUMMARY_ENGINE
+
+async def summarize_old_turns(turns_to_summarize: list, api_key: str, engine: str = DEFAULT_SUMMARY_ENGINE) -> str:
     """Summarize a list of evicted conversation turns into a compact context note.
-    Uses gpt-4o-mini (cheapest model) — typically costs ~$0.0001 per call.
+    engine="api" uses gpt-4o-mini (cheapest model) — typically costs ~$0.0001 per call.
+    engine="local" ranks sentences in-process — no API call, no cost, a few milliseconds.
     Returns a short paragraph describing what was discussed and any key decisions/code.
     """
-    if not turns_to_summarize or not api_key:
+    if not turns_to_summarize:
+        return ""
+
+    if engine == "local":
+        import time as _time
+        from local_summarizer import summarize_turns_locally
+        _t0 = _time.perf_counter()
+        summary_text = summarize_turns_locally(turns_to_summarize)
+        print(f"[SUMMARY] Local summary of {len(turns_to_summarize)} msgs → {len(summary_text)} chars | "
+              f"{(_time.perf_counter() - _t0) * 1000:.1f}ms | cost $0")
+        return summary_text
+
+    if not api_key:
         return ""
     
     # Format turns into readable Q&A text
@@ -491,9 +768,9 @@ async def summarize_old_turns(turns_to_summarize: list, api_key: str) -> str:
         qa_text += f"{role_label}: {msg['content'][:800]}\n\n"  # Cap per-message length
     
     try:
-        import openai as _openai
-        mini_client = _openai.OpenAI(api_key=api_key)
-        resp = mini_client.chat.completions.create(
+        # Background work: queued behind interactive answers on the same key
+        mini_client = get_async_client(api_key)
+        raw, _ = await upstream_scheduler.submit(api_key, lambda: mini_client.chat.completions.with_raw_response.create(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -508,7 +785,8 @@ async def summarize_old_turns(turns_to_summarize: list, api_key: str) -> str:
             ],
             max_tokens=200,
             temperature=0.0
-        )
+        ), priority=PRIORITY_BACKGROUND, tokens=len(qa_text) // 4 + 200, log_tag="SUMMARY")
+        resp = raw.parse()
         summary_text = resp.choices[0].message.content.strip()
         in_tok = resp.usage.prompt_tokens
         out_tok = resp.usage.completion_tokens
@@ -540,7 +818,8 @@ async def validate_api_key(data: Dict[str, str]):
     
     try:
         client = OpenAI(api_key=api_key)
-        client.models.list()
+        await upstream_scheduler.submit(api_key, lambda: asyncio.to_thread(client.models.list),
+                                        priority=PRIORITY_INTERACTIVE, log_tag="validate-api-key")
         # Store key immediately on successful validation
         if not isinstance(profile_cache, dict):
             profile_cache = {}
@@ -561,31 +840,40 @@ async def validate_api_key(data: Dict[str, str]):
 import hashlib
 import platform
 import subprocess
+import threading
 
-
-try:
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.asymmetric import padding
-    from cryptography.hazmat.primitives import serialization
-    from cryptography.exceptions import InvalidSignature
-except ImportError:
+# cryptography is imported where keys are generated/verified, off the startup path
+if not available("cryptography"):
     print("WARNING: cryptography module not found. License validation will fail.")
 
 # =============================================================================
 # HARDWARE ID GENERATION
 # =============================================================================
-def get_hwid():
-    """Generate a unique Hardware ID based on CPU and Machine info."""
+# cpuinfo probes the CPU (a second or more), so the HWID is computed once per process and the CPU
+# brand string is cached on disk next to the profile, reused while a cheap fingerprint of the
+# machine (MAC, OS, processor string) still matches. The HWID itself is never read from disk.
+HWID_CACHE_PATH = BASE_DIR / "hwid_cache.json"
+_hwid = None
+_hwid_lock = threading.Lock()
+
+def _hwid_fingerprint() -> str:
+    import uuid
+    raw = f"{uuid.getnode()}|{platform.system()}|{platform.release()}|{platform.machine()}|{platform.processor()}|{os.cpu_count()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def _cpu_info() -> str:
+    """CPU brand string - the slow part of the HWID (cpuinfo probes the CPU for ~1 s)"""
     try:
-        # 1. CPU Serial/Info (Lazy import to speed up startup)
-        cpu_info = ""
-        try:
-            import cpuinfo
-            info = cpuinfo.get_cpu_info()
-            cpu_info = f"{info.get('brand_raw', '')}_{info.get('arch', '')}"
-        except (ImportError, Exception):
-            cpu_info = platform.processor()
+        import cpuinfo
+        info = cpuinfo.get_cpu_info()
+        return f"{info.get('brand_raw', '')}_{info.get('arch', '')}"
+    except (ImportError, Exception):
+        return platform.processor()
 
+def _compute_hwid(cpu_info: str):
+    """Generate a unique Hardware ID based on CPU and Machine info."""
+    try:
+        # 1. CPU Serial/Info - passed in (probed once, see get_hwid)
 
         # 2. Machine Node/UUID (Mac Address based)
         import uuid
@@ -604,6 +892,29 @@ def get_hwid():
         print(f"HWID Error: {e}")
         return "UNKNOWN-HWID-0000"
 
+def get_hwid():
+    """Hardware ID of this machine (memoized). Only the CPU brand string is cached on disk; the
+    hash is always recomputed from the live MAC/OS values, so an edited cache file can't produce
+    another machine's HWID."""
+    global _hwid
+    if _hwid is not None:
+        return _hwid
+    with _hwid_lock:
+        if _hwid is not None:
+            return _hwid
+        fingerprint = _hwid_fingerprint()
+        cached = read_json_file(HWID_CACHE_PATH, {})
+        if isinstance(cached, dict) and cached.get("fingerprint") == fingerprint and cached.get("cpu_info"):
+            cpu_info = cached["cpu_info"]
+        else:
+            cpu_info = _cpu_info()
+            try:
+                write_json_file(HWID_CACHE_PATH, {"fingerprint": fingerprint, "cpu_info": cpu_info})
+            except Exception as e:
+                print(f"[HWID] Could not cache CPU info: {e}")
+        _hwid = _compute_hwid(cpu_info)
+        return _hwid
+
 # =============================================================================
 # LICENSE VERIFICATION (RSA)
 # =============================================================================
@@ -620,6 +931,7 @@ def ensure_keys_exist():
 
     print("[INFO] Keys missing. Auto-generating RSA Layout...")
     try:
+        from cryptography.hazmat.primitives import serialization
         from cryptography.hazmat.primitives.asymmetric import rsa
         private_key = rsa.generate_private_key(
             public_exponent=65537,
@@ -667,7 +979,18 @@ def initialize_keys():
     # 2. Generate keys if still missing (e.g. dev mode or missing bundle)
     ensure_keys_exist()
 
-initialize_keys()
+# RSA generation takes 50-200 ms, so keys are set up by the startup warm-up (see STARTUP WARM-UP)
+# or by the first request that needs them, whichever comes first
+_keys_lock = threading.Lock()
+_keys_ready = False
+
+def ensure_keys_initialized():
+    """Run initialize_keys() once"""
+    global _keys_ready
+    with _keys_lock:
+        if not _keys_ready:
+            initialize_keys()
+            _keys_ready = True
 
 import hashlib
 @app.get('/debug/key-info')
@@ -683,8 +1006,14 @@ async def debug_key_info():
         return {"status": "error", "error": str(e)}
     return {"status": "error", "error": "Key not found"}
 
+_public_key_pem = None  # Read once per process (the key files are settled by ensure_keys_initialized)
+
 def load_public_key():
     """Load public key from file (Prioritize Bundled)."""
+    global _public_key_pem
+    if _public_key_pem is not None:
+        return _public_key_pem
+    ensure_keys_initialized()
     # 1. Try bundled key first (if frozen)
     if getattr(sys, 'frozen', False):
         try:
@@ -693,7 +1022,8 @@ def load_public_key():
             if os.path.exists(bundled_path):
                 print(f"[VERIFY] Using bundled key from: {bundled_path}")
                 with open(bundled_path, "rb") as f:
-                    return f.read()
+                    _public_key_pem = f.read()
+                    return _public_key_pem
         except Exception as e:
             print(f"[VERIFY ERROR] Bundled key read failed: {e}")
 
@@ -701,18 +1031,35 @@ def load_public_key():
     if os.path.exists(PUBLIC_KEY_FILE):
         print(f"[VERIFY] Using local key from: {PUBLIC_KEY_FILE}")
         with open(PUBLIC_KEY_FILE, "rb") as f:
-            return f.read()
+            _public_key_pem = f.read()
+            return _public_key_pem
     return None
 
+_parsed_public_keys: Dict[bytes, Any] = {}  # PEM bytes -> parsed key object
+
+def load_parsed_public_key(pub_key_bytes: bytes):
+    key = _parsed_public_keys.get(pub_key_bytes)
+    if key is None:
+        from cryptography.hazmat.primitives import serialization
+        key = _parsed_public_keys[pub_key_bytes] = serialization.load_pem_public_key(pub_key_bytes)
+    return key
+
 def verify_license_signature(hwid: str, license_key_b64: str) -> bool:
     """Verify that the license key is a valid signature of the HWID."""
+    try:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+        from cryptography.exceptions import InvalidSignature
+    except ImportError:
+        print("ERROR: cryptography module not found. License validation will fail.")
+        return False
     try:
         pub_key_bytes = load_public_key()
         if not pub_key_bytes:
             print("ERROR: Public key not found for verification.")
             return False
             
-        public_key = serialization.load_pem_public_key(pub_key_bytes)
+        public_key = load_parsed_public_key(pub_key_bytes)
 
         # 0. Sanitize Input (Remove all whitespace/newlines)
         license_key_b64 = "".join(license_key_b64.split())
@@ -752,10 +1099,35 @@ def verify_license_signature(hwid: str, license_key_b64: str) -> bool:
         print(f"License Verification Failed: {e}")
         return False
 
+# A successfully verified license is remembered on disk, so the next launch is licensed without
+# the user re-entering it. The stored key is re-verified against this machine's HWID and the
+# current public key on restore (a signature check is well under a millisecond) - editing the
+# file cannot license a machine.
+LICENSE_STATE_PATH = BASE_DIR / "license_state.json"
+
+def persist_license(hwid: str, license_key: str):
+    try:
+        write_json_file(LICENSE_STATE_PATH, {"hwid": hwid, "license_key": "".join(license_key.split())})
+    except Exception as e:
+        print(f"[LICENSE] Could not persist license: {e}")
+
+def restore_license() -> bool:
+    """Re-activate a license verified in an earlier run (startup warm-up)."""
+    global is_licensed_backend
+    state = read_json_file(LICENSE_STATE_PATH, {})
+    if not isinstance(state, dict) or not state.get("license_key"):
+        return False
+    if state.get("hwid") == get_hwid() and verify_license_signature(state["hwid"], state["license_key"]):
+        is_licensed_backend = True
+        print("[LICENSE] Restored license from previous run")
+        return True
+    print("[LICENSE] Stored license no longer matches this machine or key - ignoring it")
+    return False
+
 @app.get('/get-hwid')
 async def endpoint_get_hwid():
     """Return the Machine's HWID for the user to copy."""
-    return {"hwid": get_hwid()}
+    return {"hwid": await asyncio.to_thread(get_hwid)}
 
 @app.post('/validate-license')
 async def validate_license(data: Dict[str, str]):
@@ -765,11 +1137,14 @@ async def validate_license(data: Dict[str, str]):
     if not license_key:
         return {"valid": False, "status": "empty"}
     
-    current_hwid = get_hwid()
+    current_hwid = await asyncio.to_thread(get_hwid)  # First call may probe the CPU - keep it off the loop
     
     if verify_license_signature(current_hwid, license_key):
         global is_licensed_backend
         is_licensed_backend = True
+        stored = read_json_file(LICENSE_STATE_PATH, {})
+        if not isinstance(stored, dict) or stored.get("hwid") != current_hwid or stored.get("license_key") != "".join(license_key.split()):
+            persist_license(current_hwid, license_key)
         return {"valid": True, "status": "valid"}
     
     return {"valid": False, "status": "invalid"}
@@ -804,8 +1179,7 @@ async def post_profile(data: Dict[str, Any]):
     global profile_cache
     try:
         save_profile(data)
-        profile_cache = data
-        invalidate_context_cache()  # Role/JD may have changed, rebuild system context next time
+        profile_cache = data  # Context cache is content-hashed - a changed role/JD simply misses
         return {"status": "ok"}
     except Exception as e:
         return {"status": "error", "error": str(e)}
@@ -814,14 +1188,14 @@ async def post_profile(data: Dict[str, Any]):
 # ============ SESSION MANAGEMENT ============
 # Sessions are stored in: BASE_DIR/sessions/<session_name>/
 # Each session folder contains:
-#   - session.json (metadata, job description, resume text)
+#   - session.json (metadata; resume and job description are blob store references)
 #   - resume.docx (original resume file)
 #   - conversation.json (all Q&A pairs)
 
 SESSIONS_DIR = BASE_DIR / 'sessions'
 current_session_name = None
 
-def save_conversation_to_session(question: str, response: str, had_screenshot: bool = False, model: str = "", response_time: float = 0, total_time: float = 0, cost: float = 0, input_tokens: int = 0, output_tokens: int = 0):
+def save_conversation_to_session(question: str, response: str, had_screenshot: bool = False, model: str = "", response_time: float = 0, total_time: float = 0, cost: float = 0, input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0, cancelled: bool = False):
     """Helper function to save a Q&A pair to the current session"""
     global current_session_name
     
@@ -832,10 +1206,7 @@ def save_conversation_to_session(question: str, response: str, had_screenshot: b
     conv_file = session_dir / 'conversation.json'
     
     try:
-        if conv_file.exists():
-            conversation = json.loads(conv_file.read_text(encoding='utf-8'))
-        else:
-            conversation = []
+        conversation = read_json_file(conv_file, [])
         
         from datetime import datetime
         entry = {
@@ -848,11 +1219,14 @@ def save_conversation_to_session(question: str, response: str, had_screenshot: b
             'total_time': round(total_time, 1),
             'cost': round(cost, 6),
             'input_tokens': input_tokens,
-            'output_tokens': output_tokens
+            'output_tokens': output_tokens,
+            'cached_tokens': cached_tokens
         }
+        if cancelled:
+            entry['cancelled'] = True  # Partial answer - aborted by the user or superseded
         conversation.append(entry)
         
-        conv_file.write_text(json.dumps(conversation, indent=2), encoding='utf-8')
+        write_json_file(conv_file, conversation)
         print(f"[SESSION] Auto-saved conversation entry #{len(conversation)}")
     except Exception as e:
         print(f"[SESSION SAVE ERROR] {e}")
@@ -871,6 +1245,7 @@ async def create_session(data: Dict[str, str]):
         session_dir.mkdir(parents=True, exist_ok=True)
         current_session_name = session_name
         print(f"[SESSION] Created session folder: {session_dir}")
+        channel_hub.publish("session", {"type": "session.created", "session_name": session_name})
         return {"status": "ok", "session_path": str(session_dir)}
     except Exception as e:
         return {"status": "error", "error": str(e)}
@@ -895,11 +1270,9 @@ async def upload_session_resume(file: UploadFile = File(...), session_name: str
         resume_path.write_bytes(content)
         print(f"[SESSION] Resume saved to: {resume_path}")
         
-        # Extract text from docx
-        from docx import Document
-        from io import BytesIO
-        doc = Document(BytesIO(content))
-        text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
+        # Extract text from docx (worker pool, cached by content hash)
+        resume = await extract_resume(content)
+        text = "\n".join(resume['paragraphs'])
         
         current_session_name = session_name
         
@@ -908,12 +1281,226 @@ async def upload_session_resume(file: UploadFile = File(...), session_name: str
             profile_cache = {}
         profile_cache['resume_text'] = text
         
-        return {"status": "ok", "resume_text": text, "resume_path": str(resume_path)}
+        return {"status": "ok", "resume_text": text, "resume_path": str(resume_path),
+                "sections": [sec['title'] for sec in resume['sections']], "resume_tokens": resume['tokens']}
     except Exception as e:
         print(f"[SESSION RESUME ERROR] {e}")
         return {"status": "error", "error": str(e)}
 
 
+# ============ UPSTREAM SCHEDULER ============
+# Every OpenAI call takes a slot from its API key's scheduler (upstream_scheduler.py): a concurrency
+# limit plus requests/tokens-per-minute budgets read from the x-ratelimit-* response headers.
+# Interactive answers are served before warm-ups and background summaries, and a 429 re-queues
+# the call instead of failing the answer. Queue waits: GET /usage ("upstream") and done.queue_wait_ms.
+from upstream_scheduler import (UpstreamScheduler, PRIORITY_INTERACTIVE, PRIORITY_WARMUP,
+                                PRIORITY_BACKGROUND)
+
+UPSTREAM_MAX_CONCURRENT = int(os.getenv("UPSTREAM_MAX_CONCURRENT", "4"))
+upstream_scheduler = UpstreamScheduler(max_concurrent=UPSTREAM_MAX_CONCURRENT)
+
+# ============ UPSTREAM RESILIENCE ============
+# Answer streams run under guarded_stream() (upstream_resilience.py): connect / first-token /
+# inter-token timeouts, jittered retries while nothing has been streamed yet, an optional hedged
+# second attempt once the model's TTFT passes its recorded percentile, and a per-model circuit
+# breaker that routes around a degraded model. Reasoning models (gpt-5*) think before their first
+# token, so they get a longer first-token timeout. Hedging bills the losing attempt's prompt too,
+# so it is off unless UPSTREAM_HEDGE=1. UPSTREAM_HEDGE_MODEL: "" = same model, "fastest" = the
+# model with the lowest recorded median TTFT, or a model name.
+from upstream_resilience import ModelHealth, StreamPolicy, guarded_stream
+
+def _stream_policy(first_token_timeout: float) -> StreamPolicy:
+    return StreamPolicy(
+        connect_timeout=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10")),
+        first_token_timeout=first_token_timeout,
+        inter_token_timeout=float(os.getenv("UPSTREAM_INTER_TOKEN_TIMEOUT", "20")),
+        max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+        backoff=float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.5")),
+        hedge=os.getenv("UPSTREAM_HEDGE", "0") == "1",
+        hedge_percentile=float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "0.95")),
+        hedge_min_samples=int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "8")),
+    )
+
+UPSTREAM_POLICY = _stream_policy(float(os.getenv("UPSTREAM_FIRST_TOKEN_TIMEOUT", "30")))
+UPSTREAM_REASONING_POLICY = _stream_policy(float(os.getenv("UPSTREAM_REASONING_FIRST_TOKEN_TIMEOUT", "120")))
+UPSTREAM_HEDGE_MODEL = os.getenv("UPSTREAM_HEDGE_MODEL", "")
+UPSTREAM_FALLBACK_MODELS = tuple(m for m in os.getenv("UPSTREAM_FALLBACK_MODELS", "gpt-4o-mini,gpt-4o,gpt-5-mini").split(",")
+                                 if m in AVAILABLE_TEXT_MODELS)
+TEXT_ONLY_MODELS = {"gpt-3.5-turbo"}  # No image input: never a fallback/hedge for screenshots
+
+model_health = ModelHealth(failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "3")),
+                           cooldown=float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30")))
+
+def completion_token_params(model: str, reasoning_token_limit: int) -> Dict[str, Any]:
+    """Per-model sampling/length parameters for chat.completions.create"""
+    # GPT-5+ models are reasoning models: they use tokens for internal thinking
+    # before producing output so they need a much higher token limit.
+    # Do NOT pass temperature or max_tokens to reasoning models - unsupported params.
+    if model.startswith("gpt-5"):
+        return {"max_completion_tokens": reasoning_token_limit}  # reasoning needs headroom for thinking tokens
+    return {"max_tokens": 2048, "temperature": 0.7}
+
+def upstream_alternatives(model: str, vision: bool) -> Tuple[Tuple[str, ...], Optional[str]]:
+    """(fallback models, hedge model or None) for an answer on model"""
+    usable = [m for m in UPSTREAM_FALLBACK_MODELS if not (vision and m in TEXT_ONLY_MODELS)]
+    if not UPSTREAM_POLICY.hedge:
+        return tuple(usable), None
+    if UPSTREAM_HEDGE_MODEL == "fastest":
+        candidates = [m for m in AVAILABLE_TEXT_MODELS if not (vision and m in TEXT_ONLY_MODELS)
+                      and model_health.allow(m) and model_health.median_ttft(m) is not None]
+        hedge = min(candidates, key=model_health.median_ttft, default=model)
+    elif UPSTREAM_HEDGE_MODEL in AVAILABLE_TEXT_MODELS and not (vision and UPSTREAM_HEDGE_MODEL in TEXT_ONLY_MODELS):
+        hedge = UPSTREAM_HEDGE_MODEL
+    else:
+        hedge = model
+    return tuple(usable), hedge
+
+# ============ MODEL ROUTER ============
+# text_model="auto": model_router.py classifies each question locally (behavioral / conceptual /
+# coding / follow_up) and picks the cheapest model that meets MODEL_ROUTER_TTFT_TARGET at the
+# question's quality tier, from a latency/cost table built out of every session's conversation.json
+# (loaded during the startup warm-up) and updated as answers complete. Screenshots are routed too
+# (never to a text-only model). The decision is reported as done.route; table: GET /models/routing.
+from model_router import ModelRouter
+
+AUTO_TEXT_MODEL = "auto"
+MODEL_QUALITY_TIERS = {"Decent": 1, "Good": 2, "Solid": 3, "Better": 3, "Great": 4}  # AVAILABLE_TEXT_MODELS "accuracy"
+ROUTER_MIN_QUALITY = {"behavioral": 2, "conceptual": 3, "coding": 4}
+ROUTER_TTFT_PRIORS = {"gpt-3.5-turbo": 0.6, "gpt-4o-mini": 0.8, "gpt-4o": 1.0, "gpt-5-nano": 3.0, "gpt-5-mini": 4.0}  # Seconds; reasoning models think first
+
+model_router = ModelRouter(
+    quality={m: MODEL_QUALITY_TIERS.get(info["accuracy"], 2) for m, info in AVAILABLE_TEXT_MODELS.items()},
+    min_quality=ROUTER_MIN_QUALITY,
+    ttft_priors=ROUTER_TTFT_PRIORS,
+    ttft_target=float(os.getenv("MODEL_ROUTER_TTFT_TARGET", "1.5")),
+)
+
+def load_router_history() -> int:
+    """Seed the router's latency/cost table from all recorded answers (oldest sessions first)"""
+    if not SESSIONS_DIR.exists():
+        return 0
+    files = sorted(SESSIONS_DIR.glob("*/conversation.json"), key=lambda f: f.stat().st_mtime)
+    used = 0
+    for conv_file in files:
+        try:
+            used += model_router.load_history(fast_loads(conv_file.read_bytes()))
+        except Exception as e:
+            print(f"[ROUTER] Skipping {conv_file}: {e}")
+    print(f"[ROUTER] Latency table built from {used} recorded answers in {len(files)} sessions")
+    return used
+
+def route_question(req: AIRequest, prompt_tokens: int) -> Dict[str, Any]:
+    vision = has_screenshot(req)
+    previous = next((m["content"] for m in reversed(conversation_history) if m.get("role") == "user"), None)
+    return model_router.route(
+        req.transcript, prompt_tokens, calculate_cost, previous_question=previous, has_screenshot=vision,
+        allowed=lambda m: model_health.allow(m) and not (vision and m in TEXT_ONLY_MODELS))
+
+# ============ SESSION WARM-UP ============
+# The first question of a session used to pay for the tokenizer load, the system context build
+# and a fresh HTTPS connection to OpenAI. Saving or loading a session now starts a background task
+# that does all of that up front, so the first answer streams as fast as the later ones:
+#   tokenizer -> system context (built + token-counted into the context cache) -> upstream
+#   connection (kept open in the shared client's pool) -> optionally the provider's prompt cache.
+# Priming the prompt cache sends the system prompt once (billed like a tiny request), so it is off
+# unless WARMUP_PRIME_PROMPT_CACHE=1. State: GET /ready ("session") and the "session" channel topic.
+WARMUP_PRIME_PROMPT_CACHE = os.getenv("WARMUP_PRIME_PROMPT_CACHE", "0") == "1"
+PROMPT_CACHE_MIN_TOKENS = 1024  # OpenAI only caches prompts at least this long
+WARMUP_CONNECT_TIMEOUT = 10.0
+
+_upstream_clients: Dict[Any, Any] = {}  # (API key, event loop) -> shared AsyncOpenAI client (keeps its connections)
+session_warmup: Dict[str, Any] = {"state": "idle"}
+_session_warmup_task: Optional[asyncio.Task] = None
+
+def get_async_client(api_key: Optional[str]):
+    """Shared AsyncOpenAI client for this API key, so requests reuse warm HTTPS connections.
+    Must be called on the event loop (pooled connections belong to the loop that opened them)."""
+    loop = asyncio.get_running_loop()
+    key = (api_key, id(loop))
+    client = _upstream_clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(api_key=api_key)
+        for (_, loop_id), old in _upstream_clients.items():  # Key changed: release the old client's connections
+            if loop_id == id(loop) and hasattr(old, "close"):
+                loop.create_task(old.close())
+        _upstream_clients.clear()
+        _upstream_clients[key] = client
+    return client
+
+async def warm_session(session_name: str, role: str, target_language: str, model: str):
+    global session_warmup
+    import time as _time
+    steps: Dict[str, Any] = {}
+    session_warmup = {"state": "running", "session_name": session_name, "steps": steps}
+    t0 = _time.time()
+    try:
+        start = _time.time()
+        await asyncio.to_thread(get_encoding)
+        steps["tokenizer"] = {"ms": round((_time.time() - start) * 1000, 1)}
+
+        # Same inputs as answer_events, so the first question is a context cache hit
+        start = _time.time()
+        current_profile = load_profile() or {}
+        entry = get_system_context_entry(
+            role, target_language or 'Python',
+            current_profile.get('resume_text') or "", current_profile.get('job_description') or "",
+            is_esl=current_profile.get('is_esl', False),
+            short_responses=current_profile.get('short_responses', False),
+            resume_sha=current_profile.get('resume_text_sha256'), jd_sha=current_profile.get('job_description_sha256')
+        )
+        steps["system_context"] = {"ms": round((_time.time() - start) * 1000, 1), "tokens": entry["tokens"]}
+
+        api_key = get_api_key()
+        if not api_key:
+            steps["connection"] = {"skipped": "no API key"}
+        else:
+            start = _time.time()
+            client = get_async_client(api_key)
+            await upstream_scheduler.submit(  # Free call: DNS + TLS + auth
+                api_key, lambda: asyncio.wait_for(client.models.retrieve(model), WARMUP_CONNECT_TIMEOUT),
+                priority=PRIORITY_WARMUP, log_tag="WARMUP")
+            steps["connection"] = {"ms": round((_time.time() - start) * 1000, 1)}
+
+            if not WARMUP_PRIME_PROMPT_CACHE:
+                steps["prompt_cache"] = {"skipped": "disabled"}
+            elif entry["tokens"] < PROMPT_CACHE_MIN_TOKENS:
+                steps["prompt_cache"] = {"skipped": f"prompt under {PROMPT_CACHE_MIN_TOKENS} tokens"}
+            else:
+                start = _time.time()
+                token_param = {"max_completion_tokens": 16} if model.startswith("gpt-5") else {"max_tokens": 1}
+                response, _ = await upstream_scheduler.submit(
+                    api_key,
+                    lambda: client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "system", "content": entry["prompt"]}, {"role": "user", "content": "Ready?"}],
+                        **token_param
+                    ),
+                    priority=PRIORITY_WARMUP, tokens=entry["tokens"] + 16, log_tag="WARMUP")
+                usage = response.usage
+                cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+                update_usage(usage.prompt_tokens, usage.completion_tokens, model, cached_tokens=cached)
+                steps["prompt_cache"] = {"ms": round((_time.time() - start) * 1000, 1), "tokens": usage.prompt_tokens}
+
+        session_warmup = {"state": "ready", "session_name": session_name, "steps": steps,
+                          "total_ms": round((_time.time() - t0) * 1000, 1)}
+        print(f"[WARMUP] Session '{session_name}' warm in {session_warmup['total_ms']:.0f} ms: {steps}")
+    except asyncio.CancelledError:
+        session_warmup = {"state": "cancelled", "session_name": session_name, "steps": steps}
+        raise
+    except Exception as e:
+        session_warmup = {"state": "failed", "session_name": session_name, "steps": steps, "error": str(e)[:200]}
+        print(f"[WARMUP] Session '{session_name}' warm-up failed: {e}")
+    channel_hub.publish("session", {"type": "session.warm", **session_warmup})
+
+def start_session_warmup(session_name: str, role: str, target_language: str, model: Optional[str]):
+    """Start warming the session in the background (replacing a warm-up still running for another one)"""
+    global _session_warmup_task
+    if _session_warmup_task is not None and not _session_warmup_task.done():
+        _session_warmup_task.cancel()
+    model = model if model in AVAILABLE_TEXT_MODELS else DEFAULT_TEXT_MODEL
+    _session_warmup_task = asyncio.create_task(warm_session(session_name, role, target_language, model))
+
+
 @app.post('/session/save')
 async def save_session_data(data: Dict[str, Any]):
     """Save session metadata (job description, API key, etc.)"""
@@ -945,13 +1532,15 @@ async def save_session_data(data: Dict[str, Any]):
             'target_language': data.get('target_language', ''),
             'is_esl': data.get('is_esl', False),
             'short_responses': data.get('short_responses', False),
+            'summary_engine': data.get('summary_engine', DEFAULT_SUMMARY_ENGINE),
             'created_at': data.get('created_at', ''),
             'updated_at': str(Path('').resolve()),  # Will be updated on each save
             'text_model': data.get('text_model', DEFAULT_TEXT_MODEL),
             'openai_api_key': data.get('openai_api_key', '')  # Persisted for session restore
         }
         
-        session_file.write_text(json.dumps(session_data, indent=2), encoding='utf-8')
+        session_data['job_description_preview'] = (session_data['job_description'] or '')[:100]  # /sessions lists without reading the blob
+        write_json_file(session_file, externalize_texts(session_data, f"session:{session_name}"))
         print(f"[SESSION] Saved session data to: {session_file}")
         
         # Initialize empty conversation file
@@ -967,11 +1556,14 @@ async def save_session_data(data: Dict[str, Any]):
         profile_cache['resume_text'] = data.get('resume_text', '')
         profile_cache['is_esl'] = data.get('is_esl', False)
         profile_cache['short_responses'] = data.get('short_responses', False)
+        profile_cache['summary_engine'] = data.get('summary_engine', DEFAULT_SUMMARY_ENGINE)
         
         # Also save to profile for persistence
         save_profile(profile_cache)
         
         current_session_name = session_name
+        channel_hub.publish("session", {"type": "session.saved", "session_name": session_name})
+        start_session_warmup(session_name, session_data['target_role'], session_data['target_language'], session_data['text_model'])
         
         return {"status": "ok", "session_path": str(session_dir)}
     except Exception as e:
@@ -993,10 +1585,7 @@ async def save_conversation_entry(data: Dict[str, Any]):
     
     try:
         # Load existing conversation
-        if conv_file.exists():
-            conversation = json.loads(conv_file.read_text(encoding='utf-8'))
-        else:
-            conversation = []
+        conversation = read_json_file(conv_file, [])
         
         # Add new entry
         entry = {
@@ -1008,7 +1597,7 @@ async def save_conversation_entry(data: Dict[str, Any]):
         conversation.append(entry)
         
         # Save back
-        conv_file.write_text(json.dumps(conversation, indent=2), encoding='utf-8')
+        write_json_file(conv_file, conversation)
         print(f"[SESSION] Saved conversation entry #{len(conversation)} to: {conv_file}")
         
         return {"status": "ok", "entry_count": len(conversation)}
@@ -1020,7 +1609,7 @@ async def save_conversation_entry(data: Dict[str, Any]):
 @app.post('/session/end')
 async def end_session(data: Dict[str, str]):
     """Finalize and close a session"""
-    global current_session_name, conversation_history
+    global current_session_name, conversation_history, conversation_summary, profile_cache
     
     session_name = data.get('session_name') or current_session_name
     if not session_name:
@@ -1029,13 +1618,11 @@ async def end_session(data: Dict[str, str]):
     session_dir = SESSIONS_DIR / session_name
     
     try:
-        # Save final conversation history to session
-        if conversation_history:
+        # Save final conversation history to session (turns of the active session were already
+        # auto-saved as they completed - only a session that was not active needs them appended)
+        if conversation_history and session_name != current_session_name:
             conv_file = session_dir / 'conversation.json'
-            if conv_file.exists():
-                existing = json.loads(conv_file.read_text(encoding='utf-8'))
-            else:
-                existing = []
+            existing = read_json_file(conv_file, [])
             
             # Add any remaining history
             for i in range(0, len(conversation_history), 2):
@@ -1048,7 +1635,7 @@ async def end_session(data: Dict[str, str]):
                     }
                     existing.append(entry)
             
-            conv_file.write_text(json.dumps(existing, indent=2), encoding='utf-8')
+            write_json_file(conv_file, existing)
         
         # Record demo end time for cooldown enforcement
         if not is_licensed_backend:
@@ -1062,13 +1649,17 @@ async def end_session(data: Dict[str, str]):
             demo_session_start = None
             print(f"[SECURITY] Demo session ended. Cooldown started.")
 
-        # Clear current session and all in-memory context
+        # Clear current session and all in-memory context (the snapshot keeps it for /session/load)
+        if session_name == current_session_name:
+            save_context_snapshot(session_name=session_name)
+        screenshot_tracker.reset(session_name)
         current_session_name = None
         conversation_history = []
         conversation_summary = ""   # Reset rolling summary for the new session
         print("[SESSION] Cleared conversation history and rolling summary")
         
         print(f"[SESSION] Ended session: {session_name}")
+        channel_hub.publish("session", {"type": "session.ended", "session_name": session_name})
         return {"status": "ok", "message": f"Session '{session_name}' ended"}
 
     except Exception as e:
@@ -1087,13 +1678,13 @@ async def list_sessions():
             if session_dir.is_dir():
                 session_file = session_dir / 'session.json'
                 if session_file.exists():
-                    data = json.loads(session_file.read_text(encoding='utf-8'))
+                    data = read_json_file(session_file, {})
                     sessions.append({
                         'name': session_dir.name,
                         'created_at': data.get('created_at', ''),
                         'target_role': data.get('target_role', ''),
                         'target_language': data.get('target_language', ''),
-                        'job_description_preview': data.get('job_description', '')[:100]
+                        'job_description_preview': data.get('job_description_preview') or (data.get('job_description') or '')[:100]
                     })
         
         # Sort sessions by created_at descending (newest first)
@@ -1115,14 +1706,14 @@ async def load_session(session_name: str):
         if not session_file.exists():
             return {"status": "error", "error": "Session not found"}
         
-        data = json.loads(session_file.read_text(encoding='utf-8'))
+        data = resolve_texts(read_json_file(session_file, {}))
         
         # Load conversation history
         conv_file = session_dir / 'conversation.json'
         history = []
         if conv_file.exists():
             try:
-                history = json.loads(conv_file.read_text(encoding='utf-8'))
+                history = read_json_file(conv_file, [])
             except:
                 history = []
 
@@ -1130,10 +1721,14 @@ async def load_session(session_name: str):
         current_session_name = session_name
         print(f"[SESSION] Set active session to: {session_name}")
 
+        # Restore the conversation context (summary + recent turns) the session ended with
+        context = restore_context_snapshot(session_name, history, data)
+
         # Reset session usage so API cost starts at $0 for this run
         session_usage = {
             "input_tokens": 0,
             "output_tokens": 0,
+            "cached_input_tokens": 0,
             "total_cost": 0,
             "request_count": 0
         }
@@ -1148,6 +1743,7 @@ async def load_session(session_name: str):
         profile_cache['resume_text'] = data.get('resume_text', '')
         profile_cache['target_role'] = data.get('target_role', '')
         profile_cache['target_language'] = data.get('target_language', '')
+        profile_cache['summary_engine'] = data.get('summary_engine', DEFAULT_SUMMARY_ENGINE)
         
         # Restore API key: prefer session.json value, fall back to previously stored key
         api_key_to_use = data.get('openai_api_key') or existing_api_key
@@ -1159,6 +1755,9 @@ async def load_session(session_name: str):
         
         # PERSIST: Ensure the AI endpoints (which reload from disk) see this restored context
         save_profile(profile_cache)
+        channel_hub.publish("session", {"type": "session.loaded", "session_name": session_name})
+        channel_hub.publish("usage", {"type": "usage", **usage_snapshot()})
+        start_session_warmup(session_name, data.get('target_role', ''), data.get('target_language', ''), data.get('text_model'))
 
         return {
             "status": "ok",
@@ -1169,7 +1768,9 @@ async def load_session(session_name: str):
             "target_language": data.get('target_language', ''),
             "created_at": data.get('created_at', ''),
             "text_model": data.get('text_model', DEFAULT_TEXT_MODEL),
-            "history": history
+            "summary_engine": data.get('summary_engine', DEFAULT_SUMMARY_ENGINE),
+            "history": history,
+            "context": context
         }
     except Exception as e:
         return {"status": "error", "error": str(e)}
@@ -1186,7 +1787,9 @@ async def delete_session(session_name: str):
             return {"status": "error", "error": "Session not found"}
         
         shutil.rmtree(session_dir)
+        blob_store.release(f"session:{session_name}")  # Resume/JD blobs no other session or the profile uses are removed
         print(f"[SESSION] Deleted session: {session_name}")
+        channel_hub.publish("session", {"type": "session.deleted", "session_name": session_name})
         
         return {"status": "ok", "message": f"Session '{session_name}' deleted"}
     except Exception as e:
@@ -1201,7 +1804,10 @@ async def clear_conversation():
     """Clear conversation history to start a fresh session"""
     global conversation_history
     conversation_history = []
+    save_context_snapshot()
+    screenshot_tracker.reset(screenshot_session_key())  # Crops assume the model remembers the previous screen
     print("[CONVERSATION] History cleared - starting fresh session")
+    channel_hub.publish("session", {"type": "conversation.cleared"})
     return {"status": "ok", "message": "Conversation history cleared"}
 
 
@@ -1213,8 +1819,8 @@ async def get_conversation_history():
 
 @app.get('/usage')
 async def get_usage():
-    """Get current session API usage and cost"""
-    return session_usage
+    """Get current session API usage and cost (plus answer cache hit rate)"""
+    return usage_snapshot()
 
 
 @app.post('/usage/reset')
@@ -1224,9 +1830,11 @@ async def reset_usage():
     session_usage = {
         "input_tokens": 0,
         "output_tokens": 0,
+        "cached_input_tokens": 0,
         "total_cost": 0.0,
         "request_count": 0
     }
+    channel_hub.publish("usage", {"type": "usage", **usage_snapshot()})
     return {"status": "ok", "message": "Usage reset"}
 
 @app.post('/profile/resume')
@@ -1246,12 +1854,12 @@ async def upload_resume(file: UploadFile = File(...)):
         out_path.write_bytes(content)
 
         # Extract text using python-docx (if available)
-        if Document is None:
+        if not DOCX_AVAILABLE:
             return {"status": "error", "error": "python-docx is not installed on the server. Install with: pip install python-docx"}
 
         try:
-            doc = Document(out_path)
-            text = "\n\n".join([p.text for p in doc.paragraphs if p.text and p.text.strip()])
+            resume = await extract_resume(content)
+            text = resume['text']
         except Exception as e:
             return {"status": "error", "error": f"docx parse failed: {e}"}
 
@@ -1262,341 +1870,1075 @@ async def upload_resume(file: UploadFile = File(...)):
         
         try:
             save_profile(profile_cache)
-            # Invalidate the cached system context so the new resume is picked up
-            invalidate_context_cache()
+            # No cache invalidation needed: the context cache is keyed by resume content
             print(f"\n{'='*60}")
             print(f"[RESUME UPLOAD SUCCESS]")
             print(f"File: {filename}")
             print(f"Text extracted: {len(text)} characters")
-            print(f"Saved to profile! Context cache invalidated.")
+            print("Saved to profile! New resume content will build a fresh system context.")
             print(f"{'='*60}\n")
         except Exception as save_error:
             print(f"\n[RESUME SAVE FAILED]: {save_error}\n")
             return {"status": "error", "error": f"Failed to save resume: {save_error}"}
 
-        return {"status": "ok", "resume_snippet": text[:800]}
+        return {"status": "ok", "resume_snippet": text[:800],
+                "sections": [sec['title'] for sec in resume['sections']], "resume_tokens": resume['tokens']}
     except Exception as e:
         print(f"\n[RESUME UPLOAD ERROR]: {e}\n")
         return {"status": "error", "error": str(e)}
 
 # ----------------------------------------------------------------------------
 
-@app.post("/ai/stream")
-async def stream_ai_response(req: AIRequest):
-    """Streaming endpoint for real-time AI responses using Server-Sent Events"""
-    global conversation_history
-    
-    async def generate_stream():
-        global conversation_history, conversation_summary
-        if not check_access_allowed():
-            yield f"data: {json.dumps({'error': 'Demo expired. Please purchase a license to continue.'})}\n\n"
-            return
+# ============ ANSWER CACHE ============
+# Repeated interview questions ("tell me about yourself", "what's a hash map") are answered
+# from memory instead of paying for a new completion. Keyed on the normalized transcript,
+# the session context hash and the model; near-duplicates are matched with MinHash. Questions
+# that refer back to earlier turns are also keyed on the rolling summary and the last turn.
+# Text-only questions; requests can opt out with bypass_cache=True.
+from answer_cache import AnswerCache, normalize_transcript, refers_back
+
+ANSWER_CACHE_MAX_ENTRIES = 256
+ANSWER_CACHE_TTL_SECONDS = 6 * 60 * 60
+ANSWER_CACHE_NEAR_DUP_THRESHOLD = 0.8  # Estimated Jaccard similarity of transcript shingles
+
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    near_dup_threshold=ANSWER_CACHE_NEAR_DUP_THRESHOLD
+)
+ANSWER_CACHE_STATE_TURNS = 2  # Messages (last Q and A) a back-referencing question is keyed on
+
+
+def answer_cache_context(context_hash: str, transcript: str) -> str:
+    """Cache partition for a question: the session context hash, plus the conversation state
+    (rolling summary + last turn) when the question refers back to earlier turns."""
+    if not conversation_history or not refers_back(transcript):
+        return context_hash
+    state = [conversation_summary] + [m.get("content", "") for m in conversation_history[-ANSWER_CACHE_STATE_TURNS:]]
+    return hashlib.sha256("\x00".join([context_hash] + state).encode("utf-8")).hexdigest()[:32]
+
+
+async def commit_turn_to_context(req: AIRequest, full_response: str, model: str, profile: Optional[Dict[str, Any]],
+                                 response_time: float = 0, total_time: float = 0, cost: float = 0,
+                                 input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0,
+                                 log_tag: str = "STREAM", context_hash: Optional[str] = None):
+    """Record a finished answer: append it to the rolling conversation context, auto-save it to the
+    active session, summarize turns that age out of the window and update the session's context
+    snapshot. No-op when save_to_context=False."""
+    global conversation_history, conversation_summary
+
+    # Save to conversation history only if save_to_context is True
+    # (skip for one-shot LeetCode problems, save for scenarios needing follow-up)
+    if req.save_to_context is False:
+        print(f"[{log_tag}] Skipped saving to history (save_to_context=False)")
+        return
 
+    user_msg = screenshot_user_message(req)
+    conversation_history.append({"role": "user", "content": user_msg})
+    conversation_history.append({"role": "assistant", "content": full_response})
+
+    # Save to session folder if active
+    if current_session_name:
         try:
-            client = OpenAI(api_key=get_api_key())
-            
-            current_profile = load_profile()
-            resume_text = ""
-            job_description = ""
-            profile_metadata = None
-            if current_profile and isinstance(current_profile, dict):
-                resume_text = current_profile.get('resume_text') or ""
-                job_description = current_profile.get('job_description') or ""
-                profile_metadata = {k: v for k, v in current_profile.items() if k not in ['resume_text', 'job_description']}
-            
-            has_resume = bool(resume_text.strip())
-            print(f"[STREAM] Has resume: {has_resume}, history len: {len(conversation_history)}")
-
-            # Use cached system context (resume + JD baked in)
-            is_esl = False
-            short_responses = False
-            if profile_metadata:
-                is_esl = profile_metadata.get('is_esl', False)
-                short_responses = profile_metadata.get('short_responses', False)
-
-            system_content = get_system_context(
-                req.role, req.target_language or 'Python',
-                resume_text, job_description,
-                for_vision=bool(req.screenshot),
-                is_esl=is_esl,
-                short_responses=short_responses
-            )
-            messages = [{"role": "system", "content": system_content}]
+            save_conversation_to_session(user_msg, full_response, has_screenshot(req), model, response_time=response_time, total_time=total_time, cost=cost, input_tokens=input_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens)
+        except Exception as save_err:
+            print(f"[SESSION SAVE ERROR] {save_err}")
+
+    # Rolling summary: when history exceeds 3 turns (6 msgs), summarize the oldest turn
+    # then evict it. This preserves context indefinitely at near-zero token cost.
+    if len(conversation_history) > 6:
+        turns_to_evict = conversation_history[:-6]  # Everything older than the 3 most recent turns
+        api_key_for_summary = get_api_key()
+        new_chunk = await summarize_old_turns(turns_to_evict, api_key_for_summary, get_summary_engine(profile))
+        if new_chunk:
+            conversation_summary = (conversation_summary + "\n" + new_chunk).strip() if conversation_summary else new_chunk
+        conversation_history = conversation_history[-6:]
+
+    print(f"[{log_tag}] Conversation history: {len(conversation_history)} msgs | Summary: {len(conversation_summary)} chars")
+    save_context_snapshot(context_hash, profile=profile)
+
+
+# ============ CONTEXT SNAPSHOT ============
+# The in-memory conversation context (rolling summary + recent tail) is mirrored into
+# sessions/<name>/context.json after every committed turn, so /session/load restores it as it was
+# - without re-summarizing old turns through the API. Sessions saved before snapshots existed
+# fall back to the last turns of conversation.json (no summary).
+CONTEXT_SNAPSHOT_FILE = 'context.json'
+CONTEXT_SNAPSHOT_VERSION = 1
+_snapshot_context_hash = None  # System context hash of the last answered request
+_snapshot_text_hashes: Dict[str, Optional[str]] = {}  # Resume/JD hashes of that same request
+
+def profile_text_hashes(profile: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """{"<field>_sha256": hash} of the resume/JD in a resolved profile or session (same hashes as the context key)"""
+    profile = profile if isinstance(profile, dict) else {}
+    return {f"{field}_sha256": profile.get(f"{field}_sha256") or text_hash(profile.get(field) or '')
+            for field in BLOB_TEXT_FIELDS}
+
+def save_context_snapshot(context_hash: Optional[str] = None, session_name: Optional[str] = None,
+                          profile: Optional[Dict[str, Any]] = None):
+    """Write the current conversation context of the active (or given) session.
+    profile: the load_profile() result the answer was built from (its resume/JD go with context_hash)."""
+    global _snapshot_context_hash, _snapshot_text_hashes
+    session_name = session_name or current_session_name
+    if context_hash:
+        _snapshot_context_hash = context_hash
+        _snapshot_text_hashes = profile_text_hashes(profile)
+    if not session_name:
+        return
+    import time as _time
+    snapshot = {
+        "version": CONTEXT_SNAPSHOT_VERSION,
+        "updated_at": _time.time(),
+        "summary": conversation_summary,
+        "summary_tokens": count_tokens(conversation_summary) if conversation_summary else 0,
+        "tail": conversation_history,
+        "tail_tokens": sum(count_tokens(m.get('content') or '') for m in conversation_history),
+        "context_hash": _snapshot_context_hash,
+        **_snapshot_text_hashes,
+    }
+    try:
+        session_dir = SESSIONS_DIR / session_name
+        session_dir.mkdir(parents=True, exist_ok=True)
+        write_json_file(session_dir / CONTEXT_SNAPSHOT_FILE, snapshot, pretty=False)
+    except Exception as e:
+        print(f"[CONTEXT SNAPSHOT] Save failed: {e}")
+
+def restore_context_snapshot(session_name: str, history: list, session_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Restore conversation_history/conversation_summary for a loaded session. Returns what was restored.
+    session_data: the session's resolved session.json - a snapshot taken against a different resume/JD
+    is not restored (its summary and answers were written for the old texts)."""
+    global conversation_history, conversation_summary, _snapshot_context_hash, _snapshot_text_hashes
+    snapshot = read_json_file(SESSIONS_DIR / session_name / CONTEXT_SNAPSHOT_FILE, None)
+    current_hashes = profile_text_hashes(session_data)
+    stale = [field for field, sha in current_hashes.items()
+             if isinstance(snapshot, dict) and snapshot.get(field) and snapshot[field] != sha] if session_data is not None else []
+    if stale:
+        print(f"[CONTEXT SNAPSHOT] '{session_name}' snapshot was taken with a different {', '.join(f[:-7] for f in stale)} - not restored")
+        conversation_history, conversation_summary = [], ""
+        _snapshot_context_hash, _snapshot_text_hashes = None, {}
+        source, tokens = "stale", 0
+    elif isinstance(snapshot, dict) and snapshot.get("version") == CONTEXT_SNAPSHOT_VERSION:
+        conversation_history = list(snapshot.get("tail") or [])
+        conversation_summary = snapshot.get("summary") or ""
+        _snapshot_context_hash = snapshot.get("context_hash")
+        _snapshot_text_hashes = {field: snapshot.get(field) for field in current_hashes}
+        source = "snapshot"
+        tokens = (snapshot.get("summary_tokens") or 0) + (snapshot.get("tail_tokens") or 0)
+    else:
+        # No snapshot yet: the last 3 completed turns, no summary of anything older
+        conversation_history = []
+        for entry in [e for e in history if isinstance(e, dict) and not e.get('cancelled')][-3:]:
+            conversation_history.append({"role": "user", "content": entry.get('question', '')})
+            conversation_history.append({"role": "assistant", "content": entry.get('response', '')})
+        conversation_summary = ""
+        _snapshot_context_hash, _snapshot_text_hashes = None, {}
+        source = "history" if conversation_history else "empty"
+        tokens = sum(count_tokens(m['content']) for m in conversation_history)
+    print(f"[CONTEXT SNAPSHOT] Restored '{session_name}' from {source}: {len(conversation_history)} msgs, "
+          f"summary {len(conversation_summary)} chars, ~{tokens} tokens")
+    return {"source": source, "messages": len(conversation_history), "summary_chars": len(conversation_summary),
+            "tokens": tokens, "context_hash": _snapshot_context_hash}
+
+
+# ============ SCREENSHOT CHANGE DETECTION ============
+# Repeated captures of a barely-changed editor/problem page: an unchanged screen asked the same
+# question replays the previous answer; a small change is sent cropped to the changed region
+# (only when the previous answer is in the conversation context). See screenshot_diff.py.
+from screenshot_diff import ScreenshotTracker, DIFF_AVAILABLE, decode_data_url
+
+SCREENSHOT_DIFF_ENABLED = DIFF_AVAILABLE
+if not DIFF_AVAILABLE:
+    print("Warning: numpy/Pillow not installed - screenshots are always sent whole.")
+screenshot_tracker = ScreenshotTracker()
+
+
+def screenshot_session_key() -> str:
+    return current_session_name or "default"
+
+
+# ============ SCREENSHOT ANSWER CACHE ============
+# One-shot screenshot problems (save_to_context=False) recur across sessions and users on the
+# same machine. A verified perceptual-hash match returns the stored solution instantly instead
+# of a new vision completion. Persisted under BASE_DIR/screenshot_cache. See screenshot_cache.py.
+from screenshot_cache import ScreenshotAnswerCache, CACHE_AVAILABLE, fingerprint
+
+SCREENSHOT_CACHE_ENABLED = CACHE_AVAILABLE
+SCREENSHOT_CACHE_MAX_ENTRIES = 500
+SCREENSHOT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SCREENSHOT_CACHE_MAX_DISTANCE = 6         # pHash Hamming distance for a candidate (of 63 bits)
+SCREENSHOT_CACHE_MAX_CHANGED = 0.002      # Fraction of thumbnail pixels allowed to differ on verification
+
+screenshot_answer_cache = ScreenshotAnswerCache(
+    BASE_DIR / "screenshot_cache",
+    max_entries=SCREENSHOT_CACHE_MAX_ENTRIES,
+    max_bytes=SCREENSHOT_CACHE_MAX_BYTES,
+    max_distance=SCREENSHOT_CACHE_MAX_DISTANCE,
+    max_changed_fraction=SCREENSHOT_CACHE_MAX_CHANGED,
+)
 
-            # Inject rolling summary if available — compressed memory of evicted turns
-            if conversation_summary:
-                messages.append({
-                    "role": "system",
-                    "content": f"[CONTEXT FROM EARLIER IN THIS SESSION]:\n{conversation_summary}"
-                })
-
-            # Send last 3 raw turns (6 messages) for full-fidelity recent context
-            messages.extend(conversation_history[-6:])
-
-            if req.screenshot:
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": req.transcript},
-                        {"type": "image_url", "image_url": {"url": req.screenshot}}
-                    ]
-                })
-                model = "gpt-4o-mini"
-                print(f"[STREAM] Using model: {model} (vision)")
-            else:
-                messages.append({"role": "user", "content": req.transcript})
-                model = req.text_model if req.text_model and req.text_model in AVAILABLE_TEXT_MODELS else DEFAULT_TEXT_MODEL
-                print(f"[STREAM] Using model: {model} (text-only, user selected: {req.text_model})")
 
+@app.on_event("shutdown")
+def flush_screenshot_cache():
+    screenshot_answer_cache.flush()  # Hit counts/recency are saved lazily
 
-            # GPT-5+ models are reasoning models: they use tokens for internal thinking
-            # before producing output so they need a much higher token limit.
-            # Do NOT pass temperature or max_tokens to reasoning models - unsupported params.
-            token_param = {}
-            if model.startswith("gpt-5"):
-                token_param["max_completion_tokens"] = 16384  # reasoning needs headroom for thinking tokens
-            else:
-                token_param["max_tokens"] = 2048
-                token_param["temperature"] = 0.7
-            
-            # Send heartbeat to establish SSE connection
-            yield f"data: {json.dumps({'heartbeat': True})}\n\n"
-            
-            import time as _time
-            _start_time = _time.time()
-            
-            # Create completion - catch errors separately so they always reach the client
-            try:
-                completion = client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    stream=True,
-                    **token_param
-                )
-            except Exception as create_err:
-                print(f"[STREAM] OpenAI create() error: {create_err}")
-                yield f"data: {json.dumps({'error': str(create_err)})}\n\n"
-                return
-            
-            # Collect full response for history
-            full_response = ""
-            _ttft = 0  # time to first token
-            
-            # Yield chunks as they arrive - wrap in try/except for iteration errors
-            try:
-                for chunk in completion:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
-                        if not full_response:  # First token
-                            _ttft = _time.time() - _start_time
-                        full_response += content
-                        # Send as Server-Sent Event format
-                        yield f"data: {json.dumps({'chunk': content})}\n\n"
-            except Exception as iter_err:
-                err_msg = str(iter_err)[:200]
-                print(f"[STREAM] Iteration error: {iter_err}")
-                yield f"data: {json.dumps({'error': err_msg})}\n\n"
-                return
-            
-            # Check for empty response
-            if not full_response.strip():
-                print(f"[STREAM] WARNING: Model {model} returned empty response")
-                yield f"data: {json.dumps({'error': f'Model {model} returned an empty response. The model may not support this request format.'})}\n\n"
-                return
 
-            # Calculate usage and per-response cost BEFORE saving
-            input_text = "\n".join([m.get('content', '') if isinstance(m.get('content'), str) else str(m.get('content', '')) for m in messages])
-            input_tokens = count_tokens(input_text)
-            output_tokens = count_tokens(full_response)
-            
-            # Estimate image tokens if screenshot was used
-            image_tokens = 0
-            if req.screenshot:
-                image_tokens = estimate_image_tokens(req.screenshot, model)
-            
-            response_cost = calculate_cost(input_tokens, output_tokens, model, image_tokens)
-
-            # Save to conversation history only if save_to_context is True
-            # (skip for one-shot LeetCode problems, save for scenarios needing follow-up)
-            save_to_context = req.save_to_context is not False
-            if save_to_context:
-                if req.screenshot:
-                    user_msg = f"[USER SHARED A SCREENSHOT] Question about the screenshot: {req.transcript}"
-                else:
-                    user_msg = req.transcript
-                conversation_history.append({"role": "user", "content": user_msg})
-                conversation_history.append({"role": "assistant", "content": full_response})
-                
-                # Save to session folder if active
-                if current_session_name:
-                    try:
-                        _total_time_current = _time.time() - _start_time
-                        save_conversation_to_session(user_msg, full_response, bool(req.screenshot), model, response_time=_ttft, total_time=_total_time_current, cost=response_cost, input_tokens=input_tokens, output_tokens=output_tokens)
-                    except Exception as save_err:
-                        print(f"[SESSION SAVE ERROR] {save_err}")
-                
-                # Rolling summary: when history exceeds 3 turns (6 msgs), summarize the oldest turn
-                # then evict it. This preserves context indefinitely at near-zero token cost.
-                if len(conversation_history) > 6:
-                    turns_to_evict = conversation_history[:-6]  # Everything older than the 3 most recent turns
-                    api_key_for_summary = get_api_key()
-                    new_chunk = await summarize_old_turns(turns_to_evict, api_key_for_summary)
-                    if new_chunk:
-                        conversation_summary = (conversation_summary + "\n" + new_chunk).strip() if conversation_summary else new_chunk
-                    conversation_history = conversation_history[-6:]
-                
-                print(f"[STREAM] Conversation history: {len(conversation_history)} msgs | Summary: {len(conversation_summary)} chars")
-            else:
-                print(f"[STREAM] Skipped saving to history (save_to_context=False)")
-            
-            update_usage(input_tokens, output_tokens, model, image_tokens)
-            
-            _total_time = _time.time() - _start_time
-            # Send completion signal with usage info and per-response cost
-            yield f"data: {json.dumps({'done': True, 'model': model, 'usage': session_usage, 'response_in_tokens': input_tokens, 'response_out_tokens': output_tokens, 'response_cost': round(response_cost, 6), 'ttft': round(_ttft, 2), 'total_time': round(_total_time, 2)})}\n\n"
-            
-        except Exception as e:
-            err_msg = str(e)[:200]
-            print(f"Streaming AI Error: {e}")
-            yield f"data: {json.dumps({'error': err_msg})}\n\n"
-    
-    return StreamingResponse(generate_stream(), media_type="text/event-stream")
+def screenshot_cache_partition(transcript: str, language: str, model: str) -> str:
+    return hashlib.sha256(f"{normalize_transcript(transcript)}\x00{language}\x00{model}".encode("utf-8")).hexdigest()[:16]
 
 
-@app.post("/ai")
-async def generate_ai_response(req: AIRequest):
+def analyze_screenshot(req: AIRequest, diff: bool, cache: bool):
+    """Decode the screenshot once and run change detection and/or fingerprinting on it.
+    Returns (diff result or None, fingerprint or None). Runs in a worker thread."""
+    image = decode_data_url(req.screenshot)
+    prep = screenshot_tracker.prepare(screenshot_session_key(), image, req.screenshot,
+                                      normalize_transcript(req.transcript),
+                                      req.save_to_context is not False) if diff else None
+    return prep, (fingerprint(image) if cache else None)
+
+
+# ============ SCREENSHOT BATCHING ============
+# A long problem statement / code file captured in several scrolled screenshots goes out as ONE
+# vision request: overlapping rows are de-duplicated, the rest is stitched into one strip and
+# packed into as few model tiles as possible (or sent as separate images when that is cheaper).
+# See screenshot_stitch.py and bench_screenshot_stitch.py.
+from screenshot_stitch import pack_screenshots, STITCH_AVAILABLE
+
+SCREENSHOT_STITCH_ENABLED = STITCH_AVAILABLE
+PACKED_SCREENSHOTS_NOTE = ("[The {captures} screenshots were merged: overlapping parts removed and the page cut into "
+                           "{columns} columns. Read the columns left to right, each top to bottom, across all images in order.]")
+
+
+def normalize_screenshots(req: AIRequest):
+    """Fold screenshot/screenshots together: a single capture always ends up in req.screenshot (so
+    change detection and the screenshot cache apply), several in req.screenshots."""
+    captures = ([req.screenshot] if req.screenshot else []) + [s for s in (req.screenshots or []) if s]
+    req.screenshot = captures[0] if len(captures) == 1 else None
+    req.screenshots = captures if len(captures) > 1 else None
+
+
+def has_screenshot(req: AIRequest) -> bool:
+    return bool(req.screenshot or req.screenshots)
+
+
+def screenshot_user_message(req: AIRequest) -> str:
+    if req.screenshots:
+        return f"[USER SHARED {len(req.screenshots)} SCREENSHOTS] Question about the screenshots: {req.transcript}"
+    if req.screenshot:
+        return f"[USER SHARED A SCREENSHOT] Question about the screenshot: {req.transcript}"
+    return req.transcript
+
+
+def stitch_screenshots(data_urls: List[str]) -> Dict[str, Any]:
+    """Decode the captures and pack them. Runs in a worker thread."""
+    return pack_screenshots([decode_data_url(url) for url in data_urls], data_urls)
+
+
+# ============ STREAM FRAMING ============
+# Upstream deltas are coalesced into one frame per STREAM_FLUSH_INTERVAL_MS (or every
+# STREAM_FLUSH_BYTES of text); the first token is never delayed. Per-request overrides:
+# AIRequest.flush_interval_ms / flush_bytes. See bench_sse_framing.py for the numbers.
+from stream_framing import coalesce_chunks, DEFAULT_FLUSH_INTERVAL_MS, DEFAULT_FLUSH_BYTES
+
+STREAM_FLUSH_INTERVAL_MS = DEFAULT_FLUSH_INTERVAL_MS
+STREAM_FLUSH_BYTES = DEFAULT_FLUSH_BYTES
+
+
+# ============ REQUEST CANCELLATION ============
+# Every answer registers under a request id. A request is cancelled when the SSE client
+# disconnects, when /ai/cancel names it, or (latest question wins) when a newer question
+# arrives from the same client - a /channel window, a /realtime socket, or the request's client_id
+# (HTTP requests without one share the active session's key). Cancelling aborts the upstream stream at once - no more output tokens are paid for -
+# and the partial answer is recorded in the session as cancelled instead of entering the context.
+LATEST_QUESTION_WINS = True
+
+active_requests: Dict[str, Dict[str, Any]] = {}   # request_id -> {"cancel_reason", "pump", "record_partial", "client"}
+
+
+def supersede_key(req: AIRequest) -> str:
+    """Which answers a new question from req may cancel (latest question wins per client, not globally)"""
+    return req.client_id or f"session:{current_session_name or 'default'}"
+
+
+def cancel_request(request_id: str, reason: str = "cancelled", record_partial: bool = True) -> bool:
+    """Abort an in-flight answer. Returns False if the request is unknown or already finished.
+    record_partial=False drops the partial answer instead of logging it (unseen speculative answers)."""
+    state = active_requests.get(request_id)
+    if not state or state["cancel_reason"]:
+        return False
+    state["cancel_reason"] = reason
+    state["record_partial"] = record_partial
+    if state["pump"] is not None:
+        state["pump"].cancel()  # Closes the upstream stream (see guarded_stream)
+    print(f"[CANCEL] Request {request_id} cancelled ({reason})")
+    return True
+
+
+def _record_cancelled_answer(req: AIRequest, partial: str, model: str, reason: str, input_tokens: int, cost_start: float):
+    """Keep the partial answer (marked cancelled) in the session log and bill what was streamed."""
+    import time as _time
+    output_tokens = count_tokens(partial) if partial else 0
+    print(f"[CANCEL] Partial answer kept: {len(partial)} chars, {output_tokens} tokens ({reason})")
+    if not partial:
+        return
+    cost = calculate_cost(input_tokens, output_tokens, model)
+    update_usage(input_tokens, output_tokens, model)
+    if current_session_name and req.save_to_context is not False:
+        save_conversation_to_session(screenshot_user_message(req), partial, has_screenshot(req), model, total_time=_time.time() - cost_start,
+                                     cost=cost, input_tokens=input_tokens, output_tokens=output_tokens, cancelled=True)
+
+
+async def answer_events(req: AIRequest, log_tag: str = "STREAM", reasoning_token_limit: int = 16384,
+                        commit_gate: Optional[asyncio.Future] = None, supersede: bool = True):
+    """Generate one answer as a sequence of event dicts:
+    {"heartbeat", "request_id"}, {"chunk"}..., then {"done", ...usage}, {"cancelled"} or {"error"}.
+    Shared by /ai/stream (SSE), /ai (collected) and the /realtime auto-answer pipeline.
+    commit_gate: when given, the answer is only committed to the conversation context once the
+    future resolves (used by speculative answers that may still be cancelled).
+    supersede: cancel the other in-flight answers of the same client first (latest question wins)."""
     if not check_access_allowed():
-        return {"answer": "Error: Demo expired. Please purchase a license to continue."}
+        yield {'error': 'Demo expired. Please purchase a license to continue.'}
+        return
+
+    import uuid
+    request_id = req.request_id or uuid.uuid4().hex[:12]
+    normalize_screenshots(req)
+    client_key = supersede_key(req)
+    if supersede and LATEST_QUESTION_WINS:
+        for other_id, other in list(active_requests.items()):
+            if other["client"] == client_key:
+                cancel_request(other_id, "superseded")
+    state = {"cancel_reason": None, "pump": None, "record_partial": True, "client": client_key}
+    active_requests[request_id] = state
+
+    import time as _time
+    full_response = ""
+    model = ""
+    messages = []
+    context_entry = None
+    finished = False
+    _start_time = _time.time()
 
-    global conversation_history, conversation_summary
-    print(f"\n[DEBUG] /ai called with: transcript={req.transcript[:50] if req.transcript else None}..., role={req.role}, screenshot={'YES' if req.screenshot else 'NO'}, save_to_context={req.save_to_context}")
     try:
-        client = OpenAI(api_key=get_api_key())
-        
+        api_key = get_api_key()
+        client = get_async_client(api_key)  # Shared - reuses the connection opened by the session warm-up
+
         current_profile = load_profile()
-        
         resume_text = ""
         job_description = ""
+        profile_metadata = None
         if current_profile and isinstance(current_profile, dict):
             resume_text = current_profile.get('resume_text') or ""
             job_description = current_profile.get('job_description') or ""
-        
+            profile_metadata = {k: v for k, v in current_profile.items() if k not in ['resume_text', 'job_description']}
+
         has_resume = bool(resume_text.strip())
-        print(f"[AI] Has resume: {has_resume}, history len: {len(conversation_history)}")
+        print(f"[{log_tag}] Request {request_id} | Has resume: {has_resume}, history len: {len(conversation_history)}")
 
+        # Use cached system context (resume + JD baked in)
         is_esl = False
         short_responses = False
-        if current_profile and isinstance(current_profile, dict):
-            is_esl = current_profile.get('is_esl', False)
-            short_responses = current_profile.get('short_responses', False)
+        if profile_metadata:
+            is_esl = profile_metadata.get('is_esl', False)
+            short_responses = profile_metadata.get('short_responses', False)
 
-        # Use cached system context (resume + JD baked in) — same optimization as /ai/stream
-        system_content = get_system_context(
+        context_entry = get_system_context_entry(
             req.role, req.target_language or 'Python',
             resume_text, job_description,
-            for_vision=bool(req.screenshot),
             is_esl=is_esl,
-            short_responses=short_responses
+            short_responses=short_responses,
+            resume_sha=current_profile.get('resume_text_sha256'), jd_sha=current_profile.get('job_description_sha256')
         )
-        messages = [{"role": "system", "content": system_content}]
-
-        # Inject rolling summary if available
-        if conversation_summary:
-            messages.append({"role": "system", "content": f"[CONTEXT FROM EARLIER IN THIS SESSION]:\n{conversation_summary}"})
-
-        # Send last 3 raw turns (6 messages) for full-fidelity recent context
-        messages.extend(conversation_history[-6:])
-
-        if req.screenshot:
-            messages.append({
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": req.transcript},
-                    {"type": "image_url", "image_url": {"url": req.screenshot}}
-                ]
-            })
+        # Compare with the previous screenshot of this session (decode + diff run off the event loop)
+        screenshot_url = req.screenshot
+        model_transcript = req.transcript
+        screenshot_prep = None
+        screenshot_fp = None
+        use_diff = bool(req.screenshot and req.screenshot_diff and SCREENSHOT_DIFF_ENABLED)
+        use_screenshot_cache = bool(req.screenshot and req.save_to_context is False and not req.bypass_cache and SCREENSHOT_CACHE_ENABLED)
+        if use_diff or use_screenshot_cache:
+            try:
+                screenshot_prep, screenshot_fp = await asyncio.to_thread(analyze_screenshot, req, use_diff, use_screenshot_cache)
+                if screenshot_prep:
+                    print(f"[SCREENSHOT DIFF] {screenshot_prep['action']} ({screenshot_prep['changed_blocks']}/{screenshot_prep['total_blocks']} blocks changed)")
+            except Exception as diff_err:
+                print(f"[SCREENSHOT DIFF] Skipped: {diff_err}")
+        if screenshot_prep and screenshot_prep['action'] == "crop":
+            left, top, right, bottom = screenshot_prep['box']
+            screenshot_url = [screenshot_prep['overview_url'], screenshot_prep['data_url']]
+            model_transcript = (f"{req.transcript}\n\n[The first image is the whole screen at reduced resolution. The second "
+                                f"is the part that changed since the previous screenshot, at full resolution: "
+                                f"x {left}-{right}, y {top}-{bottom}.]")
+        screenshot_batch = None
+        if req.screenshots:
+            screenshot_url = req.screenshots
+            if SCREENSHOT_STITCH_ENABLED:
+                try:
+                    screenshot_batch = await asyncio.to_thread(stitch_screenshots, req.screenshots)
+                    screenshot_url = screenshot_batch['images']
+                    print(f"[SCREENSHOT BATCH] {screenshot_batch['captures']} captures -> {len(screenshot_url)} {screenshot_batch['mode']} image(s), "
+                          f"~{screenshot_batch['tokens']} vision tokens (separate: {screenshot_batch['separate_tokens']})")
+                    if screenshot_batch['mode'] == "packed":
+                        model_transcript = f"{req.transcript}\n\n" + PACKED_SCREENSHOTS_NOTE.format(**screenshot_batch)
+                except Exception as stitch_err:
+                    print(f"[SCREENSHOT BATCH] Sending captures as they are: {stitch_err}")
+
+        # Static prefix first, volatile summary/mode notes last (maximizes prompt-cache hits)
+        messages = build_messages(context_entry["prompt"], model_transcript, screenshot_url)
+
+        route = None
+        if req.text_model == AUTO_TEXT_MODEL:
+            route = route_question(req, count_message_tokens(messages, context_entry))
+            model = route["model"] or DEFAULT_TEXT_MODEL
+            print(f"[{log_tag}] Using model: {model} (auto: {route['category']}, expected TTFT {route.get('expected_ttft')}s "
+                  f"vs target {route['ttft_target']}s, ~${route.get('expected_cost', 0):.5f})")
+        elif has_screenshot(req):
             model = "gpt-4o-mini"
+            print(f"[{log_tag}] Using model: {model} (vision)")
         else:
-            messages.append({"role": "user", "content": req.transcript})
             model = req.text_model if req.text_model and req.text_model in AVAILABLE_TEXT_MODELS else DEFAULT_TEXT_MODEL
-        
-        # GPT-5+ models are reasoning models: they need higher token limit for thinking + output
-        token_param = {}
-        if model.startswith("gpt-5"):
-            token_param["max_completion_tokens"] = 4096
-        else:
-            token_param["max_tokens"] = 2048
-            token_param["temperature"] = 0.7
-        
-        import time as _time
+            print(f"[{log_tag}] Using model: {model} (text-only, user selected: {req.text_model})")
+
+        use_answer_cache = not has_screenshot(req) and not req.bypass_cache
+        cache_context = answer_cache_context(context_entry["hash"], req.transcript) if use_answer_cache else None
+
+        # Answer cache: a repeated question streams back its stored answer without an API call
+        replay = None
+        if use_answer_cache:
+            hit = answer_cache.get(req.transcript, cache_context, model)
+            if hit:
+                print(f"[ANSWER CACHE] {hit['match'].capitalize()} hit (similarity {hit['similarity']}) for: {hit['question'][:60]}")
+                replay = {'answer': hit['answer'], 'output_tokens': hit.get('output_tokens', 0),
+                          'cache_hit': hit['match'], 'cache_similarity': hit['similarity']}
+        # Known one-shot problem (possibly from another session): stored solution, no vision call
+        if screenshot_fp:
+            partition = screenshot_cache_partition(req.transcript, req.target_language or 'Python', model)
+            try:
+                hit = await asyncio.to_thread(screenshot_answer_cache.get, screenshot_fp, partition)
+            except Exception as cache_err:
+                print(f"[SCREENSHOT CACHE] Lookup failed: {cache_err}")
+                hit = None
+            if hit:
+                print(f"[SCREENSHOT CACHE] Hit (pHash distance {hit['distance']}) - solution from: {hit['question'][:60]}")
+                replay = {'answer': hit['answer'], 'output_tokens': hit.get('output_tokens', 0),
+                          'cache_hit': "screenshot_phash", 'cache_similarity': round(1 - hit['distance'] / 63, 3)}
+        # Same screen, same question: the previous answer still applies - no vision call
+        if screenshot_prep and screenshot_prep['action'] == "unchanged" and screenshot_prep['previous_answer']:
+            print("[SCREENSHOT DIFF] Screen unchanged - replaying previous answer")
+            replay = {'answer': screenshot_prep['previous_answer'], 'output_tokens': count_tokens(screenshot_prep['previous_answer']),
+                      'cache_hit': "screenshot_unchanged", 'cache_similarity': 1.0}
+        if replay:
+            yield {'heartbeat': True, 'request_id': request_id}
+            yield {'chunk': replay['answer']}
+            _ttft = _time.time() - _start_time
+            if commit_gate is not None:
+                await commit_gate
+            finished = True
+            await commit_turn_to_context(req, replay['answer'], model, current_profile,
+                                         response_time=_ttft, total_time=_ttft,
+                                         output_tokens=replay['output_tokens'], log_tag=log_tag,
+                                         context_hash=context_entry["hash"])
+            done = {'done': True, 'request_id': request_id, 'model': model, 'usage': session_usage, 'response_in_tokens': 0, 'response_out_tokens': 0, 'response_cached_tokens': 0, 'response_cost': 0, 'ttft': round(_ttft, 2), 'total_time': round(_time.time() - _start_time, 2), 'cache_hit': replay['cache_hit'], 'cache_similarity': replay['cache_similarity']}
+            if route:
+                done['route'] = route
+            yield done
+            return
+
+        # Send heartbeat to establish SSE connection (and tell the client its request id)
+        yield {'heartbeat': True, 'request_id': request_id}
+
         _start_time = _time.time()
-        
-        completion = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            stream=True,
-            **token_param
-        )
-        
-        full_response = ""
-        _ttft = 0
-        for chunk in completion:
-            if chunk.choices[0].delta.content:
+
+        # Each attempt waits for a slot in the key's scheduler and holds it until its stream ends
+        prompt_tokens_estimate = count_message_tokens(messages, context_entry)
+
+        async def open_attempt(attempt_model: str, connect_timeout: float):
+            params = completion_token_params(attempt_model, reasoning_token_limit)
+            return await upstream_scheduler.submit(
+                api_key,
+                lambda: asyncio.wait_for(client.chat.completions.create(
+                    model=attempt_model,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},  # Final chunk reports cached prompt tokens
+                    **params
+                ), connect_timeout),
+                priority=PRIORITY_INTERACTIVE, hold=True, log_tag=log_tag,
+                tokens=prompt_tokens_estimate + params.get("max_tokens", params.get("max_completion_tokens", 0)))
+
+        # Upstream is read by a task so cancel_request() can abort it mid-stream; errors (after
+        # retries) arrive in the queue like chunks so they always reach the client
+        queue: asyncio.Queue = asyncio.Queue()
+        upstream = {}
+        fallbacks, hedge_model = upstream_alternatives(model, vision=has_screenshot(req))
+        state["pump"] = asyncio.create_task(guarded_stream(
+            open_attempt, model, queue, model_health,
+            UPSTREAM_REASONING_POLICY if model.startswith("gpt-5") else UPSTREAM_POLICY, upstream,
+            fallbacks=fallbacks, hedge_model=hedge_model, log_tag=log_tag))
+        if state["cancel_reason"]:  # Cancelled before the stream started
+            state["pump"].cancel()
+
+        def bill_upstream_attempts(answered_output: Optional[int] = None):
+            """Every attempt that reached the provider paid for its prompt (timed out, failed, or lost to a
+            hedge). The answering one is billed with the answer's real usage unless answered_output is given."""
+            for attempt in upstream.get("attempts", []):
+                if not attempt["opened"] or (attempt["answered"] and answered_output is None):
+                    continue
+                update_usage(prompt_tokens_estimate, answered_output if attempt["answered"] else 0, attempt["model"])
+
+        # Collect full response for history
+        _ttft = 0  # time to first token
+        cached_tokens = 0
+
+        # Yield chunks as they arrive - iteration errors are reported to the client
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                err_msg = str(chunk)[:200]
+                print(f"[{log_tag}] Upstream error: {chunk}")
+                bill_upstream_attempts(count_tokens(full_response) if full_response else 0)
+                finished = True
+                yield {'error': err_msg}
+                return
+            if getattr(chunk, 'usage', None):
+                cached_tokens = get_cached_tokens(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                content = chunk.choices[0].delta.content
                 if not full_response:  # First token
                     _ttft = _time.time() - _start_time
-                full_response += chunk.choices[0].delta.content
-                
+                full_response += content
+                yield {'chunk': content}
+
+        if upstream.get("model") and upstream["model"] != model:
+            print(f"[{log_tag}] Answered by {upstream['model']} instead of {model}")
+            model = upstream["model"]
+        bill_upstream_attempts()
+
+        if state["cancel_reason"]:
+            finished = True
+            if state["record_partial"]:
+                _record_cancelled_answer(req, full_response, model, state["cancel_reason"],
+                                         count_message_tokens(messages, context_entry), _start_time)
+            yield {'cancelled': True, 'request_id': request_id, 'reason': state["cancel_reason"], 'partial_length': len(full_response)}
+            return
+
+        # Check for empty response
+        if not full_response.strip():
+            print(f"[{log_tag}] WARNING: Model {model} returned empty response")
+            finished = True
+            yield {'error': f'Model {model} returned an empty response. The model may not support this request format.'}
+            return
+
+        # Calculate usage and per-response cost BEFORE saving
+        input_tokens = count_message_tokens(messages, context_entry)
+        output_tokens = count_tokens(full_response)
+
+        # Estimate image tokens if screenshot was used
+        image_tokens = 0
+        if screenshot_url:
+            urls = [screenshot_url] if isinstance(screenshot_url, str) else screenshot_url
+            image_tokens = sum(estimate_image_tokens(url, model) for url in urls)
+
+        response_cost = calculate_cost(input_tokens, output_tokens, model, image_tokens, cached_tokens)
+        print(f"[PROMPT CACHE] {cached_tokens}/{input_tokens} input tokens served from provider cache")
+
+        if commit_gate is not None:
+            await commit_gate  # Speculative answer: wait until it's confirmed before touching context
+
+        finished = True
+        if use_answer_cache:
+            answer_cache.put(req.transcript, cache_context, model, full_response, output_tokens=output_tokens)
+        if screenshot_prep:
+            screenshot_tracker.remember_answer(screenshot_session_key(), full_response, in_context=req.save_to_context is not False)
+        if screenshot_fp:
+            try:
+                await asyncio.to_thread(screenshot_answer_cache.put, screenshot_fp, partition, req.transcript,
+                                        full_response, output_tokens=output_tokens, model=model)
+            except Exception as cache_err:
+                print(f"[SCREENSHOT CACHE] Store failed: {cache_err}")
+
+        await commit_turn_to_context(req, full_response, model, current_profile,
+                                     response_time=_ttft, total_time=_time.time() - _start_time,
+                                     cost=response_cost, input_tokens=input_tokens,
+                                     output_tokens=output_tokens, cached_tokens=cached_tokens,
+                                     log_tag=log_tag, context_hash=context_entry["hash"])
+
+        update_usage(input_tokens, output_tokens, model, image_tokens, cached_tokens)
+        if not screenshot_url:  # Same rule as the history load: vision answers skew TTFT
+            model_router.record(model, _ttft, _time.time() - _start_time, response_cost, output_tokens)
+
         _total_time = _time.time() - _start_time
-        
-        # Calculate per-response cost
-        input_text = "\n".join([m.get('content', '') if isinstance(m.get('content'), str) else str(m.get('content', '')) for m in messages])
-        _input_tokens = count_tokens(input_text)
-        _output_tokens = count_tokens(full_response)
-        _response_cost = calculate_cost(_input_tokens, _output_tokens, model)
-        
-        # Save to conversation history only if save_to_context is True
-        # (skip for one-shot LeetCode problems, save for scenarios needing follow-up)
-        save_to_context = req.save_to_context is not False
-        if save_to_context:
-            if req.screenshot:
-                user_msg = f"[USER SHARED A SCREENSHOT] Question about the screenshot: {req.transcript}"
-            else:
-                user_msg = req.transcript
-            conversation_history.append({"role": "user", "content": user_msg})
-            conversation_history.append({"role": "assistant", "content": full_response})
-            
-            # Save to session folder if active
-            if current_session_name:
-                try:
-                    save_conversation_to_session(user_msg, full_response, bool(req.screenshot), model, response_time=round(_ttft, 1), total_time=round(_total_time, 1), cost=_response_cost, input_tokens=_input_tokens, output_tokens=_output_tokens)
-                except Exception as save_err:
-                    print(f"[SESSION SAVE ERROR] {save_err}")
-            
-            # Rolling summary: when history exceeds 3 turns (6 msgs), summarize the oldest turn then evict it.
-            if len(conversation_history) > 6:
-                turns_to_evict = conversation_history[:-6]
-                api_key_for_summary = get_api_key()
-                new_chunk = await summarize_old_turns(turns_to_evict, api_key_for_summary)
-                if new_chunk:
-                    conversation_summary = (conversation_summary + "\n" + new_chunk).strip() if conversation_summary else new_chunk
-                conversation_history = conversation_history[-6:]
-            
-            print(f"[AI] Conversation history: {len(conversation_history)} msgs | Summary: {len(conversation_summary)} chars")
-        else:
-            print(f"[AI] Skipped saving to history (save_to_context=False)")
-        
-        print(f"[AI] Conversation history now has {len(conversation_history)} messages")
-        
-        return {
-            "answer": full_response,
-            "usage": session_usage,
-            "response_in_tokens": _input_tokens,
-            "response_out_tokens": _output_tokens,
-            "response_cost": round(_response_cost, 6)
+        # Completion signal with usage info and per-response cost
+        done = {'done': True, 'request_id': request_id, 'model': model, 'usage': session_usage, 'response_in_tokens': input_tokens, 'response_out_tokens': output_tokens, 'response_cached_tokens': cached_tokens, 'response_cost': round(response_cost, 6), 'ttft': round(_ttft, 2), 'total_time': round(_total_time, 2), 'queue_wait_ms': upstream.get('queue_wait_ms', 0.0),
+                'upstream': {k: upstream.get(k) for k in ('retries', 'hedged', 'hedge_won', 'fallback_from', 'attempts')}}
+        if route:
+            done['route'] = route
+        if screenshot_prep:
+            done['screenshot_action'] = screenshot_prep['action']
+            done['screenshot_box'] = screenshot_prep['box']
+        if screenshot_batch:
+            done['screenshot_batch'] = {k: screenshot_batch[k] for k in ('mode', 'captures', 'segments', 'removed_rows', 'tokens', 'separate_tokens')}
+        yield done
+
+    except Exception as e:
+        finished = True
+        err_msg = str(e)[:200]
+        print(f"Streaming AI Error: {e}")
+        yield {'error': err_msg}
+    finally:
+        # Consumer went away mid-answer (SSE client disconnected, pipeline task cancelled)
+        if not finished:
+            reason = state["cancel_reason"] or "client disconnected"
+            state["cancel_reason"] = reason
+            if state["pump"] is not None:
+                state["pump"].cancel()
+            if model and state["record_partial"]:
+                _record_cancelled_answer(req, full_response, model, reason,
+                                         count_message_tokens(messages, context_entry) if messages else 0, _start_time)
+        if active_requests.get(request_id) is state:
+            del active_requests[request_id]
+
+
+# ============ REALTIME AUTO-ANSWER PIPELINE ============
+# Optional server-side transcript -> answer path for /realtime. Instead of relaying transcript
+# deltas and waiting for the renderer to stitch them and POST /ai/stream, the backend starts the
+# answer as soon as the transcription completes and streams it back on the same socket.
+# Enabled per connection with a JSON control message (audio frames stay raw base64 strings):
+#   {"type": "pipeline.config", "auto_answer": true, "role": "...", "target_language": "...",
+#    "text_model": "...", "speculative": true}
+# Events sent back: answer.start / answer.chunk / answer.done / answer.error / answer.cancelled.
+# With speculative=true an answer starts early on a stable partial transcript; it is promoted if
+# the final transcript matches, otherwise it is cancelled and never reaches the context.
+
+SPECULATIVE_STABLE_MS = 450    # Partial transcript must be unchanged this long before a speculative start
+SPECULATIVE_MIN_WORDS = 6      # ...and long enough to plausibly be a whole question
+
+
+def answer_event_message(request_id: str, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map an answer_events() dict to the answer.* message sent over /realtime and /channel (None = not forwarded)."""
+    if 'chunk' in event:
+        return {"type": "answer.chunk", "request_id": request_id, "text": event['chunk']}
+    if 'error' in event:
+        return {"type": "answer.error", "request_id": request_id, "error": event['error']}
+    if event.get('cancelled'):
+        return {"type": "answer.cancelled", "request_id": request_id, "reason": event['reason']}
+    if event.get('done'):
+        return {"type": "answer.done", **event, "request_id": request_id}
+    return None
+
+
+class RealtimeAnswerPipeline:
+    def __init__(self, ws: WebSocket):
+        self.ws = ws
+        self.config: Dict[str, Any] = {}
+        self.partials: Dict[str, str] = {}   # item_id -> transcript so far
+        self.active: Optional[Dict[str, Any]] = None
+        self._stability_timer: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.get("auto_answer"))
+
+    def configure(self, message: Dict[str, Any]):
+        self.config = {k: v for k, v in message.items() if k != "type"}
+        print(f"[PIPELINE] Auto-answer {'enabled' if self.enabled else 'disabled'} "
+              f"(speculative={bool(self.config.get('speculative'))}, model={self.config.get('text_model')})")
+
+    # ---------------------------------------------------------------- transcript events
+    def on_delta(self, item_id: str, delta: str):
+        if not self.enabled:
+            return
+        self.partials[item_id] = self.partials.get(item_id, "") + delta
+        active = self.active
+        if active and active["speculative"] and active["item_id"] == item_id:
+            # Transcript moved on after we speculated - the early answer is stale
+            self._cancel_active("transcript changed")
+        if self.config.get("speculative"):
+            if self._stability_timer:
+                self._stability_timer.cancel()
+            self._stability_timer = asyncio.create_task(self._speculate_when_stable(item_id))
+
+    async def on_completed(self, item_id: str, transcript: str):
+        if not self.enabled:
+            return
+        if self._stability_timer:
+            self._stability_timer.cancel()
+            self._stability_timer = None
+        self.partials.pop(item_id, None)
+        transcript = (transcript or "").strip()
+        if not transcript:
+            return
+
+        active = self.active
+        if (active and active["speculative"] and active["item_id"] == item_id
+                and normalize_transcript(active["transcript"]) == normalize_transcript(transcript)):
+            print(f"[PIPELINE] Speculative answer {active['request_id']} confirmed by final transcript")
+            active["speculative"] = False
+            active["transcript"] = transcript
+            active["live"].set()
+            active["gate"].set_result(True)
+            return
+
+        # Latest question wins
+        self._cancel_active("superseded")
+        self._start(item_id, transcript, speculative=False)
+
+    async def _speculate_when_stable(self, item_id: str):
+        try:
+            await asyncio.sleep(SPECULATIVE_STABLE_MS / 1000)
+        except asyncio.CancelledError:
+            return
+        partial = self.partials.get(item_id, "").strip()
+        if len(partial.split()) < SPECULATIVE_MIN_WORDS:
+            return
+        active = self.active
+        if active and active["item_id"] == item_id and active["transcript"] == partial:
+            return
+        self._cancel_active("superseded")
+        self._start(item_id, partial, speculative=True)
+
+    # ---------------------------------------------------------------- answer lifecycle
+    def _start(self, item_id: str, transcript: str, speculative: bool):
+        import uuid
+        loop = asyncio.get_running_loop()
+        state = {
+            "request_id": uuid.uuid4().hex[:12],
+            "item_id": item_id,
+            "transcript": transcript,
+            "speculative": speculative,
+            "gate": loop.create_future() if speculative else None,
+            "live": asyncio.Event(),
+            "queue": asyncio.Queue(),
         }
+        if not speculative:
+            state["live"].set()
+        req = AIRequest(
+            transcript=transcript,
+            role=self.config.get("role", ""),
+            target_language=self.config.get("target_language"),
+            text_model=self.config.get("text_model"),
+            save_to_context=self.config.get("save_to_context", True),
+            request_id=state["request_id"],
+            client_id=f"realtime-{id(self):x}",  # Auto-answers only supersede this socket's answers
+        )
+        state["producer"] = asyncio.create_task(self._produce(state, req))
+        state["forwarder"] = asyncio.create_task(self._forward(state))
+        self.active = state
+        print(f"[PIPELINE] {'Speculative' if speculative else 'Answer'} {state['request_id']} started for: {transcript[:60]}")
+
+    async def _produce(self, state: Dict[str, Any], req: AIRequest):
+        try:
+            events = coalesce_chunks(
+                answer_events(req, log_tag="PIPELINE", commit_gate=state["gate"], supersede=not state["speculative"]),
+                interval_ms=STREAM_FLUSH_INTERVAL_MS, max_bytes=STREAM_FLUSH_BYTES
+            )
+            async for event in events:
+                state["queue"].put_nowait(event)
+        finally:
+            state["queue"].put_nowait(None)
+
+    async def _forward(self, state: Dict[str, Any]):
+        # Speculative answers buffer here until promoted (or are cancelled without ever being sent)
+        await state["live"].wait()
+        request_id = state["request_id"]
+        await self._send({"type": "answer.start", "request_id": request_id, "transcript": state["transcript"], "origin": "realtime"})
+        while True:
+            event = await state["queue"].get()
+            if event is None:
+                break
+            message = answer_event_message(request_id, event)
+            if message:
+                await self._send(message)
+        if self.active is state:
+            self.active = None
+
+    def _cancel_active(self, reason: str):
+        state = self.active
+        if not state:
+            return
+        self.active = None
+        # Aborts the upstream stream; answers the user never saw are dropped rather than logged
+        cancel_request(state["request_id"], reason, record_partial=not state["speculative"])
+        for key in ("producer", "forwarder"):
+            state[key].cancel()
+        if state["gate"] is not None and not state["gate"].done():
+            state["gate"].cancel()
+        print(f"[PIPELINE] Cancelled {'speculative ' if state['speculative'] else ''}answer {state['request_id']} ({reason})")
+        if state["live"].is_set():
+            asyncio.create_task(self._send({"type": "answer.cancelled", "request_id": state["request_id"], "reason": reason}))
+
+    async def _send(self, message: Dict[str, Any]):
+        # Mirror to /channel subscribers so the timeline window follows auto-answers too
+        channel_hub.publish("answers", message)
+        try:
+            await self.ws.send_text(fast_dumps(message).decode())
+        except Exception as e:
+            print(f"[PIPELINE] Send failed: {e}")
+
+    def close(self):
+        if self._stability_timer:
+            self._stability_timer.cancel()
+        self._cancel_active("socket closed")
+
+
+async def sse_answer_stream(req: AIRequest):
+    import uuid
+    req.request_id = req.request_id or uuid.uuid4().hex[:12]
+    # Mirror to /channel subscribers so other windows follow answers asked over HTTP too
+    channel_hub.publish("answers", {"type": "answer.start", "request_id": req.request_id, "transcript": req.transcript,
+                                    "origin": "http"})
+    # Merge tiny upstream deltas into fewer frames (first token is still sent immediately)
+    events = coalesce_chunks(
+        answer_events(req),
+        interval_ms=STREAM_FLUSH_INTERVAL_MS if req.flush_interval_ms is None else req.flush_interval_ms,
+        max_bytes=STREAM_FLUSH_BYTES if req.flush_bytes is None else req.flush_bytes
+    )
+    async for event in events:
+        message = answer_event_message(req.request_id, event)
+        if message:
+            channel_hub.publish("answers", message)
+        # Send as Server-Sent Event format (pre-encoded bytes)
+        yield sse_frame(event)
+
+
+@app.post("/ai/stream")
+async def stream_ai_response(req: AIRequest):
+    """Streaming endpoint for real-time AI responses using Server-Sent Events"""
+    return StreamingResponse(sse_answer_stream(req), media_type="text/event-stream")
+
+
+@app.post("/ai/stream/screenshot")
+async def stream_ai_screenshot(request: Request):
+    """Screenshot questions with the image as binary instead of a base64 data URL inside JSON.
+    Either multipart/form-data (one or more "screenshot" file parts - several are scrolled captures of one
+    page, in order - plus AIRequest fields as form fields) or a
+    raw image/* body with the AIRequest fields as query parameters. Streams the same SSE events as /ai/stream.
+    The image is base64-encoded (the vision API needs it) exactly once, chunk by chunk as it arrives."""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            uploads = [u for u in form.getlist("screenshot") if not isinstance(u, str)]
+            if not uploads:
+                raise ValueError("Missing 'screenshot' file part")
+            encoded = [upload_to_data_url(upload) for upload in uploads]  # Several parts = one scrolled page, in order
+            await form.close()
+            data_urls = [url for url, _ in encoded]
+            image_bytes = sum(size for _, size in encoded) if all(size for _, size in encoded) else 0
+            data_url = data_urls[0] if len(data_urls) == 1 else None
+            fields, source = form, "multipart"
+        else:
+            # Raw body: encoded while uvicorn hands us the chunks - no parser, no spool file
+            length = request.headers.get("content-length")
+            data_url, image_bytes = await stream_to_data_url(request.stream(), int(length) if length else None, content_type)
+            data_urls = [data_url]
+            fields, source = request.query_params, "binary"
+        if not image_bytes:
+            raise ValueError("Empty screenshot upload")
+        # Unknown fields are ignored by AIRequest; form/query strings are coerced to the field types
+        req = AIRequest(**{k: v for k, v in fields.items() if k not in ('screenshot', 'screenshots')}, screenshot=data_url,
+                        screenshots=data_urls if data_url is None else None)
     except Exception as e:
-        print(f"AI Generation Error: {e}")
-        return {"answer": f"Error: {str(e)}"}
+        print(f"[SCREENSHOT] Rejected upload: {e}")
+        async def rejected(error=str(e)):
+            yield sse_frame({'error': error})
+        return StreamingResponse(rejected(), media_type="text/event-stream")
+
+    print(f"[SCREENSHOT] Received {image_bytes / 1024:.0f} KB {source} upload ({len(data_urls)} image(s))")
+    del data_url, data_urls
+    return StreamingResponse(sse_answer_stream(req), media_type="text/event-stream")
+
+
+@app.post("/ai/cancel")
+async def cancel_ai_request(data: Dict[str, Any]):
+    """Cancel an in-flight answer by request_id. Without one, cancels the caller's own answers: those
+    asked with the same client_id (or, with no client_id either, plain HTTP answers of the active session)."""
+    data = data or {}
+    request_id = data.get('request_id')
+    if request_id:
+        targets = [request_id]
+    else:
+        client_key = supersede_key(AIRequest(client_id=data.get('client_id')))
+        targets = [rid for rid, state in list(active_requests.items()) if state["client"] == client_key]
+    cancelled = [rid for rid in targets if cancel_request(rid, data.get('reason') or "cancelled by client")]
+    return {"status": "ok", "cancelled": cancelled}
+
+
+# ============ CLIENT CHANNEL ============
+# One persistent WebSocket per renderer window instead of a POST per question plus /usage and
+# /sessions polling. Client -> server messages (JSON, "id" is echoed back on the reply):
+#   {"type": "subscribe", "topics": ["answers", "usage", "session"]}
+#   {"type": "ask", "id": 1, ...AIRequest fields}         -> {"type": "ask.accepted", "id": 1, "request_id"}
+#   {"type": "cancel", "request_id": "...", "reason": "..."}  (no request_id: every answer this client asked)
+#   {"type": "usage.get"} / {"type": "usage.reset"} / {"type": "sessions.list"} / {"type": "conversation.clear"}
+#   {"type": "ping"}
+# Server pushes: answer.* for every answer (asked here, over /ai/stream's pipeline or /realtime),
+# "usage" after every update_usage() and session.* lifecycle events. The HTTP endpoints keep working.
+# Server side only so far: the renderer (setup.js, streaming-ai.js, convo.js) still uses the HTTP
+# endpoints and has not been moved onto the channel yet.
+
+async def _channel_answer(client, req: AIRequest):
+    """Run one answer and publish it to every "answers" subscriber (the asker always gets it)."""
+    def publish(message):
+        channel_hub.publish("answers", message)
+        if "answers" not in client.topics:
+            client.push(message)
+
+    publish({"type": "answer.start", "request_id": req.request_id, "transcript": req.transcript, "origin": client.client_id})
+    events = coalesce_chunks(
+        answer_events(req, log_tag="CHANNEL"),
+        interval_ms=STREAM_FLUSH_INTERVAL_MS if req.flush_interval_ms is None else req.flush_interval_ms,
+        max_bytes=STREAM_FLUSH_BYTES if req.flush_bytes is None else req.flush_bytes
+    )
+    async for event in events:
+        message = answer_event_message(req.request_id, event)
+        if message:
+            publish(message)
+
+
+@app.websocket("/channel")
+async def client_channel(ws: WebSocket):
+    import uuid
+    await ws.accept()
+    client = channel_hub.attach(ws, ws.query_params.get("client_id") or uuid.uuid4().hex[:8])
+    asks: Dict[str, asyncio.Task] = {}
+    client.push({"type": "channel.ready", "client_id": client.client_id, "topics": sorted(client.topics)})
+    client.push({"type": "usage", **usage_snapshot()})  # Initial state - no need to poll /usage
+
+    try:
+        while True:
+            try:
+                message = json.loads(await ws.receive_text())
+            except ValueError:
+                client.push({"type": "error", "error": "Malformed message"})
+                continue
+            kind = message.get("type")
+            ref = message.get("id")
+
+            if kind == "ask":
+                try:
+                    req = AIRequest(**{k: v for k, v in message.items() if k not in ("type", "id")})
+                except Exception as e:
+                    client.push({"type": "error", "id": ref, "error": f"Invalid ask: {e}"})
+                    continue
+                if not req.request_id:
+                    req.request_id = uuid.uuid4().hex[:12]
+                req.client_id = f"channel-{client.client_id}"
+                task = asyncio.create_task(_channel_answer(client, req))
+                asks[req.request_id] = task
+                task.add_done_callback(lambda _t, rid=req.request_id: asks.pop(rid, None))
+                client.push({"type": "ask.accepted", "id": ref, "request_id": req.request_id})
+            elif kind == "cancel":
+                request_id = message.get("request_id")
+                targets = [request_id] if request_id else list(asks)  # No id: this window's own asks only
+                cancelled = [rid for rid in targets if cancel_request(rid, message.get("reason") or "cancelled by client")]
+                client.push({"type": "cancel.result", "id": ref, "cancelled": cancelled})
+            elif kind == "subscribe":
+                client.subscribe(message.get("topics") or CHANNEL_TOPICS)
+                client.push({"type": "subscribe.result", "id": ref, "topics": sorted(client.topics)})
+            elif kind == "usage.get":
+                client.push({"type": "usage", "id": ref, **usage_snapshot()})
+            elif kind == "usage.reset":
+                client.push({"type": "usage.reset.result", "id": ref, **(await reset_usage())})
+            elif kind == "sessions.list":
+                client.push({"type": "sessions.list.result", "id": ref, **(await list_sessions())})
+            elif kind == "conversation.clear":
+                client.push({"type": "conversation.clear.result", "id": ref, **(await clear_conversation())})
+            elif kind == "ping":
+                client.push({"type": "pong", "id": ref})
+            else:
+                client.push({"type": "error", "id": ref, "error": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"[CHANNEL] Receive error: {e}")
+    finally:
+        # Same as an SSE disconnect: answers this window asked for stop with it
+        for task in list(asks.values()):
+            task.cancel()
+        channel_hub.detach(client)
+
+
+@app.post("/ai")
+async def generate_ai_response(req: AIRequest):
+    """Non-streaming variant: runs the same pipeline as /ai/stream and returns the whole answer."""
+    print(f"\n[DEBUG] /ai called with: transcript={req.transcript[:50] if req.transcript else None}..., role={req.role}, screenshot={'YES' if has_screenshot(req) else 'NO'}, save_to_context={req.save_to_context}")
+    full_response = ""
+    done = {}
+    async for event in answer_events(req, log_tag="AI", reasoning_token_limit=4096):
+        if 'error' in event:
+            print(f"AI Generation Error: {event['error']}")
+            return {"answer": f"Error: {event['error']}"}
+        if event.get('cancelled'):
+            return {"answer": full_response, "cancelled": True, "reason": event['reason'], "usage": session_usage}
+        if 'chunk' in event:
+            full_response += event['chunk']
+        elif event.get('done'):
+            done = event
+
+    print(f"[AI] Conversation history now has {len(conversation_history)} messages")
+    return {
+        "answer": full_response,
+        "usage": session_usage,
+        "response_in_tokens": done.get('response_in_tokens', 0),
+        "response_out_tokens": done.get('response_out_tokens', 0),
+        "response_cached_tokens": done.get('response_cached_tokens', 0),
+        "response_cost": done.get('response_cost', 0)
+    }
+
+
+# ============ STARTUP WARM-UP ============
+# Importing main only does what binding the port needs (see bench_startup.py); the heavy SDKs and
+# the license keys are warmed in a background thread once the server has started. Requests that
+# arrive earlier simply load what they need themselves. GET /ready reports what is warm.
+# FastAPI itself is most of the budget; the median here sits 40-150 ms under it (bench_startup.py).
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "500"))
+STARTUP_IMPORT_MS = round((time.perf_counter() - STARTUP_T0) * 1000, 1)
+if STARTUP_IMPORT_MS > STARTUP_BUDGET_MS:
+    print(f"[STARTUP WARNING] Backend import took {STARTUP_IMPORT_MS:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)")
+else:
+    print(f"[STARTUP] Backend imported in {STARTUP_IMPORT_MS:.0f} ms")
+
+WARMUP_STEPS = [
+    ("license_keys", ensure_keys_initialized),
+    ("license", restore_license),  # Also computes (or loads the cached) HWID
+    ("openai", lambda: warm("openai")),
+    ("token_counter", get_encoding),
+    ("image_processing", lambda: DIFF_AVAILABLE and (warm("numpy"), warm("PIL.Image"))),
+    ("resume_parsing", lambda: DOCX_AVAILABLE and warm("docx")),
+    ("realtime", lambda: warm("websockets")),
+    ("model_router", load_router_history),
+]
+warmup_status: Dict[str, Dict[str, Any]] = {name: {"ready": False} for name, _ in WARMUP_STEPS}
+
+def run_warmup():
+    t0 = time.perf_counter()
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+            warmup_status[name] = {"ready": True, "ms": round((time.perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            warmup_status[name] = {"ready": False, "error": str(e)[:200]}
+            print(f"[STARTUP WARNING] Warm-up of {name} failed: {e}")
+    print(f"[STARTUP] Warm-up finished in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+@app.on_event("startup")
+async def start_warmup():
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+@app.get("/ready")
+async def ready():
+    """Readiness: the server answers as soon as it is up; 'ready' turns true once every subsystem is warm"""
+    return {
+        "ready": all(s["ready"] for s in warmup_status.values()),
+        "import_ms": STARTUP_IMPORT_MS,
+        "budget_ms": STARTUP_BUDGET_MS,
+        "subsystems": warmup_status,
+        "modules": loaded_modules(),
+        "session": session_warmup,
+    }
 
 
 if __name__ == "__main__":
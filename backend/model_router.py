@@ -0,0 +1,201 @@
+# backend/model_router.py
+"""
+Automatic model choice per question (text_model="auto").
+
+classify_question() sorts a question into behavioral / conceptual / coding / follow_up with a few
+keyword patterns - no API call. Each category has a minimum quality tier (follow-ups inherit the
+tier of the question they follow). ModelRouter keeps a latency/cost table per model, built from
+the answers recorded in conversation.json (model, response_time, total_time, cost, tokens) and
+updated live as answers complete, and picks:
+  - among models at or above the tier whose expected TTFT meets the target, the cheapest
+  - if none meets it, the same search one tier lower, then the fastest model at the tier
+Expected TTFT is a high percentile of the recorded response_time (a prior until a model has
+min_samples answers); expected cost comes from the caller's pricing for the actual prompt size and
+the model's median answer length. The decision dict is what the done event reports as "route".
+"""
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+CATEGORIES = ("behavioral", "conceptual", "coding", "follow_up")
+HISTORY_SAMPLES = 200     # Recent answers kept per model
+DEFAULT_OUTPUT_TOKENS = 350
+
+_BEHAVIORAL = re.compile(
+    r"\b(tell me about (a time|yourself|your)|describe a (time|situation)|give (me )?an example of a time|"
+    r"how (do|did|would) you (handle|deal|manage|prioriti[sz]e|resolve)|conflict|disagree|weakness|strengths?|"
+    r"mistake|failure|proud|biggest challenge|why do you want|why should we hire|where do you see yourself|"
+    r"teamwork|leadership|motivat|stakeholder|deadline|feedback|why (did|are) you (leave|leaving|left)|"
+    r"why (do|did) you want to leave|your (last|previous|current) (job|role|company|employer|position|team|manager)|"
+    r"walk me through your (resume|background|career)|salary expectations|notice period)")
+_CODING = re.compile(
+    r"\b(code|coding|implement|function|algorithm|complexity|big[- ]o|leetcode|debug|compile|sql|query|"
+    r"regex|array|linked list|binary tree|tree|graph|hash ?map|hash ?table|dictionary|recursion|recursive|"
+    r"dynamic programming|sort(ing)?|binary search|two pointers?|sliding window|refactor|unit tests?|"
+    r"write (a|an|the|some)|optimi[sz]e|o\(n)")
+_CODE_SYNTAX = re.compile(r"[{};]|==|=>|->|\w+\([^)]*\)|\bdef |\breturn\b|\bfor \w+ in\b")
+_CONCEPTUAL = re.compile(
+    r"\b(what is|what are|what's|explain|difference between|how does|how do .+ work|why (is|are|does|do)|"
+    r"compare|pros and cons|when (would|should) you use|define|trade-?offs?|advantages?|principles?)")
+_FOLLOW_UP_START = re.compile(
+    r"^(and|but|so|also|then|ok(ay)?|what about|how about|why( not)?\b|what if|can you (elaborate|expand|explain (that|it|more))|"
+    r"could you (elaborate|expand|give an example)|go deeper|more detail|any other|anything else|example)")
+_FOLLOW_UP_REF = re.compile(r"\b(that|it|this|those|them|the (above|previous|last)|you (just )?(said|mentioned|wrote))\b")
+# Words that ask for more of the same without naming a topic ("explain that again", "can you say it more simply")
+_FOLLOW_UP_FILLER = frozenset(
+    "a an and again about all also bit briefly but by can clarify could detail details differently do does "
+    "elaborate else example explain expand further go i is it just me mean meant more once one other please "
+    "rephrase repeat say simpler simply so sorry than that the them then this those to understand walk was "
+    "what why with you your".split())
+FOLLOW_UP_MAX_WORDS = 12
+
+
+def classify_question(question: str, previous_question: Optional[str] = None,
+                      has_screenshot: bool = False) -> Tuple[str, List[str]]:
+    """(category, matched signals). previous_question (the last one in the conversation) enables follow_up."""
+    text = " ".join((question or "").lower().split())
+    behavioral = [m.group(0) for m in _BEHAVIORAL.finditer(text)]
+    coding = [m.group(0) for m in _CODING.finditer(text)]
+    conceptual = [m.group(0) for m in _CONCEPTUAL.finditer(text)]
+    if _CODE_SYNTAX.search(question or ""):
+        coding.append("code syntax")
+    if has_screenshot:
+        coding.append("screenshot")
+
+    if previous_question and not behavioral and len(text.split()) <= FOLLOW_UP_MAX_WORDS:
+        start = _FOLLOW_UP_START.match(text)
+        refs = [m.group(0) for m in _FOLLOW_UP_REF.finditer(text)]
+        content = [w for w in re.findall(r"[a-z0-9'+#]+", text) if w not in _FOLLOW_UP_FILLER]
+        if refs and not content:  # Only points back ("explain that again") - explain/why don't make it a new question
+            return "follow_up", refs
+        if start or (refs and not coding and not conceptual):
+            return "follow_up", ([start.group(0)] if start else []) + refs
+    if behavioral:
+        return "behavioral", behavioral
+    if coding and len(coding) > len(conceptual):
+        return "coding", coding
+    if conceptual or not coding:
+        return "conceptual", conceptual or coding
+    return "coding", coding
+
+
+class _ModelStats:
+    def __init__(self):
+        self.ttft: Deque[float] = deque(maxlen=HISTORY_SAMPLES)
+        self.total: Deque[float] = deque(maxlen=HISTORY_SAMPLES)
+        self.cost: Deque[float] = deque(maxlen=HISTORY_SAMPLES)
+        self.output_tokens: Deque[int] = deque(maxlen=HISTORY_SAMPLES)
+
+
+def _quantile(values: Iterable[float], q: float) -> Optional[float]:
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class ModelRouter:
+    def __init__(self, quality: Dict[str, int], min_quality: Dict[str, int], ttft_priors: Dict[str, float],
+                 ttft_target: float = 1.5, ttft_quantile: float = 0.75, min_samples: int = 5):
+        self.quality = quality            # model -> tier (higher = better answers)
+        self.min_quality = min_quality    # category -> lowest acceptable tier
+        self.ttft_priors = ttft_priors    # model -> expected TTFT before there is history
+        self.ttft_target = ttft_target
+        self.ttft_quantile = ttft_quantile
+        self.min_samples = min_samples
+        self._stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+        self.loaded_entries = 0
+
+    # ------------------------------------------------------------------ latency/cost table
+    def record(self, model: str, response_time: float, total_time: float = 0.0, cost: float = 0.0,
+               output_tokens: int = 0) -> bool:
+        """One answered request (answers replayed from a cache don't say anything about the model - skip them)"""
+        if model not in self.quality or not response_time or response_time <= 0:
+            return False
+        with self._lock:
+            stats = self._stats.setdefault(model, _ModelStats())
+            stats.ttft.append(float(response_time))
+            stats.total.append(float(total_time or response_time))
+            stats.cost.append(float(cost or 0.0))
+            if output_tokens:
+                stats.output_tokens.append(int(output_tokens))
+        return True
+
+    def load_history(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Feed conversation.json entries (oldest first). Returns how many were usable."""
+        used = 0
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get("cancelled") or entry.get("had_screenshot"):
+                continue  # Partial answers; vision answers (image decoding skews TTFT)
+            if not (entry.get("input_tokens") or entry.get("cost")):
+                continue  # Replayed from a cache - no upstream call
+            used += self.record(entry.get("model"), entry.get("response_time") or 0, entry.get("total_time") or 0,
+                                entry.get("cost") or 0, entry.get("output_tokens") or 0)
+        self.loaded_entries += used
+        return used
+
+    def estimate(self, model: str, prompt_tokens: int, price: Callable[[int, int, str], float]) -> Dict[str, Any]:
+        with self._lock:
+            stats = self._stats.get(model)
+            samples = len(stats.ttft) if stats else 0
+            observed = _quantile(stats.ttft, self.ttft_quantile) if samples else None
+            output_tokens = int(_quantile(stats.output_tokens, 0.5) or DEFAULT_OUTPUT_TOKENS) if stats else DEFAULT_OUTPUT_TOKENS
+        prior = self.ttft_priors.get(model, 2.0)
+        if samples >= self.min_samples:
+            ttft = observed
+        elif samples:  # Blend toward the observations as they come in
+            ttft = (prior * (self.min_samples - samples) + observed * samples) / self.min_samples
+        else:
+            ttft = prior
+        return {"model": model, "ttft": round(ttft, 3), "cost": round(price(prompt_tokens, output_tokens, model), 6),
+                "samples": samples}
+
+    def table(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {}
+            for model, stats in self._stats.items():
+                out[model] = {"samples": len(stats.ttft),
+                              "ttft_p50": _quantile(stats.ttft, 0.5), "ttft_p75": _quantile(stats.ttft, 0.75),
+                              "total_p50": _quantile(stats.total, 0.5),
+                              "cost_p50": _quantile(stats.cost, 0.5),
+                              "output_tokens_p50": _quantile(stats.output_tokens, 0.5)}
+            return {"ttft_target": self.ttft_target, "loaded_entries": self.loaded_entries, "models": out}
+
+    # ------------------------------------------------------------------ routing
+    def route(self, question: str, prompt_tokens: int, price: Callable[[int, int, str], float],
+              previous_question: Optional[str] = None, has_screenshot: bool = False,
+              allowed: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+        """Pick a model for question. allowed(model) filters out models that can't take it
+        (open circuit breaker, no image input)."""
+        category, signals = classify_question(question, previous_question, has_screenshot)
+        tier_category = category
+        if category == "follow_up":
+            parent = classify_question(previous_question or "", None, has_screenshot)[0]
+            tier_category = parent if parent != "follow_up" else "conceptual"
+        floor = self.min_quality.get(tier_category, 0)
+
+        usable = [m for m in self.quality if allowed is None or allowed(m)]
+        estimates = {m: self.estimate(m, prompt_tokens, price) for m in usable}
+        decision = {"mode": "auto", "category": category, "signals": signals[:5], "quality_floor": floor,
+                    "ttft_target": self.ttft_target, "relaxed": False}
+        choice = None
+        for relax in (0, 1):
+            tier = [estimates[m] for m in usable if self.quality[m] >= floor - relax]
+            fast = [e for e in tier if e["ttft"] <= self.ttft_target]
+            if fast:
+                choice = min(fast, key=lambda e: (e["cost"], e["ttft"]))
+                decision["relaxed"] = bool(relax)
+                break
+        if choice is None:
+            tier = [estimates[m] for m in usable if self.quality[m] >= floor] or list(estimates.values())
+            if not tier:
+                return {**decision, "model": None, "reason": "no usable model"}
+            choice = min(tier, key=lambda e: (e["ttft"], e["cost"]))
+        decision.update({
+            "model": choice["model"], "expected_ttft": choice["ttft"], "expected_cost": choice["cost"],
+            "met_target": choice["ttft"] <= self.ttft_target,
+            "candidates": sorted(estimates.values(), key=lambda e: e["cost"]),
+        })
+        return decision
@@ -1,27 +1,53 @@
 #!/usr/bin/env python3
 """
-Utility script to manually process a .docx resume file and update user_profile.json
-Usage: python process_resume.py <path_to_resume.docx>
+Utility script to process .docx resumes.
+
+Single resume - update user_profile.json:
+    python process_resume.py <path_to_resume.docx>
+
+Bulk ingestion - turn a library of resumes (and job descriptions) into ready-to-load sessions:
+    python process_resume.py --bulk <library_dir> [--sessions-dir DIR] [--workers N]
+                             [--batch-size 50] [--role ROLE] [--language LANG] [--jd FILE]
+  Every .docx under the directory is a resume, except files with a "jd" or "job" word in their name
+  (e.g. "acme_jd.docx", "Job Description.txt" - not "jdoe_resume.docx"; .docx/.txt/.md), which are
+  job descriptions: a resume gets the JD in its own folder (when
+  there is exactly one), else the --jd file. Documents are parsed in a process pool with the same
+  extraction code as the API (resume_extract.py) and de-duplicated by SHA-256 of their bytes.
+  Extractions land in the API's resume cache, and session folders are written in batches. Resume and
+  JD text go to the API's blob store (blob_store.py) - session.json keeps "<field>_sha256" references.
+  Re-running skips sessions that were already ingested.
 """
-import sys
+import argparse
 import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
 from pathlib import Path
-from docx import Document
+
+from blob_store import BlobStore
+from resume_extract import ResumeTextCache, approximate_tokens, content_hash, extract_docx
+
+BACKEND_DIR = Path(__file__).parent
+JD_TOKEN = re.compile(r"(jd|job|jobdesc(ription)?)s?", re.IGNORECASE)  # A whole word of the file name
+NAME_SEPARATORS = re.compile(r"[_\-\s.]+")
+JD_SUFFIXES = {".docx", ".txt", ".md"}
 
 def extract_resume_text(docx_path):
     """Extract text from a .docx file"""
     try:
-        doc = Document(docx_path)
-        text = "\n\n".join([p.text for p in doc.paragraphs if p.text and p.text.strip()])
-        return text
+        return extract_docx(Path(docx_path).read_bytes())["text"]
     except Exception as e:
         print(f"Error extracting text from {docx_path}: {e}")
         return None
 
 def update_profile(resume_text):
-    """Update user_profile.json with the resume text"""
-    profile_path = Path(__file__).parent / "user_profile.json"
-    
+    """Update user_profile.json with the resume text (stored in the blob store, like the API does)"""
+    profile_path = BACKEND_DIR / "user_profile.json"
+
     # Load existing profile
     if profile_path.exists():
         try:
@@ -31,12 +57,13 @@ def update_profile(resume_text):
             profile = {}
     else:
         profile = {}
-    
+
     # Update resume_text
     profile['resume_text'] = resume_text
-    
+
     # Save profile
     try:
+        profile = BlobStore(BACKEND_DIR / "blobs").externalize(profile, "profile")
         profile_path.write_text(json.dumps(profile, indent=2, ensure_ascii=False), encoding="utf-8")
         print(f"[OK] Profile updated successfully!")
         print(f"[OK] Resume text length: {len(resume_text)} characters")
@@ -46,38 +73,236 @@ def update_profile(resume_text):
     except Exception as e:
         print(f"Error saving profile: {e}")
 
+# ============ BULK INGESTION ============
+_token_counter = None
+
+def _count_tokens(text):
+    """tiktoken count when available (like the API), else the API's len/4 estimate"""
+    global _token_counter
+    if _token_counter is None:
+        try:
+            import tiktoken
+            _token_counter = tiktoken.encoding_for_model("gpt-4o").encode
+        except Exception:
+            _token_counter = False
+    return len(_token_counter(text)) if _token_counter else approximate_tokens(text)
+
+def _extract_worker(data):
+    """Process pool task: (extraction, None) or (None, error message)"""
+    try:
+        return extract_docx(data, _count_tokens), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _is_jd(path):
+    return path.suffix.lower() in JD_SUFFIXES and any(JD_TOKEN.fullmatch(word) for word in NAME_SEPARATORS.split(path.stem))
+
+def _session_name(stem, taken):
+    base = re.sub(r"[^A-Za-z0-9 _.-]+", "_", stem).strip(" ._") or "resume"
+    name, n = base, 2
+    while name.lower() in taken:
+        name, n = f"{base}-{n}", n + 1
+    taken.add(name.lower())
+    return name
+
+def _write_session(session_dir, session_data, resume_path, blobs):
+    session_dir.mkdir(parents=True, exist_ok=True)
+    session_data["job_description_preview"] = (session_data["job_description"] or "")[:100]  # /sessions lists without the blob
+    session_data = blobs.externalize(session_data, f"session:{session_dir.name}")
+    tmp = session_dir / "session.json.tmp"
+    tmp.write_text(json.dumps(session_data, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, session_dir / "session.json")
+    conv_file = session_dir / "conversation.json"
+    if not conv_file.exists():
+        conv_file.write_text("[]", encoding="utf-8")
+    shutil.copy2(resume_path, session_dir / resume_path.name)
+
+def bulk_ingest(library, sessions_dir, cache_dir, workers=None, batch_size=50, role="", language="", jd_file=None,
+                blobs_dir=None):
+    """Parse every resume under library into a session folder. Returns the summary counters.
+    blobs_dir: the API's blob store (default: next to sessions_dir)."""
+    blobs = BlobStore(blobs_dir or sessions_dir.parent / "blobs")
+    with blobs.deferred_refs():  # One refs.json write for the whole run
+        return _bulk_ingest(library, sessions_dir, cache_dir, blobs, workers, batch_size, role, language, jd_file)
+
+def _bulk_ingest(library, sessions_dir, cache_dir, blobs, workers, batch_size, role, language, jd_file):
+    t0 = time.perf_counter()
+    cache = ResumeTextCache(cache_dir, max_memory_entries=0, blob_store=blobs)
+    files = sorted(p for p in library.rglob("*") if p.is_file() and not p.name.startswith("~$"))
+    jds_by_dir = {}
+    for p in files:
+        if _is_jd(p):
+            jds_by_dir.setdefault(p.parent, []).append(p)
+            print(f"[INGEST] Job description: {p}")
+    resumes = [p for p in files if p.suffix.lower() == ".docx" and not _is_jd(p)]
+
+    # Job descriptions are few - read them up front
+    jd_texts = {}
+    def jd_text(path):
+        if path not in jd_texts:
+            try:
+                data = path.read_bytes()
+                jd_texts[path] = cache.extract(data, _count_tokens)[0]["text"] if path.suffix.lower() == ".docx" \
+                    else data.decode("utf-8", errors="replace").strip()
+            except Exception as e:
+                print(f"[INGEST] Could not read job description {path}: {e}")
+                jd_texts[path] = ""
+        return jd_texts[path]
+
+    # Sessions already on disk (earlier runs): resume hash + JD hash -> skip
+    existing, taken = set(), set()
+    if sessions_dir.exists():
+        for d in sessions_dir.iterdir():
+            taken.add(d.name.lower())
+            try:
+                meta = json.loads((d / "session.json").read_text(encoding="utf-8")).get("ingest") or {}
+                existing.add((meta.get("resume_sha256"), meta.get("jd_sha256")))
+            except Exception:
+                pass
+
+    stats = {"files": len(resumes), "duplicates": 0, "cached": 0, "parsed": 0, "failed": 0,
+             "sessions": 0, "skipped_existing": 0, "bytes": 0}
+    seen = {}      # resume hash -> first path
+    pending = {}   # resume hash -> (path, bytes) still to parse
+    ready = []     # (path, extraction)
+    for path in resumes:
+        data = path.read_bytes()
+        stats["bytes"] += len(data)
+        sha = content_hash(data)
+        if sha in seen:
+            stats["duplicates"] += 1
+            continue
+        seen[sha] = path
+        entry = cache.get(sha)
+        if entry is not None:
+            stats["cached"] += 1
+            ready.append((path, entry))
+        else:
+            pending[sha] = (path, data)
+
+    batch = []
+    def flush():
+        if not batch:
+            return
+        for path, entry in batch:
+            jds = jds_by_dir.get(path.parent, [])
+            jd_path = jds[0] if len(jds) == 1 else jd_file
+            job_description = jd_text(jd_path) if jd_path else ""
+            jd_sha = content_hash(job_description.encode("utf-8")) if job_description else None
+            if (entry["sha256"], jd_sha) in existing:
+                stats["skipped_existing"] += 1
+                continue
+            name = _session_name(path.stem, taken)
+            _write_session(sessions_dir / name, {
+                "session_name": name,
+                "job_description": job_description,
+                "resume_text": entry["text"],
+                "target_role": role,
+                "target_language": language,
+                "is_esl": False,
+                "short_responses": False,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "ingest": {"resume_file": str(path), "resume_sha256": entry["sha256"], "jd_file": str(jd_path) if jd_path else None,
+                           "jd_sha256": jd_sha, "resume_tokens": entry["tokens"], "sections": [s["title"] for s in entry["sections"]]},
+            }, path, blobs)
+            existing.add((entry["sha256"], jd_sha))
+            stats["sessions"] += 1
+        batch.clear()
+        done = stats["cached"] + stats["parsed"] + stats["failed"]
+        elapsed = time.perf_counter() - t0
+        print(f"[INGEST] {done}/{len(seen)} unique resumes | {stats['sessions']} sessions written | "
+              f"{done / elapsed:.1f} docs/s")
+
+    for item in ready:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            flush()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_extract_worker, data): path for path, data in pending.values()}
+            for future in as_completed(futures):
+                path = futures[future]
+                entry, error = future.result()
+                if error:
+                    stats["failed"] += 1
+                    print(f"[INGEST] Failed {path}: {error}")
+                    continue
+                stats["parsed"] += 1
+                cache.put(entry)
+                batch.append((path, entry))
+                if len(batch) >= batch_size:
+                    flush()
+    flush()
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+def bulk_main(argv):
+    parser = argparse.ArgumentParser(description="Bulk-ingest a resume library into ready-to-load sessions")
+    parser.add_argument("--bulk", type=Path, required=True, metavar="LIBRARY_DIR")
+    parser.add_argument("--sessions-dir", type=Path, default=BACKEND_DIR / "sessions",
+                        help="where sessions are written (the backend's sessions folder by default)")
+    parser.add_argument("--cache-dir", type=Path, default=BACKEND_DIR / "resume_cache",
+                        help="extraction cache shared with the API")
+    parser.add_argument("--blobs-dir", type=Path, default=None,
+                        help="blob store for resume/JD text (default: next to the sessions folder)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--role", default="")
+    parser.add_argument("--language", default="")
+    parser.add_argument("--jd", type=Path, default=None, help="job description for resumes without one in their folder")
+    args = parser.parse_args(argv)
+
+    if not args.bulk.is_dir():
+        print(f"Error: Not a directory: {args.bulk}")
+        sys.exit(1)
+    stats = bulk_ingest(args.bulk, args.sessions_dir, args.cache_dir, args.workers, args.batch_size,
+                        args.role, args.language, args.jd, args.blobs_dir)
+    print(f"\n[OK] {stats['files']} resumes ({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']} s: "
+          f"{stats['parsed']} parsed, {stats['cached']} from cache, {stats['duplicates']} duplicates, "
+          f"{stats['failed']} failed")
+    print(f"[OK] {stats['sessions']} sessions written to {args.sessions_dir}"
+          f" ({stats['skipped_existing']} already there) | "
+          f"{stats['files'] / max(stats['seconds'], 1e-9):.1f} files/s")
+    if stats["failed"]:
+        sys.exit(2)
+
 def main():
+    if "--bulk" in sys.argv[1:]:
+        bulk_main(sys.argv[1:])
+        return
+
     if len(sys.argv) < 2:
         print("Usage: python process_resume.py <path_to_resume.docx>")
+        print("       python process_resume.py --bulk <library_dir> [--sessions-dir DIR] [--workers N]")
         print("\nExample:")
         print('  python process_resume.py "C:\\path\\to\\your\\resume.docx"')
         sys.exit(1)
-    
+
     resume_path = Path(sys.argv[1])
-    
+
     if not resume_path.exists():
         print(f"Error: File not found: {resume_path}")
         sys.exit(1)
-    
+
     if not resume_path.suffix.lower() == '.docx':
         print(f"Error: File must be a .docx file, got: {resume_path.suffix}")
         sys.exit(1)
-    
+
     print(f"Processing resume: {resume_path}")
-    
+
     # Extract text
     resume_text = extract_resume_text(resume_path)
-    
+
     if resume_text is None:
         print("Failed to extract resume text")
         sys.exit(1)
-    
+
     if not resume_text.strip():
         print("Warning: Resume appears to be empty")
-    
+
     # Update profile
     update_profile(resume_text)
-    
+
     print("\n[OK] Done! The AI will now use your resume for context.")
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+# backend/resume_extract.py
+"""
+Resume text extraction shared by the API (/session/resume, /profile/resume) and the
+process_resume.py CLI.
+
+extract_docx() turns .docx bytes into
+  {"sha256", "paragraphs", "text", "sections", "chars", "tokens", "version"}
+where sections are detected headings ("Experience", "SKILLS", Heading-styled paragraphs, ...)
+with the index of their first paragraph. Parsing is CPU-bound: call it off the event loop.
+ResumeTextCache keeps results by SHA-256 of the file bytes - in memory and as <sha>.json files -
+so a resume that was seen before (another session, a re-upload) is never parsed again. Given a
+BlobStore, the .json files hold only sections, counts and the text's hash: the text is stored once,
+in the blob store the sessions and the profile already reference (owner "resume_cache:<sha>").
+Needs python-docx.
+"""
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from serialization import dumps, loads
+
+EXTRACTOR_VERSION = 1  # Bump when the output changes so cached entries are re-extracted
+SECTION_KEYWORDS = {
+    "summary", "profile", "professional summary", "objective", "about me", "experience",
+    "work experience", "professional experience", "employment history", "employment", "education",
+    "skills", "technical skills", "core competencies", "projects", "certifications", "certificates",
+    "awards", "publications", "languages", "interests", "volunteering", "volunteer experience",
+    "achievements", "training", "references", "job description", "responsibilities", "requirements",
+    "qualifications", "about the role", "about us", "benefits", "nice to have",
+}
+MAX_HEADING_WORDS = 5
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def approximate_tokens(text: str) -> int:
+    return len(text) // 4  # Same fallback as main.count_tokens without tiktoken
+
+
+def _is_heading(text: str, style: str) -> bool:
+    if style.lower().startswith(("heading", "title")):
+        return True
+    words = text.split()
+    if not words or len(words) > MAX_HEADING_WORDS or text.endswith((".", ",", ";")):
+        return False
+    normalized = re.sub(r"[^a-z ]", "", text.lower()).strip()
+    return normalized in SECTION_KEYWORDS or (text.isupper() and len(normalized) > 2)
+
+
+def extract_docx(data: bytes, count_tokens: Optional[Callable[[str], int]] = None) -> Dict[str, Any]:
+    """Extract paragraphs, text and section structure from .docx bytes."""
+    from docx import Document
+
+    doc = Document(io.BytesIO(data))
+    paragraphs: List[str] = []
+    sections: List[Dict[str, Any]] = []
+    for p in doc.paragraphs:
+        text = p.text.strip() if p.text else ""
+        if not text:
+            continue
+        style = getattr(p.style, "name", "") or ""
+        if _is_heading(text, style):
+            sections.append({"title": text, "paragraph": len(paragraphs)})
+        paragraphs.append(p.text)
+    for i, section in enumerate(sections):
+        end = sections[i + 1]["paragraph"] if i + 1 < len(sections) else len(paragraphs)
+        section["chars"] = sum(len(p) for p in paragraphs[section["paragraph"]:end])
+    text = "\n\n".join(paragraphs)
+    return {
+        "sha256": content_hash(data),
+        "version": EXTRACTOR_VERSION,
+        "paragraphs": paragraphs,
+        "text": text,
+        "sections": sections,
+        "chars": len(text),
+        "tokens": (count_tokens or approximate_tokens)(text),
+    }
+
+
+PARAGRAPH_SEPARATOR = "\n\n"  # extract_docx joins paragraphs with this
+
+
+def _pack(entry: Dict[str, Any], text_sha: str) -> Dict[str, Any]:
+    """On-disk form of an extraction: the text by reference, paragraphs as lengths into it"""
+    stored = {k: v for k, v in entry.items() if k not in ("text", "paragraphs")}
+    stored["text_sha256"] = text_sha
+    stored["paragraph_chars"] = [len(p) for p in entry["paragraphs"]]
+    return stored
+
+
+def _unpack(stored: Dict[str, Any], text: str) -> Dict[str, Any]:
+    paragraphs, pos = [], 0
+    for n in stored.get("paragraph_chars", []):
+        paragraphs.append(text[pos:pos + n])
+        pos += n + len(PARAGRAPH_SEPARATOR)
+    entry = {k: v for k, v in stored.items() if k not in ("text_sha256", "paragraph_chars")}
+    entry.update(text=text, paragraphs=paragraphs)
+    return entry
+
+
+class ResumeTextCache:
+    """Extraction results by content hash: a small in-memory LRU in front of <directory>/<sha>.json."""
+
+    def __init__(self, directory: Optional[Path], max_memory_entries: int = 32, blob_store=None):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self.blob_store = blob_store
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, sha: str) -> Optional[Path]:
+        return self.directory / f"{sha}.json" if self.directory else None
+
+    def get(self, sha: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(sha)
+            if entry is not None:
+                self._memory.move_to_end(sha)
+                return entry
+        path = self._path(sha)
+        if path is None:
+            return None
+        try:
+            entry = loads(path.read_bytes())
+        except Exception:
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != EXTRACTOR_VERSION:
+            return None
+        if "text" not in entry:
+            text = self.blob_store.get(entry.get("text_sha256") or "") if self.blob_store else None
+            if text is None:
+                return None  # Text blob gone - parse again
+            entry = _unpack(entry, text)
+        self._remember(entry)
+        return entry
+
+    def put(self, entry: Dict[str, Any]):
+        self._remember(entry)
+        path = self._path(entry["sha256"])
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                stored = entry
+                if self.blob_store is not None:
+                    text_sha = self.blob_store.put(entry["text"])
+                    self.blob_store.retain(f"resume_cache:{entry['sha256']}", [text_sha])
+                    stored = _pack(entry, text_sha)
+                path.write_bytes(dumps(stored))
+            except Exception as e:
+                print(f"[RESUME CACHE] Could not persist {entry['sha256'][:12]}: {e}")
+
+    def _remember(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[entry["sha256"]] = entry
+            self._memory.move_to_end(entry["sha256"])
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def extract(self, data: bytes, count_tokens: Optional[Callable[[str], int]] = None) -> Tuple[Dict[str, Any], bool]:
+        """(extraction, cache hit) for .docx bytes - parses only unseen files."""
+        sha = content_hash(data)
+        entry = self.get(sha)
+        if entry is not None:
+            self.hits += 1
+            return entry, True
+        entry = extract_docx(data, count_tokens)
+        self.misses += 1
+        self.put(entry)
+        return entry, False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
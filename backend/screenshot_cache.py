@@ -0,0 +1,207 @@
+# backend/screenshot_cache.py
+"""
+Disk-backed answer cache for one-shot screenshot problems (save_to_context=False).
+
+The same LeetCode-style problem statements come back across sessions and users on a shared
+machine. Entries are keyed by a perceptual fingerprint of the screenshot plus a partition for
+the prompt/language/model:
+  - a 64-bit DCT perceptual hash finds candidates (Hamming distance <= max_distance)
+  - a 256x144 grayscale thumbnail verifies them: two captures of different problems on the
+    same site layout have nearly identical pHashes, but around 1% of their thumbnail pixels
+    differ visibly, while a re-capture of the same problem (rescaled, recompressed) has ~0%
+Stored under <directory>/index.json (metadata + answers) and <id>.thumb (raw thumbnail bytes),
+evicted least recently used once max_entries or max_bytes is exceeded. A put() that verifies
+against an entry of the same partition replaces it instead of adding a near-duplicate. Hits only
+touch recency/hit counts, so the index is rewritten for them at most every save_interval seconds
+or save_every_hits hits (flush() writes the rest, e.g. on shutdown).
+Needs NumPy and Pillow.
+"""
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from lazy_imports import available, lazy_module
+from serialization import dumps, loads
+
+np = lazy_module("numpy") if available("numpy") else None  # Imported on first use
+Image = lazy_module("PIL.Image") if available("PIL") else None
+
+CACHE_AVAILABLE = np is not None and Image is not None
+
+HASH_SIZE = 32                 # Image is reduced to 32x32 before the DCT
+HASH_BITS = 8                  # Top-left 8x8 low frequencies (DC excluded) -> 63-bit hash
+THUMB_SIZE = (256, 144)
+THUMB_PIXEL_DELTA = 16         # Gray-level difference that counts as a visibly different pixel
+INDEX_FILE = "index.json"
+
+
+@functools.lru_cache(maxsize=None)
+def _dct_matrix(n: int):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    m[0] *= 1 / np.sqrt(2)
+    return (m * np.sqrt(2 / n)).astype(np.float32)
+
+
+def fingerprint(image) -> Tuple[int, bytes]:
+    """(perceptual hash, thumbnail bytes) of a PIL image. CPU-bound - call it off the event loop."""
+    gray = image.convert("L")
+    small = np.asarray(gray.resize((HASH_SIZE, HASH_SIZE), Image.BILINEAR), dtype=np.float32)
+    dct = _dct_matrix(HASH_SIZE)
+    coeffs = (dct @ small @ dct.T)[:HASH_BITS, :HASH_BITS].flatten()[1:]
+    bits = coeffs > np.median(coeffs)
+    phash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    thumb = gray.resize(THUMB_SIZE, Image.BILINEAR).tobytes()
+    return phash, thumb
+
+
+class ScreenshotAnswerCache:
+    def __init__(self, directory: Path, max_entries: int = 500, max_bytes: int = 32 * 1024 * 1024,
+                 max_distance: int = 6, max_changed_fraction: float = 0.002,
+                 save_interval: float = 30.0, save_every_hits: int = 20):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        self.max_changed_fraction = max_changed_fraction
+        self.save_interval = save_interval
+        self.save_every_hits = save_every_hits
+        self._unsaved_hits = 0
+        self._saved_at = time.monotonic()
+        self._entries: Optional[OrderedDict] = None  # id -> metadata, least recently used first; loaded lazily
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # pHash candidates that failed thumbnail verification
+
+    # ------------------------------------------------------------------ storage
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        try:
+            data = loads((self.directory / INDEX_FILE).read_bytes())
+            for entry in sorted(data.get("entries", []), key=lambda e: e.get("last_used", 0)):
+                if (self.directory / f"{entry['id']}.thumb").exists():
+                    self._entries[entry["id"]] = entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[SCREENSHOT CACHE] Ignoring unreadable index: {e}")
+
+    def _save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"{INDEX_FILE}.tmp"
+        tmp.write_bytes(dumps({"version": 1, "entries": list(self._entries.values())}))
+        os.replace(tmp, self.directory / INDEX_FILE)  # Never leave a half-written index behind
+        self._unsaved_hits = 0
+        self._saved_at = time.monotonic()
+
+    def _drop(self, entry_id: str):
+        self._entries.pop(entry_id, None)
+        try:
+            (self.directory / f"{entry_id}.thumb").unlink()
+        except FileNotFoundError:
+            pass
+
+    def _verify(self, entry: Dict[str, Any], thumb: bytes) -> bool:
+        try:
+            stored = (self.directory / f"{entry['id']}.thumb").read_bytes()
+        except FileNotFoundError:
+            return False
+        if len(stored) != len(thumb):
+            return False
+        a = np.frombuffer(stored, dtype=np.uint8).astype(np.int16)
+        b = np.frombuffer(thumb, dtype=np.uint8).astype(np.int16)
+        return float((np.abs(a - b) > THUMB_PIXEL_DELTA).mean()) <= self.max_changed_fraction
+
+    def _match(self, phash: int, thumb: bytes, partition: str) -> Optional[Tuple[int, str]]:
+        """(distance, id) of the closest verified entry in partition, or None"""
+        candidates = sorted(
+            (bin(phash ^ e["phash"]).count("1"), entry_id)
+            for entry_id, e in self._entries.items() if e["partition"] == partition
+        )
+        for distance, entry_id in candidates:
+            if distance > self.max_distance:
+                break
+            if self._verify(self._entries[entry_id], thumb):
+                return distance, entry_id
+            self.rejected += 1
+        return None
+
+    # ------------------------------------------------------------------ public API
+    def get(self, fp: Tuple[int, bytes], partition: str) -> Optional[Dict[str, Any]]:
+        """Return {"answer", "question", "distance", ...metadata} for a verified match, else None."""
+        phash, thumb = fp
+        with self._lock:
+            self._load()
+            match = self._match(phash, thumb, partition)
+            if match is None:
+                self.misses += 1
+                return None
+            distance, entry_id = match
+            entry = self._entries[entry_id]
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._entries.move_to_end(entry_id)
+            self._unsaved_hits += 1
+            if self._unsaved_hits >= self.save_every_hits or time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+            self.hits += 1
+            return {**entry.get("metadata", {}), "answer": entry["answer"],
+                    "question": entry["question"], "distance": distance}
+
+    def put(self, fp: Tuple[int, bytes], partition: str, question: str, answer: str, **metadata):
+        if not answer:
+            return
+        phash, thumb = fp
+        with self._lock:
+            self._load()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            hits = 0
+            match = self._match(phash, thumb, partition)
+            if match is not None:  # Same problem answered again (e.g. bypass_cache) - newest answer replaces it
+                hits = self._entries[match[1]].get("hits", 0)
+                self._drop(match[1])
+            entry_id = uuid.uuid4().hex[:16]
+            (self.directory / f"{entry_id}.thumb").write_bytes(thumb)
+            now = time.time()
+            self._entries[entry_id] = {
+                "id": entry_id, "phash": phash, "partition": partition, "question": question,
+                "answer": answer, "metadata": metadata, "created_at": now, "last_used": now, "hits": hits,
+                "bytes": len(thumb) + len(answer.encode("utf-8")),
+            }
+            total = sum(e["bytes"] for e in self._entries.values())
+            while self._entries and (len(self._entries) > self.max_entries or total > self.max_bytes):
+                oldest_id, oldest = next(iter(self._entries.items()))
+                total -= oldest["bytes"]
+                self._drop(oldest_id)
+            self._save()
+
+    def flush(self):
+        """Write hit bookkeeping that get() has not saved yet"""
+        with self._lock:
+            if self._entries is not None and self._unsaved_hits:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            for entry_id in list(self._entries):
+                self._drop(entry_id)
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries) if self._entries is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected_candidates": self.rejected,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
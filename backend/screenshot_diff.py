@@ -0,0 +1,151 @@
+# backend/screenshot_diff.py
+"""
+Change detection between consecutive screenshots of the same session.
+
+During coding rounds the same editor/problem page gets captured over and over with only a few
+lines changed. ScreenshotTracker keeps a downscaled grayscale copy of the previous capture per
+session and compares the next one block by block (vectorized with NumPy):
+  - "unchanged": no meaningful block changed (cursor blink and clock ticks are tolerated)
+  - "crop":      the changes fit in a box well inside the frame - send that box plus a margin at
+                 full resolution, next to a downscaled copy of the whole frame (the earlier
+                 screenshot itself is never resent, so the model needs the overview for the
+                 problem statement and layout)
+  - "full":      first capture, resolution changed, or the change is too large to crop
+Needs NumPy and Pillow; without them every screenshot is sent whole.
+"""
+import base64
+import io
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from image_utils import split_data_url, to_data_url, vision_tokens_for_size
+from lazy_imports import available, lazy_module
+
+np = lazy_module("numpy") if available("numpy") else None  # Imported on first use
+Image = lazy_module("PIL.Image") if available("PIL") else None
+
+DIFF_AVAILABLE = np is not None and Image is not None
+
+ANALYSIS_REDUCE = 2          # Compare at 1/2 resolution - plenty for text-sized changes
+BLOCK_SIZE = 16              # Block edge at analysis resolution (32 px on screen)
+PIXEL_DELTA = 24             # Gray-level difference that counts as a changed pixel (ignores JPEG noise)
+BLOCK_MIN_PIXELS = 6         # Changed pixels for a block to count as changed
+UNCHANGED_MAX_BLOCKS = 2     # This few changed blocks (caret, clock) still counts as "unchanged"
+CROP_MARGIN_PX = 128         # Context kept around the changed box, in screen pixels
+CROP_MIN_SIDE = 512          # Never send a crop narrower/shorter than this
+CROP_MAX_AREA = 0.6          # Crop only when the box covers at most this fraction of the frame
+OVERVIEW_MAX_SIDE = 768      # Longest side of the whole-frame overview sent with a crop (one or two tiles)
+OVERVIEW_JPEG_QUALITY = 70
+MAX_TRACKED_SESSIONS = 8
+
+
+def decode_data_url(data_url: str):
+    start, _ = split_data_url(data_url)
+    image = Image.open(io.BytesIO(base64.b64decode(data_url[start:])))
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGB")  # Palette/CMYK captures - reduce() needs a plain mode
+    return image
+
+
+def changed_blocks(previous, current):
+    """Boolean (rows, cols) grid of blocks that differ between two equal-size grayscale arrays."""
+    h, w = current.shape
+    rows, cols = -(-h // BLOCK_SIZE), -(-w // BLOCK_SIZE)
+    changed = np.abs(current.astype(np.int16) - previous.astype(np.int16)) > PIXEL_DELTA
+    padded = np.zeros((rows * BLOCK_SIZE, cols * BLOCK_SIZE), dtype=bool)
+    padded[:h, :w] = changed
+    counts = padded.reshape(rows, BLOCK_SIZE, cols, BLOCK_SIZE).sum(axis=(1, 3))
+    return counts >= BLOCK_MIN_PIXELS
+
+
+def _expand(lo: int, hi: int, limit: int) -> tuple:
+    """Add the context margin and grow to CROP_MIN_SIDE, staying inside [0, limit]."""
+    lo, hi = max(0, lo - CROP_MARGIN_PX), min(limit, hi + CROP_MARGIN_PX)
+    want = min(CROP_MIN_SIDE, limit)
+    if hi - lo < want:
+        lo = min(max(0, (lo + hi) // 2 - want // 2), limit - want)
+        hi = lo + want
+    return lo, hi
+
+
+class ScreenshotTracker:
+    def __init__(self, max_sessions: int = MAX_TRACKED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._frames = OrderedDict()  # session key -> {"gray", "size", "transcript", "answer", "in_context"}
+        self._lock = threading.Lock()  # prepare() runs in a worker thread
+
+    def prepare(self, key: str, image, data_url: str, transcript: str, allow_crop: bool = True) -> Dict[str, Any]:
+        """Compare a screenshot (decoded image + the data URL it came from) with the session's
+        previous one and decide what to send. Returns {"action": "full"|"crop"|"unchanged",
+        "data_url", "overview_url", "box", "changed_blocks", "total_blocks", "previous_answer"};
+        overview_url (crop only) is the whole frame downscaled to OVERVIEW_MAX_SIDE.
+        CPU-bound - call it off the event loop."""
+        result = {"action": "full", "data_url": data_url, "overview_url": None, "box": None, "changed_blocks": None,
+                  "total_blocks": None, "previous_answer": None}
+        size = image.size
+        gray = np.asarray(image.reduce(ANALYSIS_REDUCE).convert("L"))
+
+        with self._lock:
+            previous = self._frames.pop(key, None)
+            current = {"gray": gray, "size": size, "transcript": transcript, "answer": None, "in_context": False}
+            self._frames[key] = current
+            while len(self._frames) > self.max_sessions:
+                self._frames.popitem(last=False)
+
+        if previous is None or previous["size"] != size:
+            return result
+
+        grid = changed_blocks(previous["gray"], gray)
+        result["changed_blocks"], result["total_blocks"] = int(grid.sum()), int(grid.size)
+
+        if result["changed_blocks"] <= UNCHANGED_MAX_BLOCKS:
+            result["action"] = "unchanged"
+            # Same screen: the previous answer still applies if the question is the same too
+            if previous["transcript"] == transcript:
+                result["previous_answer"] = previous["answer"]
+                current["answer"], current["in_context"] = previous["answer"], previous["in_context"]
+            return result
+
+        if not allow_crop or not previous["in_context"]:
+            return result  # The model has no answer about the previous screen in context - it needs the whole frame
+
+        rows = np.flatnonzero(grid.any(axis=1))
+        cols = np.flatnonzero(grid.any(axis=0))
+        scale = BLOCK_SIZE * ANALYSIS_REDUCE
+        top, bottom = _expand(int(rows[0]) * scale, (int(rows[-1]) + 1) * scale, size[1])
+        left, right = _expand(int(cols[0]) * scale, (int(cols[-1]) + 1) * scale, size[0])
+        if (right - left) * (bottom - top) > CROP_MAX_AREA * size[0] * size[1]:
+            return result
+
+        overview_side = min(1.0, OVERVIEW_MAX_SIDE / max(size))
+        overview_size = (max(1, round(size[0] * overview_side)), max(1, round(size[1] * overview_side)))
+        if vision_tokens_for_size(right - left, bottom - top) + vision_tokens_for_size(*overview_size) \
+                >= vision_tokens_for_size(*size):
+            return result  # Crop plus overview would cost as much as the whole frame
+
+        buf = io.BytesIO()
+        image.crop((left, top, right, bottom)).save(buf, format="PNG", compress_level=1)
+        crop_url = to_data_url(buf.getvalue(), "image/png")
+        overview = image.convert("RGB")
+        overview.thumbnail((OVERVIEW_MAX_SIDE, OVERVIEW_MAX_SIDE))
+        buf = io.BytesIO()
+        overview.save(buf, format="JPEG", quality=OVERVIEW_JPEG_QUALITY)
+        result.update(action="crop", box=(left, top, right, bottom), data_url=crop_url,
+                      overview_url=to_data_url(buf.getvalue(), "image/jpeg"))
+        return result
+
+    def remember_answer(self, key: str, answer: str, in_context: bool):
+        """Attach the finished answer to the session's latest screenshot. in_context: the answer was
+        saved to the conversation history, so a later crop of this screen still makes sense."""
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                frame["answer"], frame["in_context"] = answer, in_context
+
+    def reset(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._frames.clear()
+            else:
+                self._frames.pop(key, None)
@@ -0,0 +1,211 @@
+# backend/screenshot_stitch.py
+"""
+Batch several screenshots of one long problem statement / code file into as few vision tiles
+as possible for a single request.
+
+  1. De-duplicate: consecutive captures of a scrolled page share rows. Fixed header/footer bands
+     are detected (same rows at the same place), then the scroll offset is found by matching
+     per-row signatures, and only the rows not seen before are kept.
+  2. Trim: blank side margins common to every capture are cut away (full-width toolbars are
+     cut to the content columns too).
+  3. Scale: the strip is scaled by the same factor the vision model applies to a single capture,
+     so text stays exactly as legible as it is today.
+  4. Pack: the strip is cut (at blank rows where possible) into column pieces no taller than the
+     model's short side and laid out side by side on canvases no wider than its long side, so no
+     canvas is downscaled again and every tile is filled.
+If packing would not save tokens (e.g. unrelated captures), the captures are sent as they are -
+still in one request. Needs NumPy and Pillow.
+"""
+import io
+import math
+from typing import Any, Dict, List
+
+from image_utils import VISION_MAX_SIDE, VISION_SHORT_SIDE, to_data_url, vision_tokens_for_size
+from lazy_imports import available, lazy_module
+
+np = lazy_module("numpy") if available("numpy") else None  # Imported on first use
+Image = lazy_module("PIL.Image") if available("PIL") else None
+
+STITCH_AVAILABLE = np is not None and Image is not None
+
+ANALYSIS_REDUCE = 2        # Row matching runs at 1/2 resolution
+SIGNATURE_COLS = 128       # Each row is summarized by 128 column-block means
+ROW_MATCH_TOLERANCE = 2.0  # Mean gray-level difference for two rows/regions to count as the same
+MIN_OVERLAP_ROWS = 24      # Overlap (analysis rows) needed before a scroll offset is trusted
+MIN_OVERLAP_DETAIL = 3.0   # ...and it must contain some content, not just blank background
+MATCH_DETAIL_RATIO = 0.1   # A matching overlap differs by at most this fraction of its own contrast
+MARGIN_TOLERANCE = 10      # Gray-level distance from the background for a column to be content
+MARGIN_PAD = 16            # Pixels kept around the trimmed content
+FULL_WIDTH_BAR = 0.9       # Rows with this fraction of non-background columns are bars, not content
+CUT_SEARCH_PX = 48         # How far back from a column break to look for a blank row
+PIECE_GAP = 8              # Gap between packed columns
+
+
+def _signatures(image) -> "np.ndarray":
+    gray = np.asarray(image.reduce(ANALYSIS_REDUCE).convert("L"), dtype=np.float32)
+    h, w = gray.shape
+    w -= w % SIGNATURE_COLS
+    return gray[:, :w].reshape(h, SIGNATURE_COLS, w // SIGNATURE_COLS).mean(axis=2)
+
+
+def _static_bands(a, b) -> tuple:
+    """Rows at the top and bottom that are identical in both captures (toolbars, headers, footers)."""
+    same = np.abs(a - b).mean(axis=1) < ROW_MATCH_TOLERANCE
+    if same.all():
+        return len(same), 0
+    top = int(np.argmin(same))
+    bottom = int(np.argmin(same[::-1]))
+    return top, bottom
+
+
+def _scroll_offset(a, b):
+    """Rows scrolled between two regions (b shows a scrolled down by d rows), or None."""
+    n, cols = b.shape
+    # Running sums give the contrast (std) of every candidate overlap b[:m] without rescanning it
+    sums = np.cumsum(b.sum(axis=1, dtype=np.float64))
+    squares = np.cumsum((b.astype(np.float64) ** 2).sum(axis=1))
+    best_d, best_score = None, 1.0
+    for d in range(1, n - MIN_OVERLAP_ROWS + 1):
+        m = n - d
+        mean = sums[m - 1] / (m * cols)
+        detail = math.sqrt(max(0.0, squares[m - 1] / (m * cols) - mean * mean))
+        if detail < MIN_OVERLAP_DETAIL:
+            continue  # Blank overlap matches anything
+        err = float(np.abs(a[d:] - b[:m]).mean())
+        # Mostly-blank pages differ little even when unrelated - judge the error against the content
+        score = max(err / ROW_MATCH_TOLERANCE, err / (MATCH_DETAIL_RATIO * detail))
+        if score < best_score:
+            best_d, best_score = d, score
+            if score < 0.25:
+                break  # Smallest offset with a near-exact match - the largest overlap
+    return best_d
+
+
+def deduplicate(images: list) -> List[tuple]:
+    """Ordered (capture index, y0, y1) row ranges that together show everything exactly once."""
+    r = ANALYSIS_REDUCE
+    segments = []
+    sigs = [_signatures(img) for img in images]
+    tail = None  # Footer band of the last related capture, appended at the end
+    for i, img in enumerate(images):
+        if i == 0:
+            segments.append([0, 0, img.height])
+            continue
+        prev, cur = sigs[i - 1], sigs[i]
+        if images[i - 1].size != img.size or prev.shape != cur.shape:
+            segments.append([i, 0, img.height])
+            tail = None
+            continue
+        top, bottom = _static_bands(prev, cur)
+        if top >= len(cur):
+            continue  # Identical capture
+        n = len(cur) - top - bottom
+        d = _scroll_offset(prev[top:top + n], cur[top:top + n]) if n > MIN_OVERLAP_ROWS else None
+        if d is None:
+            segments.append([i, 0, img.height])
+            tail = None
+            continue
+        # Drop the footer from what came before; it is appended once, after the last new rows
+        if bottom:
+            segments[-1][2] = min(segments[-1][2], images[segments[-1][0]].height - bottom * r)
+            tail = (i, img.height - bottom * r, img.height)
+        segments.append([i, (top + n - d) * r, (top + n) * r])
+    if tail:
+        segments.append(list(tail))
+    return [tuple(s) for s in segments if s[2] > s[1]]
+
+
+def _content_columns(images: list, segments: list) -> tuple:
+    """Left/right bounds of the non-background columns across every kept segment. Full-width bars
+    (toolbars, status lines) are ignored - otherwise they would stop any trimming."""
+    edges = np.asarray(images[0].convert("L"), dtype=np.int16)[:, [0, -1]]
+    background = int(np.median(edges))  # Page background - per segment it could be a toolbar's color
+    left, right = None, None
+    for idx, y0, y1 in segments:
+        gray = np.asarray(images[idx].crop((0, y0, images[idx].width, y1)).reduce(ANALYSIS_REDUCE).convert("L"), dtype=np.int16)
+        content = np.abs(gray - background) > MARGIN_TOLERANCE
+        content = content[content.mean(axis=1) < FULL_WIDTH_BAR]
+        cols = np.flatnonzero(content.any(axis=0)) * ANALYSIS_REDUCE
+        if len(cols):
+            left = cols[0] if left is None else min(left, cols[0])
+            right = cols[-1] + ANALYSIS_REDUCE if right is None else max(right, cols[-1] + ANALYSIS_REDUCE)
+    width = images[0].width
+    if left is None:
+        return 0, width
+    return max(0, int(left) - MARGIN_PAD), min(width, int(right) + MARGIN_PAD)
+
+
+def single_capture_scale(width: int, height: int) -> float:
+    """Scale factor the vision model applies to one capture of this size."""
+    s = min(1.0, VISION_MAX_SIDE / max(width, height))
+    return s * min(1.0, VISION_SHORT_SIDE / (min(width, height) * s))
+
+
+def _cut_rows(strip, limit: int) -> List[tuple]:
+    """Split a strip into pieces of at most `limit` rows, preferring blank rows as cut points."""
+    gray = np.asarray(strip.convert("L"), dtype=np.float32)
+    row_detail = gray.std(axis=1)
+    pieces, y = [], 0
+    while y < strip.height:
+        end = min(strip.height, y + limit)
+        if end < strip.height:
+            window = row_detail[max(y + 1, end - CUT_SEARCH_PX):end]
+            if len(window):
+                end = max(y + 1, end - CUT_SEARCH_PX) + int(np.argmin(window)) + 1
+        pieces.append((y, end))
+        y = end
+    return pieces
+
+
+def _encode(image) -> str:
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", compress_level=3)
+    return to_data_url(buf.getvalue(), "image/png")
+
+
+def pack_screenshots(images: list, data_urls: list) -> Dict[str, Any]:
+    """De-duplicate, stitch and pack decoded captures (in order). Returns {"mode": "packed"|"separate",
+    "images": [data URLs], "tokens", "separate_tokens", "captures", "segments", "removed_rows"}.
+    CPU-bound - call it off the event loop."""
+    separate_tokens = sum(vision_tokens_for_size(*img.size) for img in images)
+    result = {"mode": "separate", "images": list(data_urls), "tokens": separate_tokens,
+              "separate_tokens": separate_tokens, "captures": len(images), "segments": len(images), "removed_rows": 0}
+    if len(images) < 2:
+        return result
+
+    images = [img.convert("RGB") for img in images]
+    segments = deduplicate(images)
+    left, right = _content_columns(images, segments)
+    scale = single_capture_scale(*images[0].size)
+
+    height = sum(y1 - y0 for _, y0, y1 in segments)
+    strip = Image.new("RGB", (right - left, height))
+    y = 0
+    for idx, y0, y1 in segments:
+        strip.paste(images[idx].crop((left, y0, right, y1)), (0, y))
+        y += y1 - y0
+    strip = strip.resize((max(1, round(strip.width * scale)), max(1, round(strip.height * scale))),
+                         Image.LANCZOS, reducing_gap=2.0)
+
+    # Wide canvases: columns side by side, each no taller than the short side
+    col_w = strip.width
+    per_canvas = max(1, (VISION_MAX_SIDE + PIECE_GAP) // (col_w + PIECE_GAP))
+    pieces = _cut_rows(strip, VISION_SHORT_SIDE)
+    background = tuple(int(c) for c in np.median(np.asarray(strip)[:, 0], axis=0))  # Page color, not a toolbar's
+    canvases = []
+    for start in range(0, len(pieces), per_canvas):
+        group = pieces[start:start + per_canvas]
+        canvas = Image.new("RGB", (len(group) * col_w + (len(group) - 1) * PIECE_GAP,
+                                   max(y1 - y0 for y0, y1 in group)), background)
+        for k, (y0, y1) in enumerate(group):
+            canvas.paste(strip.crop((0, y0, col_w, y1)), (k * (col_w + PIECE_GAP), 0))
+        canvases.append(canvas)
+
+    packed_tokens = sum(vision_tokens_for_size(*c.size) for c in canvases)
+    removed = sum(img.height for img in images) - height
+    result.update(segments=len(segments), removed_rows=removed)
+    if packed_tokens >= separate_tokens:
+        return result
+    result.update(mode="packed", images=[_encode(c) for c in canvases], tokens=packed_tokens,
+                  columns=len(pieces), canvases=len(canvases))
+    return result
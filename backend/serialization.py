@@ -0,0 +1,151 @@
+# backend/serialization.py
+"""
+JSON serialization for the hot paths: SSE frames, session files and the profile.
+
+Picks the fastest installed backend - orjson, then msgspec, then the stdlib json module - and
+exposes one small API so callers never care which one is active:
+  - dumps(obj) -> bytes / loads(bytes | str)
+  - sse_frame(event) -> bytes, with a precompiled template for {"chunk": text} events
+  - read_json_file(path) / write_json_file(path, obj): session and profile files, re-read only
+    when the file's mtime or size changes
+Set JOBANDIT_SERIALIZER=json (or orjson / msgspec) to force a backend.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+AVAILABLE_BACKENDS = tuple(name for name, mod in (("orjson", orjson), ("msgspec", msgspec), ("json", json)) if mod is not None)
+
+BACKEND = "json"
+_dumps = _dumps_pretty = _loads = None
+
+
+def _std_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _std_dumps_pretty(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def set_backend(name: str):
+    """Switch the active backend (used by the benchmark and the JOBANDIT_SERIALIZER override)."""
+    global BACKEND, _dumps, _dumps_pretty, _loads
+    if name not in AVAILABLE_BACKENDS:
+        raise ValueError(f"Serializer backend '{name}' is not installed (available: {', '.join(AVAILABLE_BACKENDS)})")
+
+    if name == "orjson":
+        def _dumps(obj, _d=orjson.dumps):
+            try:
+                return _d(obj)
+            except TypeError:  # Non-str keys, ints > 64 bit, ... - rare, let stdlib handle them
+                return _std_dumps(obj)
+
+        def _dumps_pretty(obj, _d=orjson.dumps, _opt=orjson.OPT_INDENT_2):
+            try:
+                return _d(obj, option=_opt)
+            except TypeError:
+                return _std_dumps_pretty(obj)
+        _loads = orjson.loads
+    elif name == "msgspec":
+        # Encoder/decoder are built once - msgspec caches per-type encoding plans on them
+        encoder, decoder = msgspec.json.Encoder(), msgspec.json.Decoder()
+        _dumps = encoder.encode
+        _dumps_pretty = lambda obj: msgspec.json.format(encoder.encode(obj), indent=2)
+        _loads = decoder.decode
+    else:
+        _dumps, _dumps_pretty, _loads = _std_dumps, _std_dumps_pretty, json.loads
+    BACKEND = name
+
+
+def dumps(obj: Any) -> bytes:
+    return _dumps(obj)
+
+
+def dumps_pretty(obj: Any) -> bytes:
+    return _dumps_pretty(obj)
+
+
+def loads(data) -> Any:
+    return _loads(data)
+
+
+# ------------------------------------------------------------------ SSE frames
+_CHUNK_FRAME_PREFIX = b'data: {"chunk":'
+_CHUNK_FRAME_SUFFIX = b'}\n\n'
+
+
+def sse_frame(event: Dict[str, Any]) -> bytes:
+    """Encode one event as a Server-Sent Events frame. Chunk events (the bulk of every stream)
+    only encode their text; the surrounding bytes are precompiled."""
+    if len(event) == 1 and 'chunk' in event:
+        return _CHUNK_FRAME_PREFIX + _dumps(event['chunk']) + _CHUNK_FRAME_SUFFIX
+    return b"data: " + _dumps(event) + b"\n\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class for the API - large payloads like /session/load histories
+    are rendered by the active backend instead of the stdlib encoder."""
+    def render(self, content: Any) -> bytes:
+        return _dumps(content)
+
+
+# ------------------------------------------------------------------ files
+_file_cache: Dict[str, Tuple[Tuple[int, int], Any]] = {}  # path -> ((mtime_ns, size), parsed)
+
+
+def _copy(value):
+    """Deep copy of a JSON tree (as a re-read would return it) - callers may edit nested lists/dicts,
+    e.g. a conversation tail that is the live history list, without touching the cached file.
+    About as fast as an orjson parse and ~3x faster than copy.deepcopy."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy(v) for v in value]
+    return value
+
+
+def read_json_file(path: Path, default: Any = None) -> Any:
+    """Parse a JSON file, reusing the previous parse while the file is unchanged on disk."""
+    key = str(path)
+    try:
+        st = os.stat(key)
+    except FileNotFoundError:
+        _file_cache.pop(key, None)
+        return default
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _file_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return _copy(cached[1])
+    with open(key, "rb") as f:
+        value = _loads(f.read())
+    _file_cache[key] = (stamp, value)
+    return _copy(value)
+
+
+def write_json_file(path: Path, obj: Any, pretty: bool = True) -> int:
+    """Write obj as UTF-8 JSON (indented by default so session files stay readable). Returns bytes written."""
+    data = _dumps_pretty(obj) if pretty else _dumps(obj)
+    key = str(path)
+    with open(key, "wb") as f:
+        f.write(data)
+    st = os.stat(key)
+    # We just wrote it - the next read can skip the parse
+    _file_cache[key] = ((st.st_mtime_ns, st.st_size), _copy(obj))
+    return len(data)
+
+
+set_backend(os.getenv("JOBANDIT_SERIALIZER") or AVAILABLE_BACKENDS[0])
@@ -0,0 +1,89 @@
+# backend/stream_framing.py
+"""
+Flush policy for streamed answers.
+
+Upstream deltas are often 1-2 characters each; sending one SSE frame per delta makes the
+renderer parse JSON and repaint the DOM hundreds of times a second. coalesce_chunks() merges
+consecutive {"chunk"} events into one frame per time window (or sooner once a byte threshold
+is reached). The first chunk is always flushed immediately so time-to-first-token is unchanged,
+and every other event (heartbeat, done, error, cancelled) flushes pending text before passing through.
+"""
+import asyncio
+
+DEFAULT_FLUSH_INTERVAL_MS = 40   # ~25 frames/sec - smooth to the eye, far fewer repaints
+DEFAULT_FLUSH_BYTES = 512        # Flush early if a burst of deltas piles up this much text
+
+
+_FLUSH = object()   # Timer sentinel: the flush window elapsed
+_END = object()     # Upstream finished
+
+
+async def _read_into(events, queue: asyncio.Queue):
+    try:
+        async for event in events:
+            queue.put_nowait(event)
+        queue.put_nowait(_END)
+    except Exception as e:
+        queue.put_nowait(e)
+
+
+async def coalesce_chunks(events, interval_ms: float = DEFAULT_FLUSH_INTERVAL_MS, max_bytes: int = DEFAULT_FLUSH_BYTES):
+    """Wrap an async iterator of event dicts and merge consecutive chunk events.
+    interval_ms <= 0 disables coalescing (one frame per upstream delta)."""
+    if interval_ms <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    interval = interval_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue()
+    # One reader task + one timer per frame (not per delta) keeps the per-delta cost to a queue hop
+    reader = asyncio.ensure_future(_read_into(events, queue))
+    buffer = []
+    buffered_bytes = 0
+    timer = None
+    first_chunk_sent = False
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _FLUSH:
+                timer = None
+                if buffer:
+                    yield {'chunk': "".join(buffer)}
+                    buffer, buffered_bytes = [], 0
+                continue
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            chunk = item.get('chunk') if len(item) == 1 else None
+            if chunk is None:
+                if buffer:
+                    yield {'chunk': "".join(buffer)}
+                    buffer, buffered_bytes = [], 0
+                yield item
+                continue
+
+            if not first_chunk_sent:
+                first_chunk_sent = True
+                yield item  # First token goes out immediately - keeps TTFT low
+                continue
+
+            buffer.append(chunk)
+            buffered_bytes += len(chunk)
+            if buffered_bytes >= max_bytes:
+                yield {'chunk': "".join(buffer)}
+                buffer, buffered_bytes = [], 0
+            elif timer is None:
+                timer = loop.call_later(interval, queue.put_nowait, _FLUSH)
+
+        if buffer:
+            yield {'chunk': "".join(buffer)}
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not reader.done():
+            reader.cancel()  # Propagates cancellation into the upstream generator
@@ -0,0 +1,60 @@
+"""
+Checks for the repeated-question answer cache in answer_cache.py
+Run: python -m pytest test_answer_cache.py
+"""
+import answer_cache
+from answer_cache import AnswerCache, normalize_transcript, refers_back
+
+QUESTION = "What is the difference between a process and a thread?"
+
+
+def test_normalize_drops_filler_and_punctuation():
+    assert normalize_transcript("Um, so what is the difference between a PROCESS and a thread??") == \
+        normalize_transcript(QUESTION)
+    assert normalize_transcript("C++ or C#?") == "c++ or c#"
+
+
+def test_exact_hit_is_keyed_on_context_and_model():
+    cache = AnswerCache()
+    cache.put(QUESTION, "ctx-a", "gpt-4o", "Threads share memory.", output_tokens=3)
+    hit = cache.get("um, " + QUESTION.lower(), "ctx-a", "gpt-4o")
+    assert hit["answer"] == "Threads share memory." and hit["match"] == "exact" and hit["output_tokens"] == 3
+    assert cache.get(QUESTION, "ctx-b", "gpt-4o") is None        # Another session / resume
+    assert cache.get(QUESTION, "ctx-a", "gpt-4o-mini") is None   # Another model
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_near_duplicate_hit():
+    cache = AnswerCache()
+    cache.put(QUESTION, "ctx", "m", "Threads share memory.")
+    hit = cache.get("What is the difference between a process and a threat", "ctx", "m")  # Misheard
+    assert hit is not None and hit["match"] == "near" and hit["similarity"] >= cache.near_dup_threshold
+    assert cache.get("How do you reverse a linked list in place?", "ctx", "m") is None
+
+
+def test_short_transcripts_are_never_cached():
+    cache = AnswerCache()
+    cache.put("why?", "ctx", "m", "Because.")
+    assert cache.get("why?", "ctx", "m") is None and cache.stats()["entries"] == 0
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    cache.put("how does garbage collection work", "ctx", "m", "a1")
+    cache.put("how does a hash map work", "ctx", "m", "a2")
+    assert cache.get("how does garbage collection work", "ctx", "m")["answer"] == "a1"  # Now most recent
+    cache.put("how does tcp congestion control work", "ctx", "m", "a3")
+    assert cache.get("how does a hash map work", "ctx", "m") is None
+    assert cache.get("how does garbage collection work", "ctx", "m") is not None
+    now[0] += 61
+    assert cache.get("how does garbage collection work", "ctx", "m") is None
+
+
+def test_refers_back():
+    for question in ("explain that again", "Can you elaborate on the approach?", "What did you just say about it",
+                     "Expand on the previous answer", "you mentioned Kafka - why?"):
+        assert refers_back(question), question
+    for question in (QUESTION, "Implement an LRU cache", "Tell me about yourself", ""):
+        assert not refers_back(question), question
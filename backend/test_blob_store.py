@@ -0,0 +1,75 @@
+"""
+Checks for blob_store.py (content-addressed resume/JD text) and the resume extraction cache on top of it
+Run: python -m pytest test_blob_store.py
+"""
+import json
+
+from blob_store import REFS_FILE, BlobStore, text_hash
+from resume_extract import ResumeTextCache
+
+
+def test_put_is_content_addressed(tmp_path):
+    store = BlobStore(tmp_path)
+    sha = store.put("resume body")
+    assert sha == text_hash("resume body")
+    assert store.put("resume body") == sha
+    assert len(list(tmp_path.rglob("*.txt"))) == 1
+    assert BlobStore(tmp_path).get(sha) == "resume body"  # From disk, not memory
+
+
+def test_blob_deleted_when_last_owner_lets_go(tmp_path):
+    store = BlobStore(tmp_path)
+    sha = store.put("shared resume")
+    store.retain("profile", [sha])
+    store.retain("session:a", [sha, None])
+    assert store.refcount(sha) == 2
+    store.release("session:a")
+    assert store.refcount(sha) == 1 and store.get(sha) == "shared resume"
+    store.retain("profile", [])  # Owner moved on to other text
+    assert store.refcount(sha) == 0
+    assert store.get(sha) is None and not list(tmp_path.rglob("*.txt"))
+
+
+def test_retain_replaces_an_owners_references(tmp_path):
+    store = BlobStore(tmp_path)
+    old, new = store.put("v1"), store.put("v2")
+    store.retain("session:a", [old])
+    store.retain("session:a", [new])
+    assert store.refcount(old) == 0 and store.get(old) is None
+    assert store.refcount(new) == 1
+
+
+def test_externalize_and_resolve_round_trip(tmp_path):
+    store = BlobStore(tmp_path)
+    data = {"session_name": "a", "resume_text": "R" * 1000, "job_description": ""}
+    stored = store.externalize(data, "session:a")
+    assert "resume_text" not in stored and "job_description" not in stored
+    assert stored["resume_text_sha256"] == text_hash("R" * 1000)
+    assert stored["job_description_sha256"] is None
+    assert store.resolve(stored) == {**data, "resume_text_sha256": stored["resume_text_sha256"],
+                                     "job_description_sha256": None}
+    # Inline text (older files) wins over a reference
+    assert store.resolve({"resume_text": "inline", "resume_text_sha256": stored["resume_text_sha256"]}) == \
+        {"resume_text": "inline"}
+
+
+def test_deferred_refs_write_once(tmp_path):
+    store = BlobStore(tmp_path)
+    with store.deferred_refs():
+        for i in range(3):
+            store.retain(f"session:{i}", [store.put(f"text {i}")])
+        assert not (tmp_path / REFS_FILE).exists()
+    assert len(json.loads((tmp_path / REFS_FILE).read_text())) == 3
+
+
+def test_resume_cache_keeps_text_in_blob_store(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    cache = ResumeTextCache(tmp_path / "cache", blob_store=store)
+    paragraphs = ["EXPERIENCE", "Line one\n\nwith a break", "SKILLS"]
+    entry = {"sha256": "f" * 64, "version": 1, "paragraphs": paragraphs, "text": "\n\n".join(paragraphs),
+             "sections": [], "chars": 0, "tokens": 9}
+    cache.put(entry)
+    on_disk = json.loads((tmp_path / "cache" / f"{'f' * 64}.json").read_text())
+    assert "text" not in on_disk and "paragraphs" not in on_disk
+    assert store.get(on_disk["text_sha256"]) == entry["text"]
+    assert ResumeTextCache(tmp_path / "cache", blob_store=store).get("f" * 64) == entry
@@ -0,0 +1,84 @@
+"""
+Checks for question classification and model routing in model_router.py
+Run: python -m pytest test_model_router.py
+"""
+from model_router import ModelRouter, classify_question
+
+QUALITY = {"cheap": 2, "mid": 3, "best": 4}
+MIN_QUALITY = {"behavioral": 2, "conceptual": 3, "coding": 4}
+PRICES = {"cheap": 1.0, "mid": 2.0, "best": 5.0}
+
+
+def price(prompt_tokens, output_tokens, model):
+    return (prompt_tokens + output_tokens) * PRICES[model] / 1e6
+
+
+def make_router(**priors):
+    return ModelRouter(QUALITY, MIN_QUALITY, {"cheap": 0.5, "mid": 0.8, "best": 1.0, **priors}, ttft_target=1.5)
+
+
+def test_categories():
+    assert classify_question("Why did you leave your last job?")[0] == "behavioral"
+    assert classify_question("Tell me about a time you disagreed with your manager")[0] == "behavioral"
+    assert classify_question("Implement an LRU cache")[0] == "coding"
+    assert classify_question("What is the difference between a process and a thread?")[0] == "conceptual"
+    assert classify_question("def f(x): return x")[0] == "coding"
+    assert classify_question("Solve this one", has_screenshot=True)[0] == "coding"
+
+
+def test_follow_up_needs_a_previous_question():
+    assert classify_question("explain that again", "Implement an LRU cache")[0] == "follow_up"
+    assert classify_question("can you elaborate", "What is a mutex?")[0] == "follow_up"
+    assert classify_question("explain that again")[0] != "follow_up"
+    # A behavioral question is never read as a follow-up of the last one
+    assert classify_question("why did you leave your last job?", "What is a mutex?")[0] == "behavioral"
+
+
+def test_route_picks_cheapest_model_that_meets_the_floor_and_target():
+    router = make_router()
+    assert router.route("Why did you leave your last job?", 1000, price)["model"] == "cheap"
+    assert router.route("What is the difference between TCP and UDP?", 1000, price)["model"] == "mid"
+    assert router.route("Implement an LRU cache", 1000, price)["model"] == "best"
+
+
+def test_follow_up_inherits_the_tier_of_its_question():
+    decision = make_router().route("explain that again", 1000, price, previous_question="Implement an LRU cache")
+    assert decision["category"] == "follow_up"
+    assert decision["quality_floor"] == 4 and decision["model"] == "best"
+
+
+def test_slow_models_relax_then_fall_back_to_the_fastest():
+    decision = make_router(mid=3.0).route("What is a mutex?", 1000, price)
+    assert decision["model"] == "best"  # best is over the floor and fast enough
+
+    decision = make_router(mid=3.0, best=3.0).route("What is a mutex?", 1000, price)
+    assert decision["model"] == "cheap" and decision["relaxed"]  # one tier lower
+
+    decision = make_router(cheap=2.0, mid=3.0, best=2.5).route("Implement an LRU cache", 1000, price)
+    assert decision["model"] == "best" and not decision["met_target"]
+
+
+def test_recorded_latency_replaces_the_prior():
+    router = make_router()
+    for _ in range(router.min_samples):
+        router.record("cheap", 4.0, 5.0, 0.001, 200)
+    assert router.estimate("cheap", 1000, price)["ttft"] == 4.0
+    assert router.route("Why did you leave your last job?", 1000, price)["model"] == "mid"
+    assert not router.record("unknown-model", 1.0)
+
+
+def test_load_history_skips_cached_and_partial_answers():
+    router = make_router()
+    used = router.load_history([
+        {"model": "cheap", "response_time": 0.4, "input_tokens": 10},
+        {"model": "cheap", "response_time": 0.4},                                      # Replayed from the cache
+        {"model": "cheap", "response_time": 0.4, "input_tokens": 10, "cancelled": True},
+        {"model": "cheap", "response_time": 0.4, "input_tokens": 10, "had_screenshot": True},
+    ])
+    assert used == 1
+
+
+def test_allowed_filters_out_models():
+    decision = make_router().route("Implement an LRU cache", 1000, price, allowed=lambda m: m != "best")
+    assert decision["model"] == "mid"
+    assert make_router().route("Implement an LRU cache", 1000, price, allowed=lambda m: False)["model"] is None
@@ -0,0 +1,49 @@
+"""
+Checks for bulk resume ingestion in process_resume.py
+Run: python -m pytest test_process_resume.py
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from blob_store import BlobStore
+from process_resume import _is_jd, bulk_ingest
+
+
+def test_jd_words_are_job_descriptions():
+    for name in ("acme_jd.docx", "JD.docx", "Job Description.txt", "job-description.md", "backend_jobs.txt",
+                 "JobDescription.docx", "senior.job.md"):
+        assert _is_jd(Path(name)), name
+
+
+def test_names_starting_with_jd_or_job_are_resumes():
+    for name in ("jdoe_resume.docx", "Jobson.docx", "jobin_resume.docx", "resume.docx", "majd_cv.docx"):
+        assert not _is_jd(Path(name)), name
+
+
+def test_only_document_suffixes_count():
+    assert not _is_jd(Path("acme_jd.pdf"))
+    assert not _is_jd(Path("job.png"))
+
+
+def test_bulk_ingest_writes_blob_references(tmp_path):
+    docx = pytest.importorskip("docx")
+
+    library = tmp_path / "library" / "acme"
+    library.mkdir(parents=True)
+    for name in ("jdoe_resume", "alice"):
+        doc = docx.Document()
+        doc.add_paragraph("EXPERIENCE")
+        doc.add_paragraph(f"{name} shipped things")
+        doc.save(library / f"{name}.docx")
+    (library / "acme_jd.txt").write_text("Backend engineer wanted")
+
+    stats = bulk_ingest(tmp_path / "library", tmp_path / "sessions", tmp_path / "resume_cache", workers=1)
+    assert stats["sessions"] == 2  # jdoe_resume is a resume, not the JD
+    blobs = BlobStore(tmp_path / "blobs")
+    for name in ("jdoe_resume", "alice"):
+        data = json.loads((tmp_path / "sessions" / name / "session.json").read_text())
+        assert "resume_text" not in data and "job_description" not in data
+        assert data["job_description_preview"] == "Backend engineer wanted"
+        assert blobs.resolve(data)["resume_text"].endswith(f"{name} shipped things")
@@ -0,0 +1,28 @@
+"""
+Checks for the mtime-cached JSON file helpers in serialization.py
+Run: python -m pytest test_serialization.py
+"""
+from serialization import read_json_file, write_json_file
+
+
+def test_nested_edits_do_not_leak_into_the_cache(tmp_path):
+    path = tmp_path / "context.json"
+    history = [{"role": "user", "content": "q1"}]
+    write_json_file(path, {"tail": history})
+    history.append({"role": "assistant", "content": "a1"})  # Live list keeps changing after the write
+    assert read_json_file(path) == {"tail": [{"role": "user", "content": "q1"}]}
+
+    loaded = read_json_file(path)
+    loaded["tail"][0]["content"] = "edited"
+    loaded["tail"].clear()
+    assert read_json_file(path) == {"tail": [{"role": "user", "content": "q1"}]}
+
+
+def test_cached_value_matches_a_fresh_parse(tmp_path):
+    path = tmp_path / "session.json"
+    write_json_file(path, {"box": (1, 2, 3, 4), "n": None})
+    assert read_json_file(path) == {"box": [1, 2, 3, 4], "n": None}
+
+
+def test_missing_file_returns_default(tmp_path):
+    assert read_json_file(tmp_path / "nope.json", []) == []
@@ -0,0 +1,160 @@
+"""
+Checks for retries, hedging and the circuit breaker in upstream_resilience.py
+Run: python -m pytest test_upstream_resilience.py
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from upstream_resilience import ModelHealth, StreamPolicy, StreamTimeout, guarded_stream, is_retryable
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, texts, first_delay=0.0):
+        self.texts = texts
+        self.first_delay = first_delay
+        self.response = SimpleNamespace(headers={})
+        self.closed = False
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.first_delay)
+        for text in self.texts:
+            yield chunk(text)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeTicket:
+    wait_ms = 0.0
+
+    def release(self, headers=None):
+        pass
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def run(open_attempt, model="primary", health=None, policy=None, **kwargs):
+    """(text streamed to out, error put on out or None, report)"""
+    async def go():
+        out = asyncio.Queue()
+        report = {}
+        await guarded_stream(open_attempt, model, out, health or ModelHealth(), policy or StreamPolicy(backoff=0.001),
+                             report, **kwargs)
+        text, error = "", None
+        while (item := out.get_nowait()) is not None:
+            if isinstance(item, Exception):
+                error = item
+            else:
+                text += item.choices[0].delta.content
+        return text, error, report
+
+    return asyncio.run(go())
+
+
+def test_retryable_errors():
+    assert is_retryable(StreamTimeout()) and is_retryable(ConnectionError())
+    assert is_retryable(StatusError(503)) and is_retryable(StatusError(429))
+    assert not is_retryable(StatusError(400)) and not is_retryable(ValueError())
+
+
+def test_transient_failure_is_retried():
+    calls = []
+
+    async def open_attempt(model, connect_timeout):
+        calls.append(model)
+        if len(calls) == 1:
+            raise ConnectionError("reset by peer")
+        return FakeStream(["Hello", " world"]), FakeTicket()
+
+    health = ModelHealth()
+    text, error, report = run(open_attempt, health=health)
+    assert text == "Hello world" and error is None
+    assert report["retries"] == 1 and [a["outcome"] for a in report["attempts"]] == ["error", "ok"]
+    assert health.snapshot()["primary"]["failures"] == 1 and health.breaker("primary") == "closed"
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    async def open_attempt(model, connect_timeout):
+        calls.append(model)
+        raise StatusError(400)
+
+    health = ModelHealth()
+    text, error, report = run(open_attempt, health=health)
+    assert len(calls) == 1 and isinstance(error, StatusError) and report["retries"] == 0
+    assert "primary" not in health.snapshot()  # Our request was wrong, the model is fine
+
+
+def test_first_token_timeout():
+    async def open_attempt(model, connect_timeout):
+        return FakeStream(["late"], first_delay=5), FakeTicket()
+
+    text, error, report = run(open_attempt, policy=StreamPolicy(first_token_timeout=0.05, max_retries=0))
+    assert text == "" and isinstance(error, StreamTimeout)
+    assert report["attempts"][0]["outcome"] == "timeout" and report["attempts"][0]["opened"]
+
+
+def test_hedge_wins_when_the_primary_is_slow():
+    async def open_attempt(model, connect_timeout):
+        if model == "primary":
+            return FakeStream(["slow"], first_delay=5), FakeTicket()
+        return FakeStream(["fast"]), FakeTicket()
+
+    health = ModelHealth()
+    for _ in range(8):
+        health.record_success("primary", 0.01)
+    policy = StreamPolicy(hedge=True, hedge_min_samples=8, hedge_min_delay=0.02)
+    text, error, report = run(open_attempt, health=health, policy=policy, hedge_model="hedge")
+    assert text == "fast" and error is None
+    assert report["hedged"] and report["hedge_won"] and report["model"] == "hedge"
+    outcomes = {a["role"]: a for a in report["attempts"]}
+    assert outcomes["primary"]["outcome"] == "lost" and outcomes["primary"]["opened"]  # Billed, not answered
+    assert outcomes["hedge"]["answered"] and not outcomes["primary"]["answered"]
+
+
+def test_no_hedge_without_enough_samples():
+    async def open_attempt(model, connect_timeout):
+        return FakeStream(["ok"], first_delay=0.05), FakeTicket()
+
+    policy = StreamPolicy(hedge=True, hedge_min_samples=8, hedge_min_delay=0.01)
+    text, _, report = run(open_attempt, policy=policy, hedge_model="hedge")
+    assert text == "ok" and not report["hedged"]
+
+
+def test_breaker_opens_half_opens_and_closes():
+    health = ModelHealth(failure_threshold=2, cooldown=0.05)
+    health.record_failure("m", ConnectionError())
+    assert health.allow("m")
+    health.record_failure("m", ConnectionError())
+    assert health.breaker("m") == "open" and not health.allow("m")
+    time.sleep(0.06)
+    assert health.breaker("m") == "half_open" and health.allow("m")
+    health.record_failure("m", ConnectionError())  # Failed probe reopens it
+    assert health.breaker("m") == "open"
+    time.sleep(0.06)
+    health.record_success("m", 0.5)
+    assert health.breaker("m") == "closed" and health.median_ttft("m") == 0.5
+
+
+def test_open_breaker_routes_to_a_fallback():
+    calls = []
+
+    async def open_attempt(model, connect_timeout):
+        calls.append(model)
+        return FakeStream(["from " + model]), FakeTicket()
+
+    health = ModelHealth(failure_threshold=1)
+    health.record_failure("primary", StatusError(503))
+    text, _, report = run(open_attempt, health=health, fallbacks=("primary", "backup"))
+    assert calls == ["backup"] and text == "from backup"
+    assert report["fallback_from"] == "primary" and report["model"] == "backup"
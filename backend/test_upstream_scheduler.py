@@ -0,0 +1,118 @@
+"""
+Checks for per-key admission control in upstream_scheduler.py
+Run: python -m pytest test_upstream_scheduler.py
+"""
+import asyncio
+
+import pytest
+
+from upstream_scheduler import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_WARMUP, UpstreamScheduler,
+                                is_rate_limited, parse_reset, retry_after)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message="Rate limit reached", headers=None):
+        super().__init__(message)
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def test_parse_reset_and_retry_after():
+    assert parse_reset("20ms") == pytest.approx(0.02)
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("1h2m3.5s") == pytest.approx(3723.5)
+    assert parse_reset("2.5") == 2.5 and parse_reset("soon") is None and parse_reset(None) is None
+    assert retry_after({"retry-after-ms": "150"}) == pytest.approx(0.15)
+    assert retry_after({"retry-after": "2"}) == 2.0
+    assert retry_after({"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "3s"}) == 3.0
+    assert retry_after({}) is None
+
+
+def test_quota_errors_are_not_rate_limits():
+    assert is_rate_limited(RateLimitError())
+    assert not is_rate_limited(RateLimitError("insufficient_quota: check your plan"))
+    assert not is_rate_limited(ValueError("boom"))
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def run():
+        scheduler = UpstreamScheduler(max_concurrent=1)
+        first = await scheduler.acquire("key")
+        order = []
+
+        async def wait(name, priority):
+            ticket = await scheduler.acquire("key", priority)
+            order.append(name)
+            ticket.release()
+
+        tasks = [asyncio.create_task(wait(name, priority)) for name, priority in (
+            ("summary", PRIORITY_BACKGROUND), ("warmup", PRIORITY_WARMUP),
+            ("answer-1", PRIORITY_INTERACTIVE), ("answer-2", PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert order == [] and scheduler.stats()["keys"]["key..."]["queued"] == 4
+        first.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["answer-1", "answer-2", "warmup", "summary"]
+
+
+def test_concurrency_is_per_key():
+    async def run():
+        scheduler = UpstreamScheduler(max_concurrent=1)
+        await scheduler.acquire("key-a")
+        return await asyncio.wait_for(scheduler.acquire("key-b"), 1)
+
+    assert asyncio.run(run()).priority == PRIORITY_INTERACTIVE
+
+
+def test_429_pauses_the_key_and_requeues_the_call():
+    calls = []
+
+    async def call():
+        calls.append(asyncio.get_running_loop().time())
+        if len(calls) == 1:
+            raise RateLimitError(headers={"retry-after-ms": "50"})
+        return "answer"
+
+    async def run():
+        scheduler = UpstreamScheduler(max_concurrent=1)
+        result, ticket = await scheduler.submit("key", call)
+        return result, ticket, scheduler.stats()["keys"]["key..."]
+
+    result, ticket, stats = asyncio.run(run())
+    assert result == "answer" and ticket.released
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.045
+    assert stats["throttled"] == 1 and stats["in_flight"] == 0
+
+
+def test_429_gives_up_after_max_retries_and_quota_is_not_retried():
+    async def run(error, max_retries):
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise error
+
+        scheduler = UpstreamScheduler(max_concurrent=1, max_retries=max_retries)
+        with pytest.raises(RateLimitError):
+            await scheduler.submit("key", call)
+        assert scheduler.stats()["keys"]["key..."]["in_flight"] == 0
+        return len(calls)
+
+    assert asyncio.run(run(RateLimitError(headers={"retry-after-ms": "1"}), 2)) == 3
+    assert asyncio.run(run(RateLimitError("insufficient_quota"), 2)) == 1
+
+
+def test_token_budget_from_headers_delays_the_next_call():
+    async def run():
+        scheduler = UpstreamScheduler(max_concurrent=4)
+        ticket = await scheduler.acquire("key", tokens=100)
+        ticket.release({"x-ratelimit-limit-tokens": "60000", "x-ratelimit-remaining-tokens": "0"})
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        await scheduler.acquire("key", tokens=50)  # 50 tokens refill in 50 ms at 60000/min
+        return loop.time() - t0
+
+    assert asyncio.run(run()) >= 0.04
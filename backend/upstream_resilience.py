@@ -0,0 +1,343 @@
+# backend/upstream_resilience.py
+"""
+Timeouts, retries, hedging and circuit breaking for streamed completions.
+
+guarded_stream() runs one answer's upstream stream and feeds its chunks into a queue, the same
+way answer_events' pump task did, with:
+  - a connect timeout (create() until the response starts), a first-token timeout and an
+    inter-token timeout - a stalled stream fails instead of hanging until the client gives up
+  - retries with full-jitter backoff on transient failures (timeouts, connection errors, 5xx,
+    429s the scheduler gave up on), only while nothing has been streamed yet - once tokens
+    reached the client a retry would repeat them
+  - an optional hedge: if no token arrived within the model's recorded TTFT percentile, a second
+    attempt starts (same model or a faster one); whichever streams first wins, the other is
+    cancelled
+  - ModelHealth: per-model TTFT samples (for the hedge threshold) and a circuit breaker that
+    opens after consecutive failures, so a degraded model is routed around until its cooldown
+    ends and a probe succeeds
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TTFT_SAMPLES = 100  # Recent time-to-first-token samples kept per model
+
+
+class StreamTimeout(Exception):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (StreamTimeout, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS and "insufficient_quota" not in str(error)
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")  # openai errors without a status
+
+
+def jittered_backoff(attempt: int, base: float, cap: float = 8.0) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def has_content(chunk: Any) -> bool:
+    choices = getattr(chunk, "choices", None)
+    return bool(choices and getattr(choices[0].delta, "content", None))
+
+
+class StreamPolicy:
+    def __init__(self, connect_timeout: float = 10.0, first_token_timeout: float = 30.0,
+                 inter_token_timeout: float = 20.0, max_retries: int = 2, backoff: float = 0.5,
+                 hedge: bool = False, hedge_percentile: float = 0.95, hedge_min_samples: int = 8,
+                 hedge_min_delay: float = 0.5):
+        self.connect_timeout = connect_timeout
+        self.first_token_timeout = first_token_timeout
+        self.inter_token_timeout = inter_token_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+
+class _ModelState:
+    def __init__(self):
+        self.ttft: Deque[float] = deque(maxlen=TTFT_SAMPLES)
+        self.failures = 0            # Consecutive
+        self.opened_at: Optional[float] = None
+        self.successes = 0
+        self.total_failures = 0
+        self.last_error = ""
+
+
+class ModelHealth:
+    """Per-model TTFT history and circuit breaker (closed -> open after failure_threshold
+    consecutive failures -> half-open after cooldown: the next success closes it, a failure reopens it)"""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._models: Dict[str, _ModelState] = {}
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState()
+        return state
+
+    def breaker(self, model: str) -> str:
+        state = self._models.get(model)
+        if state is None or state.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - state.opened_at >= self.cooldown else "open"
+
+    def allow(self, model: str) -> bool:
+        return self.breaker(model) != "open"
+
+    def record_success(self, model: str, ttft: Optional[float] = None):
+        state = self._state(model)
+        if ttft is not None:
+            state.ttft.append(ttft)
+        state.failures = 0
+        state.opened_at = None
+        state.successes += 1
+
+    def record_failure(self, model: str, error: BaseException):
+        state = self._state(model)
+        state.failures += 1
+        state.total_failures += 1
+        state.last_error = f"{type(error).__name__}: {error}"[:200]
+        if state.failures >= self.failure_threshold:
+            if state.opened_at is None or self.breaker(model) == "half_open":
+                print(f"[UPSTREAM] Circuit open for {model} after {state.failures} consecutive failures ({state.last_error})")
+            state.opened_at = time.monotonic()
+
+    def ttft_percentile(self, model: str, p: float) -> Tuple[Optional[float], int]:
+        """(TTFT at percentile p or None, sample count)"""
+        samples = sorted(self._state(model).ttft)
+        if not samples:
+            return None, 0
+        return samples[min(len(samples) - 1, int(p * len(samples)))], len(samples)
+
+    def median_ttft(self, model: str) -> Optional[float]:
+        return self.ttft_percentile(model, 0.5)[0]
+
+    def snapshot(self) -> Dict[str, Any]:
+        out = {}
+        for model, state in self._models.items():
+            p50, n = self.ttft_percentile(model, 0.5)
+            p95, _ = self.ttft_percentile(model, 0.95)
+            out[model] = {"breaker": self.breaker(model), "consecutive_failures": state.failures,
+                          "successes": state.successes, "failures": state.total_failures,
+                          "last_error": state.last_error, "ttft_samples": n,
+                          "ttft_p50": round(p50, 3) if p50 is not None else None,
+                          "ttft_p95": round(p95, 3) if p95 is not None else None}
+        return out
+
+
+OPENED = object()  # Attempt marker: slot granted and the response started
+
+
+class _Attempt:
+    """One upstream stream, pushing (attempt, OPENED | chunk | Exception | None) into the shared queue"""
+
+    def __init__(self, model: str, label: str, open_attempt, shared: asyncio.Queue, connect_timeout: float):
+        self.model = model
+        self.label = label
+        self.started = time.monotonic()
+        self.active_since: Optional[float] = None  # Slot granted (time queued in the scheduler doesn't count)
+        self.wait_ms = 0.0
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.answered = False  # Its tokens went to the client
+        self.task = asyncio.create_task(self._run(open_attempt, shared, connect_timeout))
+
+    async def _run(self, open_attempt, shared: asyncio.Queue, connect_timeout: float):
+        stream = ticket = None
+        try:
+            stream, ticket = await open_attempt(self.model, connect_timeout)
+            self.wait_ms = ticket.wait_ms
+            self.active_since = self.started + ticket.wait_ms / 1000
+            shared.put_nowait((self, OPENED))
+            async for chunk in stream:
+                shared.put_nowait((self, chunk))
+            shared.put_nowait((self, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            shared.put_nowait((self, e))
+        finally:
+            if stream is not None:
+                try:
+                    await stream.close()  # Frees the upstream connection immediately
+                except Exception:
+                    pass
+            if ticket is not None:
+                ticket.release(getattr(getattr(stream, "response", None), "headers", None))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - (self.active_since or self.started)
+
+    def cancel(self):
+        self.task.cancel()
+
+    def describe(self, outcome: str) -> Dict[str, Any]:
+        """opened: the request reached the provider, so its prompt is billed whatever the outcome (an attempt
+        still queued for a slot cost nothing). answered: the attempt whose tokens went to the client."""
+        return {"model": self.model, "role": self.label, "outcome": outcome, "opened": self.active_since is not None,
+                "answered": self.answered,
+                "ms": round(self.elapsed() * 1000), "queue_wait_ms": round(self.wait_ms, 1)}
+
+
+async def guarded_stream(open_attempt: Callable[[str, float], Awaitable[Tuple[Any, Any]]], model: str,
+                         out: asyncio.Queue, health: ModelHealth, policy: StreamPolicy, report: Dict[str, Any],
+                         fallbacks: Tuple[str, ...] = (), hedge_model: Optional[str] = None, log_tag: str = "STREAM"):
+    """Stream model's answer into out (chunks, then an Exception on failure, then None).
+    open_attempt(model, connect_timeout) -> (stream, scheduler ticket), with connect_timeout applied
+    to create() only. report is filled in place: model (the one that answered), ttft, attempts,
+    retries, hedged, hedge_won, fallback_from, queue_wait_ms."""
+    shared: asyncio.Queue = asyncio.Queue()
+    attempts: List[_Attempt] = []
+    report.update({"model": model, "ttft": None, "attempts": [], "retries": 0, "hedged": False,
+                   "hedge_won": None, "fallback_from": None, "queue_wait_ms": 0.0})
+
+    def pick(preferred: str) -> str:
+        if health.allow(preferred):
+            return preferred
+        for candidate in fallbacks:
+            if candidate != preferred and health.allow(candidate):
+                print(f"[{log_tag}] Circuit open for {preferred} - routing to {candidate}")
+                report["fallback_from"] = preferred
+                return candidate
+        return preferred  # Everything is degraded: try anyway
+
+    def fail(attempt: _Attempt, error: BaseException, outcome: str):
+        attempt.finished = True
+        attempt.error = error
+        report["attempts"].append(attempt.describe(outcome))
+        if is_retryable(error):
+            health.record_failure(attempt.model, error)
+
+    def hedge_delay(attempt: _Attempt) -> Optional[float]:
+        if not (policy.hedge and hedge_model) or report["hedged"]:
+            return None
+        threshold, samples = health.ttft_percentile(attempt.model, policy.hedge_percentile)
+        if threshold is None or samples < policy.hedge_min_samples:
+            return None
+        return max(threshold, policy.hedge_min_delay)
+
+    last_error: Optional[BaseException] = None
+    try:
+        for retry in range(policy.max_retries + 1):
+            if retry:
+                delay = jittered_backoff(retry - 1, policy.backoff)
+                report["retries"] = retry
+                print(f"[{log_tag}] Retrying in {delay:.2f}s ({retry}/{policy.max_retries}) after: {last_error}")
+                await asyncio.sleep(delay)
+            primary = _Attempt(pick(model), "primary", open_attempt, shared, policy.connect_timeout)
+            attempts.append(primary)
+            round_attempts = [primary]
+            buffered: Dict[_Attempt, list] = {primary: []}
+            hedge_at: Optional[float] = None
+
+            # Until one attempt produces a token: buffer what arrives, hedge, time out.
+            # Deadlines run from when an attempt got its slot (create() has its own connect timeout).
+            winner: Optional[_Attempt] = None
+            while winner is None and any(not a.finished for a in round_attempts):
+                now = time.monotonic()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    hedge = _Attempt(pick(hedge_model), "hedge", open_attempt, shared, policy.connect_timeout)
+                    report["hedged"] = True
+                    print(f"[{log_tag}] No token from {primary.model} after {primary.elapsed():.2f}s - hedging on {hedge.model}")
+                    attempts.append(hedge)
+                    round_attempts.append(hedge)
+                    buffered[hedge] = []
+                    continue
+                deadlines = [a.active_since + policy.first_token_timeout for a in round_attempts
+                             if not a.finished and a.active_since is not None]
+                first_deadline = max(deadlines) if deadlines else None
+                if first_deadline is not None and now >= first_deadline:
+                    for a in round_attempts:
+                        if not a.finished:
+                            a.cancel()
+                            fail(a, StreamTimeout(f"{a.model}: no token within {policy.first_token_timeout:g}s"), "timeout")
+                    break
+                wake = [t for t in (first_deadline, hedge_at) if t is not None]
+                try:
+                    attempt, item = await asyncio.wait_for(shared.get(), min(wake) - now if wake else None)
+                except asyncio.TimeoutError:
+                    continue
+                if attempt.finished or attempt not in buffered:
+                    continue  # Leftovers of a cancelled or earlier attempt
+                if item is OPENED:
+                    delay = hedge_delay(attempt) if attempt is primary else None
+                    if delay is not None:
+                        hedge_at = attempt.active_since + delay
+                    continue
+                if isinstance(item, Exception):
+                    fail(attempt, item, "error")
+                    continue
+                buffered[attempt].append(item)
+                if item is None or has_content(item):
+                    winner = attempt  # First token (or a stream that ended without any)
+
+            if winner is None:
+                errors = [a.error for a in round_attempts if a.error is not None]
+                last_error = errors[-1] if errors else StreamTimeout("no upstream response")
+                if not all(is_retryable(e) for e in errors):
+                    break
+                continue
+
+            # Winner streams to the client; the rest are cancelled
+            winner.answered = True
+            ttft = winner.elapsed()
+            for a in round_attempts:
+                if a is not winner and not a.finished:
+                    a.cancel()
+                    a.finished = True
+                    report["attempts"].append(a.describe("lost"))
+            report["model"] = winner.model
+            report["ttft"] = round(ttft, 3)
+            report["queue_wait_ms"] = round(sum(a.wait_ms for a in attempts), 1)
+            if report["hedged"]:
+                report["hedge_won"] = winner.label == "hedge"
+            pending = buffered[winner]
+            while True:
+                for item in pending:
+                    if item is None:
+                        winner.finished = True
+                        report["attempts"].append(winner.describe("ok"))
+                        health.record_success(winner.model, ttft)
+                        return
+                    out.put_nowait(item)
+                try:
+                    attempt, item = await asyncio.wait_for(shared.get(), policy.inter_token_timeout)
+                except asyncio.TimeoutError:
+                    winner.cancel()
+                    error = StreamTimeout(f"{winner.model}: stream stalled for {policy.inter_token_timeout:g}s")
+                    fail(winner, error, "stalled")
+                    out.put_nowait(error)
+                    return
+                if attempt is not winner:
+                    pending = []
+                    continue
+                if isinstance(item, Exception):
+                    fail(winner, item, "error")
+                    out.put_nowait(item)  # Tokens already reached the client - no retry
+                    return
+                pending = [item]
+
+        out.put_nowait(last_error or StreamTimeout("no upstream response"))
+    except asyncio.CancelledError:
+        pass  # cancel_request(): the reader sees None and checks why
+    finally:
+        for a in attempts:
+            if not a.task.done():
+                a.cancel()
+        out.put_nowait(None)
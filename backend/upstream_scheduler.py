@@ -0,0 +1,280 @@
+# backend/upstream_scheduler.py
+"""
+Per-API-key admission control for upstream (OpenAI) calls.
+
+Parallel answers, background summaries, warm-ups and key checks used to hit the provider all at
+once and come back as 429s. Every call now takes a slot from its key's scheduler first:
+  - at most max_concurrent calls per key are in flight
+  - requests- and tokens-per-minute budgets are tracked from the x-ratelimit-* response headers
+    (limit, remaining, reset) and refilled linearly between responses; until the first response
+    arrives only the concurrency limit applies
+  - waiters are served by priority (interactive answers before warm-ups before summaries), then
+    in arrival order
+  - a 429 pauses the key until the provider's retry-after / reset time and the call is queued
+    again instead of failing (insufficient_quota is not retried - waiting won't fix it)
+Queue wait times are kept per key and priority for stats() (GET /usage "upstream").
+"""
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_WARMUP = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_WARMUP: "warmup", PRIORITY_BACKGROUND: "background"}
+
+WAIT_SAMPLES = 256  # Recent queue waits kept per key for percentiles
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds from an x-ratelimit-reset-* value ("20ms", "1s", "6m0s", "1h2m3.5s")"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(n) * _DURATION_SECONDS[unit] for n, unit in parts)
+
+
+def response_headers(obj: Any):
+    """Rate limit headers of a raw response, a stream (.response) or an API error (.response)"""
+    headers = getattr(obj, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(obj, "response", None), "headers", None)
+    return headers
+
+
+def retry_after(headers) -> Optional[float]:
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers.get(name)) * scale
+        except (TypeError, ValueError):
+            pass
+    resets = [parse_reset(headers.get(f"x-ratelimit-reset-{kind}")) for kind in ("requests", "tokens")]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """429 worth waiting out (a quota error is a 429 too, but never clears by itself)"""
+    return getattr(error, "status_code", None) == 429 and "insufficient_quota" not in str(error)
+
+
+def mask_key(key: Optional[str]) -> str:
+    if not key:
+        return "(none)"
+    return f"{key[:3]}...{key[-4:]}" if len(key) > 12 else f"{key[:3]}..."
+
+
+class _Budget:
+    """One x-ratelimit dimension (requests or tokens): limit per minute and what is left of it"""
+
+    def __init__(self):
+        self.limit: Optional[float] = None
+        self.remaining: Optional[float] = None
+        self.updated = 0.0
+
+    def refill(self, now: float):
+        if self.limit is not None and self.remaining is not None:
+            self.remaining = min(self.limit, self.remaining + self.limit * (now - self.updated) / 60.0)
+        self.updated = now
+
+    def observe(self, limit: Optional[str], remaining: Optional[str], now: float):
+        try:
+            if limit is not None:
+                self.limit = float(limit)
+            if remaining is not None:
+                self.remaining = float(remaining)
+                self.updated = now
+        except ValueError:
+            pass
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until amount fits (0 = now). A request bigger than the whole limit waits for a full budget."""
+        if self.limit is None or self.remaining is None or self.limit <= 0:
+            return 0.0
+        need = min(amount, self.limit)
+        if self.remaining >= need:
+            return 0.0
+        return (need - self.remaining) * 60.0 / self.limit
+
+    def take(self, amount: float):
+        if self.remaining is not None:
+            self.remaining -= amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "remaining": None if self.remaining is None else int(self.remaining)}
+
+
+class Ticket:
+    """A granted slot. release() exactly once when the call (or its stream) is finished."""
+
+    def __init__(self, state: "_KeyState", priority: int, tokens: int, wait_ms: float):
+        self._state = state
+        self.priority = priority
+        self.tokens = tokens
+        self.wait_ms = wait_ms
+        self.released = False
+
+    def observe(self, headers):
+        self._state.observe(headers)
+
+    def release(self, headers=None):
+        if self.released:
+            return
+        self.released = True
+        if headers is not None:
+            self._state.observe(headers)
+        self._state.in_flight -= 1
+        self._state.pump()
+
+
+class _KeyState:
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.requests = _Budget()
+        self.tokens = _Budget()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.waiters: List[Tuple[int, int, int, asyncio.Future]] = []  # (priority, seq, tokens, future) heap
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.throttled = 0
+        self.waits: Deque[Tuple[int, float]] = deque(maxlen=WAIT_SAMPLES)  # (priority, ms)
+
+    def observe(self, headers):
+        if not headers:
+            return
+        now = time.monotonic()
+        self.requests.observe(headers.get("x-ratelimit-limit-requests"), headers.get("x-ratelimit-remaining-requests"), now)
+        self.tokens.observe(headers.get("x-ratelimit-limit-tokens"), headers.get("x-ratelimit-remaining-tokens"), now)
+        self.pump()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.throttled += 1
+        self.pump()
+
+    def _delay(self, tokens: int, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.paused_until - now, self.requests.delay_for(1), self.tokens.delay_for(tokens), 0.0)
+
+    def pump(self):
+        """Grant queued waiters in priority order while the budget allows; re-check on a timer when it doesn't"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.waiters:
+            priority, _, tokens, future = self.waiters[0]
+            if future.done():  # Waiter was cancelled (client went away)
+                heapq.heappop(self.waiters)
+                continue
+            if self.in_flight >= self.max_concurrent:
+                return  # A release() pumps again
+            delay = self._delay(tokens, time.monotonic())
+            if delay > 0:
+                self.timer = asyncio.get_running_loop().call_later(delay, self.pump)
+                return
+            heapq.heappop(self.waiters)
+            self.in_flight += 1
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.granted += 1
+            future.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(ms for _, ms in self.waits)
+        pct = lambda p: round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else 0.0
+        by_priority = {}
+        for priority, name in PRIORITY_NAMES.items():
+            samples = [ms for p, ms in self.waits if p == priority]
+            if samples:
+                by_priority[name] = {"count": len(samples), "avg_ms": round(sum(samples) / len(samples), 1),
+                                     "max_ms": round(max(samples), 1)}
+        now = time.monotonic()
+        return {
+            "in_flight": self.in_flight,
+            "queued": sum(1 for *_, f in self.waiters if not f.done()),
+            "granted": self.granted,
+            "throttled": self.throttled,
+            "paused_ms": round(max(self.paused_until - now, 0.0) * 1000),
+            "requests": self.requests.snapshot(),
+            "tokens": self.tokens.snapshot(),
+            "queue_wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": round(waits[-1], 1) if waits else 0.0,
+                              "samples": len(waits), "by_priority": by_priority},
+        }
+
+
+class UpstreamScheduler:
+    def __init__(self, max_concurrent: int = 4, max_retries: int = 4, default_backoff: float = 1.0):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.default_backoff = default_backoff
+        self._keys: Dict[str, _KeyState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, key: Optional[str]) -> _KeyState:
+        state = self._keys.get(key or "")
+        if state is None:
+            state = self._keys[key or ""] = _KeyState(self.max_concurrent)
+        return state
+
+    async def acquire(self, key: Optional[str], priority: int = PRIORITY_INTERACTIVE, tokens: int = 0) -> Ticket:
+        """Wait for a slot. Must be called on the event loop that runs the upstream calls."""
+        state = self._state(key)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(state.waiters, (priority, next(self._seq), max(int(tokens), 0), future))
+        t0 = time.perf_counter()
+        state.pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():  # Granted just as the caller went away
+                state.in_flight -= 1
+                state.pump()
+            raise
+        wait_ms = (time.perf_counter() - t0) * 1000
+        state.waits.append((priority, wait_ms))
+        return Ticket(state, priority, tokens, wait_ms)
+
+    async def submit(self, key: Optional[str], call: Callable[[], Awaitable[Any]], priority: int = PRIORITY_INTERACTIVE,
+                     tokens: int = 0, hold: bool = False, log_tag: str = "UPSTREAM") -> Tuple[Any, Ticket]:
+        """Run call() under a slot, re-queueing it after 429s. Returns (result, ticket).
+        hold=False releases the slot when call() returns; hold=True leaves that to the caller
+        (streams: release once the last chunk is read)."""
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            ticket = await self.acquire(key, priority, tokens)
+            waited += ticket.wait_ms
+            try:
+                result = await call()
+            except BaseException as e:
+                ticket.release(response_headers(e))
+                if isinstance(e, Exception) and is_rate_limited(e) and attempt < self.max_retries:
+                    backoff = retry_after(response_headers(e)) or self.default_backoff * (2 ** attempt)
+                    print(f"[{log_tag}] 429 from provider - key {mask_key(key)} paused {backoff:.1f}s, "
+                          f"re-queued (attempt {attempt + 2}/{self.max_retries + 1})")
+                    ticket._state.pause(backoff)
+                    continue
+                raise
+            ticket.wait_ms = waited
+            ticket.observe(response_headers(result))
+            if not hold:
+                ticket.release()
+            return result, ticket
+
+    def stats(self) -> Dict[str, Any]:
+        return {"max_concurrent": self.max_concurrent,
+                "keys": {mask_key(key): state.snapshot() for key, state in self._keys.items()}}
@@ -0,0 +1,164 @@
+# backend/voice_activity.py
+"""
+Voice-activity gate for the /realtime audio relay.
+
+The client streams PCM16 mono (24 kHz) continuously, silence included. VoiceActivityGate cuts it
+into 20 ms frames and classifies them with vectorized NumPy features:
+  - energy (dBFS) against an adaptive noise floor (falls fast, rises slowly)
+  - zero-crossing rate, so steady hiss/fan noise (many crossings) is not taken for voiced speech
+Speech starts after START_FRAMES speech frames (the PRE_ROLL before it is forwarded too, so word
+onsets are not clipped) and ends after HANGOVER of non-speech. Only speech is forwarded; at speech
+end the caller commits the upstream buffer - or clears it when the segment had too little voiced
+speech (a cough, a burst of noise) so nothing gets transcribed from it.
+Needs NumPy; without it every chunk is forwarded as before.
+"""
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+from lazy_imports import available, lazy_module
+
+np = lazy_module("numpy") if available("numpy") else None  # Imported on first use
+
+VAD_AVAILABLE = np is not None
+
+SAMPLE_RATE = 24000
+FRAME_MS = 20
+SNR_DB = 9.0               # Energy above the noise floor for a (voiced) speech frame
+LOUD_MARGIN_DB = 9.0       # ...this much more and the frame is speech whatever its zero-crossing rate
+ZCR_VOICED_MAX = 0.25      # Zero crossings per sample; voiced speech stays well below, hiss is ~0.5
+ABSOLUTE_MIN_DB = -55.0    # Quieter than this is always silence
+INITIAL_NOISE_DB = -60.0
+NOISE_FALL = 0.1           # Noise floor tracking per frame: quickly down to quieter frames...
+NOISE_RISE = 0.005         # ...slowly up to louder ones (a 4 s time constant)
+WARMUP_FRAMES = 10         # The first 200 ms set the floor directly
+START_FRAMES = 2           # Consecutive speech frames needed to open the gate
+PRE_ROLL_MS = 300
+HANGOVER_MS = 600
+MIN_SPEECH_MS = 200        # Segments with less voiced speech are discarded, not committed
+MAX_SEGMENT_MS = 30000     # Commit long monologues in pieces so transcripts keep flowing
+
+
+class VoiceActivityGate:
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS,
+                 hangover_ms: int = HANGOVER_MS, pre_roll_ms: int = PRE_ROLL_MS):
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, MIN_SPEECH_MS // frame_ms)
+        self.max_segment_frames = MAX_SEGMENT_MS // frame_ms
+        self.frame_ms = frame_ms
+        self._carry = b""  # Bytes of an incomplete frame from the previous chunk
+        self._pre_roll = deque(maxlen=max(START_FRAMES, pre_roll_ms // frame_ms))
+        self.noise_db = INITIAL_NOISE_DB
+        self.in_speech = False
+        self._run = 0              # Consecutive speech frames while the gate is closed
+        self._onset_voiced = 0     # ...of which were voiced
+        self._silent = 0           # Consecutive non-speech frames while it is open
+        self._segment_frames = 0   # Frames forwarded in the current segment
+        self._segment_voiced = 0   # ...of which were voiced speech
+        self.frames = 0
+        self.forwarded_frames = 0
+        self.segments = 0
+        self.commits = 0
+        self.discarded = 0
+
+    def features(self, frames) -> tuple:
+        """(energy dBFS, zero-crossing rate) per row of an (n, frame_samples) int16 array."""
+        x = frames.astype(np.float32)
+        energy_db = 10 * np.log10((x * x).mean(axis=1) / (32768.0 * 32768.0) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+        return energy_db, zcr
+
+    def _track_noise(self, energy_db: float):
+        if self.frames <= WARMUP_FRAMES:
+            self.noise_db = min(self.noise_db, energy_db) if self.frames > 1 else energy_db
+        else:
+            rate = NOISE_FALL if energy_db < self.noise_db else NOISE_RISE
+            self.noise_db += rate * (energy_db - self.noise_db)
+
+    def _end_segment(self, actions: list):
+        if self._segment_voiced >= self.min_speech_frames:
+            actions.append(("commit", None))
+            self.commits += 1
+        else:
+            actions.append(("clear", None))
+            self.discarded += 1
+        self._segment_frames = self._segment_voiced = 0
+
+    def process(self, pcm: bytes) -> List[Tuple[str, Any]]:
+        """Feed a chunk of PCM16 mono audio. Returns the actions for the upstream buffer in order:
+        ("audio", bytes) to append, ("commit", None) at speech end, ("clear", None) to drop a blip."""
+        data = self._carry + pcm
+        frame_bytes = self.frame_samples * 2
+        n = len(data) // frame_bytes
+        self._carry = data[n * frame_bytes:]
+        if not n:
+            return []
+        frames = np.frombuffer(data, dtype="<i2", count=n * self.frame_samples).reshape(n, self.frame_samples)
+        energy_db, zcr = self.features(frames)
+
+        actions: List[Tuple[str, Any]] = []
+        out = bytearray()
+        for i in range(n):
+            e = float(energy_db[i])
+            frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+            self.frames += 1
+            threshold = max(self.noise_db + SNR_DB, ABSOLUTE_MIN_DB)
+            voiced = e > threshold and zcr[i] < ZCR_VOICED_MAX
+            speech = voiced or e > threshold + LOUD_MARGIN_DB
+            self._track_noise(e)
+
+            if self.in_speech:
+                out += frame
+                self._segment_frames += 1
+                if speech:
+                    self._silent = 0
+                    self._segment_voiced += voiced
+                else:
+                    self._silent += 1
+                if self._silent >= self.hangover_frames or self._segment_frames >= self.max_segment_frames:
+                    if out:
+                        actions.append(("audio", bytes(out)))
+                        out = bytearray()
+                    self.in_speech = self._silent < self.hangover_frames  # Long monologue: keep the gate open
+                    self._silent = 0
+                    self._end_segment(actions)
+                continue
+
+            self._pre_roll.append(frame)
+            self._run = self._run + 1 if speech else 0
+            self._onset_voiced = self._onset_voiced + voiced if speech else 0
+            if self._run >= START_FRAMES:
+                self.in_speech = True
+                self.segments += 1
+                self._run = self._silent = 0
+                self._segment_frames = len(self._pre_roll)
+                self._segment_voiced = self._onset_voiced
+                self._onset_voiced = 0
+                out += b"".join(self._pre_roll)
+                self._pre_roll.clear()
+
+        if out:
+            actions.append(("audio", bytes(out)))
+        self.forwarded_frames += sum(len(p) for kind, p in actions if kind == "audio") // frame_bytes
+        return actions
+
+    def flush(self) -> List[Tuple[str, Any]]:
+        """End of stream: close an open segment."""
+        if not self.in_speech:
+            return []
+        self.in_speech = False
+        actions: List[Tuple[str, Any]] = []
+        self._end_segment(actions)
+        return actions
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "audio_seconds": round(self.frames * self.frame_ms / 1000, 2),
+            "forwarded_seconds": round(self.forwarded_frames * self.frame_ms / 1000, 2),
+            "suppressed_fraction": round(1 - self.forwarded_frames / self.frames, 4) if self.frames else 0.0,
+            "segments": self.segments,
+            "commits": self.commits,
+            "discarded": self.discarded,
+            "noise_floor_db": round(self.noise_db, 1),
+        }
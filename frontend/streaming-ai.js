@@ -126,20 +126,33 @@ function initializeStreamingAI() {
                 role: window.sessionTargetRole || '',
                 target_language: window.sessionTargetLanguage || '',
                 save_to_context: true,
-                text_model: window.selectedModel || 'gpt-3.5-turbo'
+                text_model: window.selectedModel || 'gpt-3.5-turbo',
+                client_id: 'main-window' // A new question only supersedes this window's answers
             };
 
+            // Use STREAMING endpoint
+            let res;
             if (capturedScreenshot) {
+                // Screenshot goes up as a binary multipart part, not as base64 inside JSON
+                const form = new FormData();
+                for (const [key, value] of Object.entries(requestBody)) {
+                    form.append(key, String(value));
+                }
+                const image = await (await fetch(capturedScreenshot)).blob();
+                form.append('screenshot', image, 'screenshot.' + (image.type.split('/')[1] || 'jpeg'));
                 requestBody.screenshot = capturedScreenshot;
+                res = await fetch('http://127.0.0.1:5050/ai/stream/screenshot', {
+                    method: 'POST',
+                    body: form
+                });
+            } else {
+                res = await fetch('http://127.0.0.1:5050/ai/stream', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(requestBody)
+                });
             }
 
-            // Use STREAMING endpoint
-            const res = await fetch('http://127.0.0.1:5050/ai/stream', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(requestBody)
-            });
-
             if (!res.ok) {
                 throw new Error(`HTTP ${res.status}: ${res.statusText}`);
             }